@@ -1,29 +1,204 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, make_response, send_file, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
-from PIL import Image
-import pytesseract
-import re
+from pymongo import MongoClient, ReplaceOne
 import os
 import difflib
-from datetime import datetime
+import hmac
+from datetime import datetime, timedelta
 from bson import ObjectId
-import io
-import csv
-import traceback
+import time
+import threading
+import atexit
+import json
+import uuid
+import zipfile
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlencode
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from ocr import ocr_config_id
+from extractors import extract_details_from_text
+from ocr_pool import OCRPool, OCRPoolBroken, OCRPoolSaturated
+from ocr_cache import OCRCache, DiskStore, MongoStore, file_sha256, ocr_cache_key
+from blobs import BlobStore, Upload, read_upload
+from jobs import make_job_queue, public_job
+from blacklist_index import BlacklistIndex, normalize_number
+from doc_numbers import DocumentNumberIndex
+from watchlist import WatchlistStore
+from image_hash import ImageHashIndex, card_fields, from_hex, image_hashes, to_hex
+from tamper import analyze_image
+from identity_graph import IdentityGraph, cluster_score, record_keys
+from scoring import load_rules
+import export
+from batch import BatchArchive, BatchError, parse_manifest
+from pagination import InvalidCursor, decode_cursor, fetch_page, page_limit
+from stats import DashboardStats
+import metrics
+import request_log
+from profiling import RequestProfiler
+from response_cache import ResponseCache, VersionCounters, response_etag
+from write_behind import WriteBehind, WriteBehindFull
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "X-Request-ID"])
 
 # --- configuration ---
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-MONGO_URI = "mongodb://localhost:27017/"   # change if needed
-DB_NAME = "KYCDB"
+# uploaded documents: OCR'd from memory, spooled to disk above UPLOAD_SPOOL_BYTES,
+# and kept in a content-addressed store (one file per SHA-256) under BLOB_DIR
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", 8 * 1024 * 1024))
+BLOB_DIR = os.environ.get("BLOB_DIR", os.path.join(UPLOAD_FOLDER, "blobs"))
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.environ.get("MONGO_DB", "KYCDB")
+
+# OCR worker pool: processes running Tesseract, and how many images may be
+# running or queued across all requests before /upload answers 503
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 2))
+OCR_MAX_PENDING = int(os.environ.get("OCR_MAX_PENDING", 4 * OCR_WORKERS))
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", 120))
+
+# OCR result cache: in-memory LRU size (entries) plus an optional persistent
+# tier, OCR_CACHE_STORE = "disk" | "mongo" | "" (memory only)
+OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", 1024))
+OCR_CACHE_STORE = os.environ.get("OCR_CACHE_STORE", "").lower()
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "ocr_cache")
+OCR_CACHE_TTL = int(os.environ.get("OCR_CACHE_TTL", 7 * 24 * 3600))
+
+# upload job queue: /upload answers 202 + job id when ASYNC_UPLOADS is on (or the
+# client asks for it) and worker.py processes run the pipeline.
+# JOB_QUEUE_BACKEND = "mongo" | "sqlite" (local stand-in at JOB_QUEUE_PATH)
+ASYNC_UPLOADS = os.environ.get("ASYNC_UPLOADS", "0").lower() in ("1", "true", "yes")
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "mongo").lower()
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "jobs.sqlite3")
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+# blacklist lookups are served from an in-process set; other processes' changes
+# arrive via a change stream or, on standalone Mongo, a reload every N seconds
+BLACKLIST_BLOOM = os.environ.get("BLACKLIST_BLOOM", "0").lower() in ("1", "true", "yes")
+BLACKLIST_REFRESH_INTERVAL = int(os.environ.get("BLACKLIST_REFRESH_INTERVAL", 60))
+
+# sanctions / PEP name screening: minimum normalized name similarity for a hit.
+# The process adding or removing names updates its in-memory index at once;
+# the others read just the changes (watchlist.py) when the "watchlist" version
+# counter moves, so every process screens against the current list within
+# CACHE_VERSION_REFRESH seconds. Only a cold start loads the whole list.
+WATCHLIST_THRESHOLD = float(os.environ.get("WATCHLIST_THRESHOLD", 0.85))
+
+# batch onboarding (/upload/batch): applicants processed concurrently (each
+# one's documents still go through the OCR pool) and applicants per request
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", max(1, min(OCR_WORKERS, OCR_MAX_PENDING // 3))))
+BATCH_MAX_APPLICANTS = int(os.environ.get("BATCH_MAX_APPLICANTS", 1000))
+
+# near-duplicate document images: max dHash distance (bits of 64) searched
+# and max pHash distance of a candidate. Cards on the same template are only
+# a few bits apart, so a candidate must also agree on most of the name, DOB
+# and number read off it; with none of them to compare, both hashes must be
+# within IMAGE_EXACT_DISTANCE bits.
+IMAGE_HASH_DISTANCE = int(os.environ.get("IMAGE_HASH_DISTANCE", 8))
+IMAGE_PHASH_DISTANCE = int(os.environ.get("IMAGE_PHASH_DISTANCE", 12))
+IMAGE_EXACT_DISTANCE = int(os.environ.get("IMAGE_EXACT_DISTANCE", 2))
+
+# fraud scoring rules (scoring.py): version of scoring_rules/<version>.json
+# applied to new uploads, default the newest
+SCORING_RULES_VERSION = os.environ.get("SCORING_RULES_VERSION", "")
+
+# tampering check (noise consistency, see tamper.py): time budget per
+# document; how much of its 0-100 score counts is a scoring rule. Off unless
+# TAMPER_CHECK=1: it only catches edits on cards with visible sensor noise
+TAMPER_CHECK = os.environ.get("TAMPER_CHECK", "0") != "0"
+TAMPER_BUDGET_MS = float(os.environ.get("TAMPER_BUDGET_MS", 300))
+
+# identity graph (fraud rings): records linked through shared document
+# numbers, name + DOB or father's name + DOB. A record joining
+# a component of RING_MIN_SIZE or more records gets an "Identity Ring" alert
+# (its points are a scoring rule on the number of linked records and how
+# densely they are linked). Keys carried by more than GRAPH_MAX_KEY_DEGREE
+# records stop linking (common names, placeholder numbers).
+RING_MIN_SIZE = int(os.environ.get("RING_MIN_SIZE", 3))
+GRAPH_MAX_KEY_DEGREE = int(os.environ.get("GRAPH_MAX_KEY_DEGREE", 50))
+GRAPH_CLUSTER_MAX = int(os.environ.get("GRAPH_CLUSTER_MAX", 500))
+
+# bulk review: records moved per transaction / bulk write, and per request
+BULK_REVIEW_BATCH = int(os.environ.get("BULK_REVIEW_BATCH", 500))
+BULK_REVIEW_MAX = int(os.environ.get("BULK_REVIEW_MAX", 20000))
+
+# response cache for the polled GET endpoints (/records, /alerts, /blacklist):
+# bodies kept in memory up to RESPONSE_CACHE_MAX_MB, invalidated by version
+# counters the writes bump; other processes' writes are seen within
+# CACHE_VERSION_REFRESH seconds
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_MAX_MB = float(os.environ.get("RESPONSE_CACHE_MAX_MB", 64))
+CACHE_VERSION_REFRESH = float(os.environ.get("CACHE_VERSION_REFRESH", 1.0))
+
+# write-behind persistence (write_behind.py) for inline uploads: records and
+# AML alerts are journaled under WRITE_BEHIND_JOURNAL and group-committed every
+# WRITE_BEHIND_FLUSH_MS or WRITE_BEHIND_BATCH documents, instead of two inserts
+# before /upload answers. WRITE_BEHIND_FSYNC fsyncs the journal before
+# answering. Endpoints reading records wait (up to WRITE_BEHIND_SYNC_TIMEOUT
+# seconds) for uploads already answered. With WRITE_BEHIND_MAX_PENDING
+# documents waiting, /upload answers 503 after at most
+# WRITE_BEHIND_SUBMIT_TIMEOUT seconds. A batch MongoDB keeps rejecting (not
+# a connection error) is retried WRITE_BEHIND_MAX_RETRIES times, then its
+# rejected documents go to the journal's dead_letter.bson. One journal per
+# server process: with several (ASGI_WORKERS) each takes the first free one of
+# WRITE_BEHIND_JOURNAL, WRITE_BEHIND_JOURNAL.1 ... Queued jobs (worker.py)
+# always insert directly.
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+WRITE_BEHIND_JOURNAL = os.environ.get("WRITE_BEHIND_JOURNAL", "write_behind_journal")
+WRITE_BEHIND_FLUSH_MS = float(os.environ.get("WRITE_BEHIND_FLUSH_MS", 20))
+WRITE_BEHIND_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", 500))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", 20000))
+WRITE_BEHIND_FSYNC = os.environ.get("WRITE_BEHIND_FSYNC", "0") != "0"
+WRITE_BEHIND_SYNC_TIMEOUT = float(os.environ.get("WRITE_BEHIND_SYNC_TIMEOUT", 5))
+WRITE_BEHIND_SUBMIT_TIMEOUT = float(os.environ.get("WRITE_BEHIND_SUBMIT_TIMEOUT", 0))
+WRITE_BEHIND_MAX_RETRIES = int(os.environ.get("WRITE_BEHIND_MAX_RETRIES", 5))
+
+# one JSON log line per request (method, endpoint, status, duration, request id)
+REQUEST_LOG = os.environ.get("REQUEST_LOG", "1") != "0"
+
+# slow-request profiles (profiling.py): requests picked at random
+# (PROFILE_SAMPLE_RATE) and every request slower than PROFILE_SLOW_MS are
+# stack-sampled every PROFILE_INTERVAL_MS; the newest PROFILE_KEEP are kept in
+# PROFILE_DIR and listed on /admin/profiles, which needs the X-Admin-Token
+# header when PROFILE_ADMIN_TOKEN is set
+PROFILING = os.environ.get("PROFILING", "1") != "0"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 2000))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 10))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+
+# --- metrics, served on /metrics ---
+registry = metrics.Registry()
+REQUEST_SECONDS = registry.histogram(
+    "kyc_http_request_seconds", "Request latency by endpoint (to the first byte for streamed responses)",
+    ["method", "endpoint", "status"])
+REQUESTS_IN_FLIGHT = registry.gauge("kyc_http_requests_in_flight", "Requests being handled", ["endpoint"])
+STAGE_SECONDS = registry.histogram(
+    "kyc_pipeline_stage_seconds", "Upload pipeline time per stage (per document for document-level stages)",
+    ["stage"])
+UPLOADS = registry.counter("kyc_uploads_total", "Records created by the upload pipeline", ["finalStatus"])
+MONGO_SECONDS = registry.histogram("kyc_mongo_command_seconds", "MongoDB command latency", ["command", "collection"])
+MONGO_FAILURES = registry.counter("kyc_mongo_command_failures_total", "Failed MongoDB commands",
+                                  ["command", "collection"])
+OCR_PENDING = registry.gauge("kyc_ocr_pool_pending", "Images running or queued on the OCR pool")
+CACHE_REQUESTS = registry.counter("kyc_response_cache_requests_total",
+                                  "Cached GET endpoints by result (hit, miss, not_modified)", ["route", "result"])
+CACHE_SIZE = registry.gauge("kyc_response_cache_bytes", "Response bodies held in the response cache")
+CACHE_ENTRIES = registry.gauge("kyc_response_cache_entries", "Responses held in the response cache")
+WRITE_BEHIND_PENDING = registry.gauge("kyc_write_behind_pending", "Upload documents journaled but not yet in MongoDB")
+WRITE_BEHIND_DEAD_LETTERED = registry.gauge("kyc_write_behind_dead_lettered",
+                                            "Upload documents MongoDB rejected, moved to the dead-letter file")
 
 # --- MongoDB client / collections ---
-client = MongoClient(MONGO_URI)
+client = MongoClient(MONGO_URI, event_listeners=[metrics.MongoCommandTimer(MONGO_SECONDS, MONGO_FAILURES)])
 db = client[DB_NAME]
 
 collection = db["extracted"]                 # pending uploads
@@ -31,153 +206,73 @@ approved_collection = db["approved_records"] # admin approved
 rejected_collection = db["rejected_records"] # admin rejected
 aml_collection = db["aml_alerts"]            # AML alerts store
 blacklist_collection = db["blacklist"]       # blacklist store
-
-# --- Helpers: OCR / text extraction ---
-def extract_text_from_image(image_path):
-    try:
-        img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
-    except Exception as e:
-        print("OCR error:", e)
-        text = ""
-    text = "\n".join([ln.strip() for ln in text.splitlines() if ln.strip()])
-    return text
-
-# --- Loose / robust extraction helpers ---
-def find_name_loose(text):
-    if not text:
-        return None
-    # look for explicit label
-    m = re.search(r"(?:Name|Naam|नाम)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{1,120})", text, re.IGNORECASE)
-    if m:
-        cand = m.group(1).strip()
-        cand = re.split(r"\s{2,}|,|DOB|D\.O\.B|Father|S\/O|S\.O\.", cand, maxsplit=1)[0].strip()
-        return cand
-    # a few heuristics on first lines
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    for ln in lines[:10]:
-        if re.match(r"^[A-Z][a-z]+(?:\s[A-Z][a-z]+)+$", ln):
-            return ln
-        if re.match(r"^[A-Z\s]{3,}$", ln) and len(ln.split()) >= 2:
-            return ln.title()
-    for ln in lines[:12]:
-        if re.match(r"^[A-Za-z][A-Za-z\s\.'\-]{3,}$", ln) and len(ln.split()) >= 2:
-            return ln
-    return None
-
-def find_father_name_loose(text):
-    if not text:
-        return None
-    m = re.search(r"(?:Father|Father's Name|FATHER|S\/O|S\.O\.|Shri)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{2,80})", text, re.IGNORECASE)
-    if m:
-        return m.group(1).strip()
-    m = re.search(r"\b(?:S\/O|D\/O|Son of|Daughter of)\s+([A-Za-z][A-Za-z\s\.\-]{2,80})", text, re.IGNORECASE)
-    if m:
-        return m.group(1).strip()
-    return None
-
-def normalize_date_string(s):
-    s = (s or "").strip()
-    parts = re.split(r"[-/\.]", s)
-    if len(parts) == 3:
-        # handle yyyy-mm-dd and dd-mm-yyyy
-        if len(parts[0]) == 4:
-            yyyy, mm, dd = parts
-        else:
-            dd, mm, yyyy = parts
-        if len(yyyy) == 2:
-            yy = int(yyyy)
-            yyyy = f"19{yyyy}" if yy > 30 else f"20{yyyy}"
-        try:
-            return f"{str(int(dd)).zfill(2)}/{str(int(mm)).zfill(2)}/{int(yyyy)}"
-        except:
-            return s
-    return s
-
-def find_dob_loose(text):
-    if not text:
-        return None
-    m = re.search(r"(?:DOB|D\.O\.B|Date of Birth|Birth)[:\s\-]*([0-9]{1,4}[-/\.][0-9]{1,2}[-/\.][0-9]{2,4})", text, re.IGNORECASE)
-    if m:
-        return normalize_date_string(m.group(1))
-    m = re.search(r"([0-9]{2}[-/\.][0-9]{2}[-/\.][0-9]{4})", text)
-    if m:
-        return normalize_date_string(m.group(1))
-    return None
-
-def find_gender_loose(text):
-    if not text:
-        return None
-    m = re.search(r"\b(Male|Female|Other|M|F)\b", text, re.IGNORECASE)
-    if not m:
-        return None
-    g = m.group(1).lower()
-    if g in ("m", "male"):
-        return "Male"
-    if g in ("f", "female"):
-        return "Female"
-    return "Other"
-
-# --- Patterns for document numbers ---
-AADHAAR_SPACED = re.compile(r"\b\d{4}\s\d{4}\s\d{4}\b")
-AADHAAR_CONTIG = re.compile(r"\b\d{12}\b")
-PAN_PATTERN = re.compile(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", re.IGNORECASE)
-DL_PATTERN = re.compile(r"\b[A-Z]{2}\d{2}\s?\d{6,12}\b", re.IGNORECASE)
-
-def extract_details_from_text(text):
-    out = {
-        "Document Type": "Unknown",
-        "Name": None,
-        "FatherName": None,
-        "DOB": None,
-        "Gender": None,
-        "number": None,
-        "fraudScore": 30,
-        "reasons": []
-    }
-    if not text:
-        out["reasons"].append("No OCR text")
-        out["fraudScore"] = 80
-        return out
-
-    m = AADHAAR_SPACED.search(text) or AADHAAR_CONTIG.search(text)
-    if m:
-        digits = re.sub(r"\D", "", m.group(0))
-        if len(digits) >= 12:
-            out["Document Type"] = "Aadhaar"
-            out["number"] = f"{digits[:4]} {digits[4:8]} {digits[8:12]}"
-        else:
-            out["number"] = m.group(0)
-        out["Name"] = find_name_loose(text)
-        out["FatherName"] = find_father_name_loose(text)
-        out["DOB"] = find_dob_loose(text)
-        out["Gender"] = find_gender_loose(text)
-        out["fraudScore"] = 10
-        return out
-
-    m = PAN_PATTERN.search(text)
-    if m:
-        out["Document Type"] = "PAN"
-        out["number"] = m.group(0).upper()
-        out["Name"] = find_name_loose(text)
-        out["FatherName"] = find_father_name_loose(text)
-        out["fraudScore"] = 15
-        return out
-
-    m = DL_PATTERN.search(text)
-    if m:
-        out["Document Type"] = "Driving Licence"
-        out["number"] = m.group(0).upper()
-        out["Name"] = find_name_loose(text)
-        out["FatherName"] = find_father_name_loose(text)
-        out["DOB"] = find_dob_loose(text)
-        out["fraudScore"] = 20
-        return out
-
-    out["reasons"].append("Document not recognized")
-    out["fraudScore"] = 80
-    return out
-
+watchlist_collection = db["watchlist"]       # sanctions / PEP names
+watchlist_removed_collection = db["watchlist_removed"]  # tombstones of removed names
+ocr_cache_collection = db["ocr_cache"]       # persistent OCR cache tier
+image_hash_collection = db["image_hashes"]   # perceptual hashes of uploaded images
+identity_keys_collection = db["identity_keys"]  # identity graph: keys per record
+document_numbers = DocumentNumberIndex(db["document_numbers"])  # numberKey -> record/status
+dashboard_stats = DashboardStats(db["stats"], {"Pending": collection, "Approved": approved_collection,
+                                               "Rejected": rejected_collection})  # dashboard counters
+cache_versions = VersionCounters(db["cache_versions"], CACHE_VERSION_REFRESH)  # response cache invalidation
+
+ocr_pool = OCRPool(OCR_WORKERS, OCR_MAX_PENDING)
+OCR_PENDING.set_function(lambda: ocr_pool.stats()["pending"])
+response_cache = ResponseCache(int(RESPONSE_CACHE_MAX_MB * 1024 * 1024))
+CACHE_SIZE.set_function(lambda: response_cache.stats()["bytes"])
+CACHE_ENTRIES.set_function(lambda: response_cache.stats()["entries"])
+blob_store = BlobStore(BLOB_DIR)
+blacklist_index = BlacklistIndex(blacklist_collection, use_bloom=BLACKLIST_BLOOM,
+                                 refresh_interval=BLACKLIST_REFRESH_INTERVAL)
+watchlist_store = WatchlistStore(watchlist_collection, watchlist_removed_collection, threshold=WATCHLIST_THRESHOLD)
+image_index = ImageHashIndex(image_hash_collection, max_distance=IMAGE_HASH_DISTANCE,
+                             phash_distance=IMAGE_PHASH_DISTANCE, exact_distance=IMAGE_EXACT_DISTANCE)
+identity_graph = IdentityGraph(identity_keys_collection, max_key_degree=GRAPH_MAX_KEY_DEGREE)
+scoring_rules = load_rules(SCORING_RULES_VERSION)
+
+def _uploads_committed(names):
+    # a write-behind batch is in Mongo: cached /records and /alerts are stale
+    cache_versions.bump("records")
+
+write_behind = WriteBehind({collection.name: collection, aml_collection.name: aml_collection}, WRITE_BEHIND_JOURNAL,
+                           flush_interval=WRITE_BEHIND_FLUSH_MS / 1000, batch_size=WRITE_BEHIND_BATCH,
+                           max_pending=WRITE_BEHIND_MAX_PENDING, fsync=WRITE_BEHIND_FSYNC,
+                           max_retries=WRITE_BEHIND_MAX_RETRIES, on_commit=_uploads_committed) if WRITE_BEHIND else None
+if write_behind:
+    WRITE_BEHIND_PENDING.set_function(write_behind.pending)
+    WRITE_BEHIND_DEAD_LETTERED.set_function(lambda: write_behind.dead_lettered)
+    atexit.register(write_behind.close)
+_watchlist_lock = threading.Lock()
+_watchlist_version = None    # "watchlist" version the index was synced at
+profiler = RequestProfiler(PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, slow_seconds=PROFILE_SLOW_MS / 1000,
+                           interval=PROFILE_INTERVAL_MS / 1000, keep=PROFILE_KEEP) if PROFILING else None
+job_queue = make_job_queue(JOB_QUEUE_BACKEND, db, JOB_QUEUE_PATH,
+                           visibility_timeout=JOB_VISIBILITY_TIMEOUT, max_attempts=JOB_MAX_ATTEMPTS)
+
+if OCR_CACHE_STORE == "disk":
+    ocr_cache = OCRCache(OCR_CACHE_SIZE, DiskStore(OCR_CACHE_DIR, OCR_CACHE_TTL))
+elif OCR_CACHE_STORE == "mongo":
+    ocr_cache = OCRCache(OCR_CACHE_SIZE, MongoStore(ocr_cache_collection, OCR_CACHE_TTL))
+else:
+    ocr_cache = OCRCache(OCR_CACHE_SIZE)
+
+# --- OCR with cache in front of the pool ---
+# images already seen under the same OCR config skip Tesseract entirely;
+# empty text is not cached so a failed OCR gets retried next time
+def run_ocr(uploads):
+    config_id = ocr_config_id()
+    keys = [ocr_cache_key(u.sha256, config_id) for u in uploads]
+    texts = [ocr_cache.get(k) for k in keys]
+    missing = [i for i, t in enumerate(texts) if t is None]
+    if missing:
+        fresh = ocr_pool.extract_texts([uploads[i].source for i in missing], timeout=OCR_TIMEOUT)
+        for i, text in zip(missing, fresh):
+            texts[i] = text
+            if text:
+                ocr_cache.put(keys[i], text)
+    return texts
+
+# --- name similarity ---
 def similarity(a, b):
     if not a or not b:
         return 0.0
@@ -190,19 +285,357 @@ def similarity(a, b):
 def check_blacklist_for_number(num):
     if not num:
         return False
-    return blacklist_collection.find_one({"number": {"$regex": f"^{re.escape(str(num))}$", "$options": "i"}}) is not None
+    return blacklist_index.contains(num)
+
+def ensure_watchlist_loaded():
+    global _watchlist_version
+    version = cache_versions.get(("watchlist",))
+    if version == _watchlist_version:
+        return
+    # only the first load waits; while changes are read, other requests
+    # screen against the index as it is
+    if not _watchlist_lock.acquire(blocking=_watchlist_version is None):
+        return
+    try:
+        version = cache_versions.get(("watchlist",))
+        if version != _watchlist_version:
+            counts = watchlist_store.sync()
+            _watchlist_version = version
+            if "loaded" in counts:
+                request_log.log("watchlist_loaded", names=counts["loaded"])
+    finally:
+        _watchlist_lock.release()
+
+def screen_watchlist(name):
+    if not name:
+        return []
+    ensure_watchlist_loaded()
+    return watchlist_store.index.screen(name)
 
 def find_duplicate_number(num):
+    # [{"recordId", "status"}] for every pending/approved/rejected record
+    # carrying the same canonical number
     if not num:
         return []
-    query = {"documents.number": {"$regex": re.escape(str(num)), "$options": "i"}}
-    found_pending = list(collection.find(query))
-    found_approved = list(approved_collection.find(query))
-    found_rejected = list(rejected_collection.find(query))
-    return found_pending + found_approved + found_rejected
+    return document_numbers.find(num)
+
+# -----------------------
+# upload pipeline: OCR -> extraction -> scoring -> AML -> record insert
+# shared by the synchronous /upload path and the job workers (worker.py)
+# uploads: [(label, Upload)], see blobs.py
+# -----------------------
+@contextmanager
+def timed_stage(name, timings=None):
+    # kyc_pipeline_stage_seconds, and the running total per stage in `timings`
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+def read_request_file(f):
+    with timed_stage("file_save"):
+        up = read_upload(f.stream, f.filename, UPLOAD_SPOOL_BYTES, blob_store.spool_dir, f.mimetype)
+        blob_store.store(up)
+    return up
+
+def uploads_from_payload(items):
+    # queued job payloads: [label, filename, sha256, size, contentType];
+    # jobs queued before the blob store carry [label, filename, filepath]
+    uploads = []
+    for item in items:
+        if len(item) == 3:
+            label, filename, filepath = item
+            up = Upload(filename, file_sha256(filepath), os.path.getsize(filepath), path=filepath)
+        else:
+            label, filename, digest, size, content_type = item
+            up = blob_store.open_upload(filename, digest, size, content_type)
+        uploads.append((label, up))
+    return uploads
+
+def index_record(record, bump_cache=True, coll=None):
+    # everything kept next to a saved record (record["_id"] a str): number,
+    # image and identity-graph indexes, dashboard counters, cached lists.
+    # A write-behind record bumps the cache once its batch is in Mongo.
+    # With `coll` (the collection holding the record) the record is then
+    # marked indexedAt: worker.py re-indexes a requeued job's record only
+    # when its attempt died before that.
+    documents = record.get("documents") or []
+    images = [(d.get("type"), d.get("blob"), {"phash": from_hex(d["phash"]), "dhash": from_hex(d["dhash"])},
+               card_fields(d.get("Name"), d.get("DOB"), d.get("numberKey")))
+              for d in documents if d.get("phash") and d.get("dhash")]
+    document_numbers.add_record(record["_id"], documents, record.get("status") or "Pending")
+    image_index.add_record(record["_id"], images)
+    identity_graph.add_record(record["_id"], record_keys(record))
+    dashboard_stats.record_upload(record)
+    if coll is not None:
+        coll.update_one({"_id": ObjectId(record["_id"])}, {"$set": {"indexedAt": datetime.utcnow().isoformat()}})
+    if bump_cache:
+        cache_versions.bump("records")
+
+def find_job_record(job_id):
+    # (collection, record) saved by an earlier attempt of the job, reviewed or not
+    for coll in (collection, approved_collection, rejected_collection):
+        record = coll.find_one({"jobId": job_id})
+        if record:
+            return coll, record
+    return None, None
+
+def process_upload(user_name, user_dob, user_gender, uploads, job_id=None, on_stage=None):
+    def stage(name):
+        if on_stage:
+            on_stage(name)
+
+    documents = []
+    overall_reasons = []
+    aml_alerts_for_record = []
+    screened = {}
+    timings = {}
+
+    # OCR every document of this request at the same time on the pool
+    with timed_stage("ocr", timings):
+        texts = run_ocr([up for _, up in uploads])
+    stage("ocr")
+
+    for (label, up), text in zip(uploads, texts):
+        with timed_stage("extraction", timings):
+            extracted = extract_details_from_text(text)
+
+        detected = extracted.get("Document Type") == label
+
+        # what each check found; scoring_rules turns these into the score
+        signals = {"base": extracted["fraudScore"]}
+
+        # name similarity
+        if extracted.get("Name") and user_name:
+            with timed_stage("similarity", timings):
+                sim = similarity(extracted["Name"], user_name)
+            extracted["match"] = round(sim, 3)
+            signals["nameMatch"] = round(sim, 4)
+        else:
+            extracted["match"] = 0.0
+
+        # DOB checks
+        if user_dob:
+            if extracted.get("DOB"):
+                signals["dob"] = "match" if extracted.get("DOB") == user_dob else "mismatch"
+            else:
+                signals["dob"] = "missing"
+
+        # Gender check
+        if user_gender:
+            doc_gender = (extracted.get("Gender") or "").lower()
+            signals["genderMismatch"] = bool(doc_gender) and doc_gender != user_gender
+
+        # Watchlist screening (sanctions / PEP) of the names read off the document
+        for field in ("Name", "FatherName"):
+            name = extracted.get(field)
+            if not name:
+                continue
+            if name not in screened:
+                with timed_stage("watchlist", timings):
+                    screened[name] = screen_watchlist(name)
+            hits = screened[name]
+            if hits:
+                signals[f"watchlist{field}"] = hits[0]["listType"]
+                aml_alerts_for_record.append({
+                    "type": "Watchlist Match",
+                    "field": field,
+                    "name": name,
+                    "matches": hits[:3]
+                })
+
+        # Blacklist check
+        docnum = extracted.get("number")
+        with timed_stage("blacklist", timings):
+            blacklisted = bool(docnum) and check_blacklist_for_number(docnum)
+        signals["blacklisted"] = blacklisted
+        if blacklisted:
+            aml_alerts_for_record.append({
+                "type": "Blacklisted Number",
+                "number": docnum,
+                "reason": "Number exists in blacklist"
+            })
+
+        # Duplicate number check
+        with timed_stage("duplicate_check", timings):
+            dup_found = find_duplicate_number(docnum)
+        # other records with the same number (pending / approved / rejected)
+        signals["duplicateNumber"] = bool(docnum and dup_found)
+        if signals["duplicateNumber"]:
+            aml_alerts_for_record.append({
+                "type": "Duplicate Number",
+                "number": docnum,
+                "matches": [r["recordId"] for r in dup_found][:8]
+            })
+
+        # Near-duplicate image check: the same card re-photographed, re-encoded
+        # or edited (e.g. a different number) since an earlier upload
+        card = card_fields(extracted.get("Name"), extracted.get("DOB"), normalize_number(docnum))
+        with timed_stage("image_hash", timings):
+            try:
+                hashes = image_hashes(up.source)
+            except Exception as e:
+                request_log.log_exception("image_hash", e)
+                hashes = None
+            near = image_index.near(hashes, card) if hashes else []
+        signals["nearDuplicateImage"] = bool(near)
+        if near:
+            aml_alerts_for_record.append({
+                "type": "Near-Duplicate Image",
+                "documentType": label,
+                "blob": up.sha256,
+                "distance": near[0]["distance"],
+                "matches": list(dict.fromkeys(m["recordId"] for m in near))[:8]
+            })
+
+        # Tampering check: a pasted, painted-over or spliced region
+        tamper = None
+        if TAMPER_CHECK:
+            try:
+                with timed_stage("tamper", timings):
+                    tamper = analyze_image(up.source, {"budget_ms": TAMPER_BUDGET_MS})
+            except Exception as e:
+                request_log.log_exception("tamper", e)
+        signals["tamperScore"] = tamper["score"] if tamper else 0
+
+        fraud_score, risk_level, rule_reasons = scoring_rules.score_document(signals)
+        extracted["reasons"] += rule_reasons
+        if tamper and tamper["score"]:
+            extracted["reasons"] += tamper["reasons"]
+
+        doc_obj = {
+            "type": label,
+            "filename": up.filename,
+            "blob": up.sha256,
+            "size": up.size,
+            "phash": to_hex(hashes["phash"]) if hashes else None,
+            "dhash": to_hex(hashes["dhash"]) if hashes else None,
+            "tamper": {k: tamper[k] for k in ("score", "ela", "noise", "complete", "ms")} if tamper else None,
+            "detected": bool(detected),
+            "Name": extracted.get("Name"),
+            "FatherName": extracted.get("FatherName"),
+            "DOB": extracted.get("DOB"),
+            "Gender": extracted.get("Gender"),
+            "number": extracted.get("number"),
+            "numberKey": normalize_number(extracted.get("number")) or None,
+            "fraudScore": int(fraud_score),
+            "riskLevel": risk_level,
+            "match": round(extracted.get("match", 0), 3),
+            "signals": signals,
+            "reasons": extracted.get("reasons", [])
+        }
+
+        documents.append(doc_obj)
+        overall_reasons += extracted.get("reasons", [])
+
+    stage("scoring")
+
+    # Identity graph: other applicants sharing a number, name + DOB or father's
+    # name + DOB with this one, directly or through each other
+    identity_keys = record_keys({"userName": user_name, "userDob": user_dob, "documents": documents})
+    ring = None
+    with timed_stage("identity_graph", timings):
+        linked = identity_graph.linked_records(identity_keys)
+        if linked + 1 >= RING_MIN_SIZE:
+            members, truncated = identity_graph.cluster(identity_keys, GRAPH_CLUSTER_MAX)
+            score = cluster_score(dict(members, new=identity_keys))
+            ring = {"size": linked + 1, "density": score["density"], "sharedKeys": score["sharedKeys"],
+                    "sharedByKind": score["sharedByKind"], "truncated": truncated}
+    if ring:
+        aml_alerts_for_record.append({
+            "type": "Identity Ring",
+            "size": ring["size"],
+            "density": ring["density"],
+            "sharedByKind": ring["sharedByKind"],
+            "matches": list(members)[:8]
+        })
+
+    # Final decision: overall score, risk level and status from the scoring rules
+    record_signals = {"ringLinked": linked if ring else 0, "ringDensity": ring["density"] if ring else None,
+                      "amlAlerts": len(aml_alerts_for_record)}
+    overall_score, overall_risk, final_status, rule_reasons = scoring_rules.score_record(
+        [d["fraudScore"] for d in documents], record_signals)
+    overall_reasons += rule_reasons
+
+    # inline uploads are written behind; a queued job's record is in Mongo
+    # before the job completes
+    behind = write_behind if job_id is None else None
+
+    aml_doc = None
+    aml_entry_id = None
+    if aml_alerts_for_record:
+        aml_doc = {
+            "alerts": aml_alerts_for_record,
+            "created_at": datetime.utcnow().isoformat(),
+            "userName": user_name,
+            "documents_sample": documents[:3]
+        }
+        if behind:
+            aml_doc["_id"] = ObjectId()
+        else:
+            with timed_stage("aml_insert", timings):
+                aml_collection.insert_one(aml_doc)
+        aml_entry_id = str(aml_doc["_id"])
+    stage("aml")
+
+    record = {
+        "userName": user_name,
+        "userDob": user_dob,
+        "userGender": user_gender,
+        "documents": documents,
+        "overallFraudScore": overall_score,
+        "overallRiskLevel": overall_risk,
+        "finalStatus": final_status,
+        "amlAlerts": aml_alerts_for_record,
+        "amlEntryId": aml_entry_id,
+        "identityRing": ring,
+        "signals": record_signals,
+        "rulesVersion": scoring_rules.version,
+        "reasons": list(dict.fromkeys(overall_reasons)),
+        "status": "Pending",
+        "adminStatus": None,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if job_id:
+        record["jobId"] = job_id
+
+    # the record only points at blobs that are on disk
+    with timed_stage("blob_wait", timings):
+        for _, up in uploads:
+            blob_store.wait(up)
+
+    with timed_stage("record_insert", timings):
+        if behind:
+            behind.submit(([(aml_collection.name, aml_doc)] if aml_doc else []) + [(collection.name, record)],
+                          timeout=WRITE_BEHIND_SUBMIT_TIMEOUT)
+        else:
+            collection.insert_one(record)
+        record["_id"] = str(record["_id"])
+        index_record(record, bump_cache=not behind, coll=collection if job_id else None)
+    stage("record")
+    UPLOADS.inc(finalStatus=final_status)
+
+    request_log.log("upload_saved", recordId=record["_id"], jobId=job_id, finalStatus=final_status,
+                    overallRisk=overall_risk, documents=len(documents),
+                    stagesMs={k: round(v * 1000, 2) for k, v in timings.items()})
+    return record
+
+def wants_async_upload():
+    flag = request.args.get("async")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    if "respond-async" in (request.headers.get("Prefer") or ""):
+        return True
+    return ASYNC_UPLOADS
 
 # -----------------------
 # /upload endpoint - main processing pipeline
+# runs inline, or with ?async=1 / "Prefer: respond-async" (default: ASYNC_UPLOADS)
+# saves the files, queues a job and answers 202 with the job id
 # -----------------------
 @app.route("/upload", methods=["POST"])
 def upload():
@@ -211,151 +644,228 @@ def upload():
         user_dob = (request.form.get("userDob") or "").strip()   # expected DD/MM/YYYY from frontend
         user_gender = (request.form.get("userGender") or "").strip().lower()
 
-        documents = []
-        overall_reasons = []
-        aml_alerts_for_record = []
-
         fields = [("aadhar", "Aadhaar"), ("pan", "PAN"), ("dl", "Driving Licence")]
 
+        uploads = []
         for field_key, label in fields:
             f = request.files.get(field_key)
             if not f:
                 continue
 
-            filename = f.filename
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            f.save(filepath)
+            uploads.append((label, read_request_file(f)))
 
-            text = extract_text_from_image(filepath)
-            extracted = extract_details_from_text(text)
+        if not uploads:
+            return jsonify({"error": "No documents uploaded"}), 400
 
-            detected = extracted.get("Document Type") == label
+        if wants_async_upload():
+            for _, up in uploads:
+                blob_store.wait(up)
+            job_id = job_queue.enqueue({
+                "userName": user_name,
+                "userDob": user_dob,
+                "userGender": user_gender,
+                "uploads": [[label] + up.ref() for label, up in uploads],
+            })
+            request_log.log("upload_queued", jobId=job_id)
+            body = {"jobId": job_id, "status": "queued",
+                    "statusUrl": f"/jobs/{job_id}", "resultUrl": f"/jobs/{job_id}/result"}
+            return jsonify(body), 202, {"Location": f"/jobs/{job_id}"}
 
-            # name similarity
-            if extracted.get("Name") and user_name:
-                sim = similarity(extracted["Name"], user_name)
-                extracted["match"] = round(sim, 3)
-                if sim < 0.6:
-                    extracted["fraudScore"] += 25
-                    extracted["reasons"].append("Name similarity low vs user input")
-                else:
-                    extracted["fraudScore"] = max(0, extracted["fraudScore"] - 5)
-            else:
-                extracted["match"] = 0.0
-
-            # DOB checks
-            if user_dob:
-                if extracted.get("DOB"):
-                    if extracted.get("DOB") != user_dob:
-                        extracted["fraudScore"] += 25
-                        extracted["reasons"].append("DOB mismatch vs user input")
-                else:
-                    extracted["fraudScore"] += 10
-                    extracted["reasons"].append("DOB not found on document")
-
-            # Gender check
-            if user_gender:
-                doc_gender = (extracted.get("Gender") or "").lower()
-                if doc_gender and doc_gender != user_gender:
-                    extracted["fraudScore"] += 10
-                    extracted["reasons"].append("Gender mismatch vs user input")
-
-            # Blacklist check
-            docnum = extracted.get("number")
-            if docnum and check_blacklist_for_number(docnum):
-                extracted["fraudScore"] += 50
-                extracted["reasons"].append("Document number is blacklisted (AML)")
-                aml_alerts_for_record.append({
-                    "type": "Blacklisted Number",
-                    "number": docnum,
-                    "reason": "Number exists in blacklist"
-                })
+        try:
+            record = process_upload(user_name, user_dob, user_gender, uploads)
+        except OCRPoolBroken as e:
+            request_log.log("upload_shed", level="warning", reason="ocr_worker_died", error=str(e))
+            return jsonify({"error": "OCR worker failed, please retry"}), 503, {"Retry-After": "1"}
+        except OCRPoolSaturated as e:
+            request_log.log("upload_shed", level="warning", reason="ocr_pool_saturated", error=str(e))
+            return jsonify({"error": "OCR workers are busy, please retry shortly"}), 503, {"Retry-After": "5"}
+        except FutureTimeoutError:
+            return jsonify({"error": "OCR timed out"}), 503, {"Retry-After": "5"}
+        except WriteBehindFull as e:
+            request_log.log("upload_shed", level="warning", reason="write_behind_full", error=str(e))
+            return jsonify({"error": "Database writes are behind, please retry shortly"}), 503, {"Retry-After": "5"}
+        return jsonify(record), 200
 
-            # Duplicate number check
-            dup_found = find_duplicate_number(docnum)
-            if docnum and dup_found:
-                # if there are other records with same number (could be pending/approved/rejected)
-                extracted["fraudScore"] += 40
-                extracted["reasons"].append("Duplicate document number detected in DB (possible synthetic identity / reuse)")
-                aml_alerts_for_record.append({
-                    "type": "Duplicate Number",
-                    "number": docnum,
-                    "matches": [str(r.get("_id")) for r in dup_found][:8]
-                })
+    except Exception as e:
+        request_log.log_exception("/upload", e)
+        return jsonify({"error": str(e)}), 500
 
-            doc_obj = {
-                "type": label,
-                "filename": filename,
-                "detected": bool(detected),
-                "Name": extracted.get("Name"),
-                "FatherName": extracted.get("FatherName"),
-                "DOB": extracted.get("DOB"),
-                "Gender": extracted.get("Gender"),
-                "number": extracted.get("number"),
-                "fraudScore": int(extracted.get("fraudScore", 0)),
-                "riskLevel": "High" if extracted.get("fraudScore", 0) >= 70 else ("Medium" if extracted.get("fraudScore", 0) >= 30 else "Low"),
-                "match": round(extracted.get("match", 0), 3),
-                "reasons": extracted.get("reasons", [])
-            }
-
-            documents.append(doc_obj)
-            overall_reasons += extracted.get("reasons", [])
-
-        if not documents:
-            return jsonify({"error": "No documents uploaded"}), 400
+# -----------------------
+# /upload/batch - many applicants in one request
+# multipart: archive=<zip of document images>, manifest=<JSON / CSV file or
+# field> (or manifest.json / manifest.csv inside the archive), see batch.py.
+# Streams one NDJSON line per applicant as it finishes, then a summary line.
+# -----------------------
+def process_batch_applicant(applicant, uploads, attempts=5):
+    # the OCR pool (and the write-behind queue) shed load; a batch waits its turn
+    for attempt in range(attempts):
+        try:
+            return process_upload(applicant["userName"], applicant["userDob"], applicant["userGender"], uploads)
+        except (OCRPoolSaturated, WriteBehindFull):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+@app.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    try:
+        archive_file = request.files.get("archive")
+        archive = BatchArchive(archive_file.stream if archive_file else None, request.files,
+                               spool_threshold=UPLOAD_SPOOL_BYTES)
+        manifest_file = request.files.get("manifest")
+        if manifest_file:
+            applicants = parse_manifest(manifest_file.read(), manifest_file.filename or "")
+        elif request.form.get("manifest"):
+            applicants = parse_manifest(request.form["manifest"])
+        else:
+            applicants = archive.manifest()
+        if not applicants:
+            return jsonify({"error": "No manifest / applicants"}), 400
+        if len(applicants) > BATCH_MAX_APPLICANTS:
+            return jsonify({"error": f"at most {BATCH_MAX_APPLICANTS} applicants per batch"}), 400
+        batch_id = uuid.uuid4().hex[:12]
+        archive.read_files(applicants, read_request_file)
+    except (BatchError, zipfile.BadZipFile) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        request_log.log_exception("/upload/batch", e)
+        return jsonify({"error": str(e)}), 500
 
-        overall_score = int(round(sum(d["fraudScore"] for d in documents) / len(documents)))
-        overall_risk = "High" if overall_score >= 70 else ("Medium" if overall_score >= 30 else "Low")
-
-        # Final decision rule (simple, adjustable)
-        final_status = "Auto-Pass"
-        if overall_risk == "Medium":
-            final_status = "Review"
-        if overall_risk == "High" or (len(aml_alerts_for_record) > 0):
-            final_status = "Flagged"
-
-        aml_entry_id = None
-        if aml_alerts_for_record:
-            aml_doc = {
-                "alerts": aml_alerts_for_record,
-                "created_at": datetime.utcnow().isoformat(),
-                "userName": user_name,
-                "documents_sample": documents[:3]
-            }
-            res = aml_collection.insert_one(aml_doc)
-            aml_entry_id = str(res.inserted_id)
+    request_log.log("batch_started", batchId=batch_id, applicants=len(applicants))
 
-        record = {
-            "userName": user_name,
-            "userDob": user_dob,
-            "userGender": user_gender,
-            "documents": documents,
-            "overallFraudScore": overall_score,
-            "overallRiskLevel": overall_risk,
-            "finalStatus": final_status,
-            "amlAlerts": aml_alerts_for_record,
-            "amlEntryId": aml_entry_id,
-            "reasons": list(dict.fromkeys(overall_reasons)),
-            "status": "Pending",
-            "adminStatus": None,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+    def line(obj):
+        return json.dumps(obj, default=str) + "\n"
 
-        inserted = collection.insert_one(record)
-        record["_id"] = str(inserted.inserted_id)
+    def generate():
+        started = time.perf_counter()
+        done = failed = 0
+        executor = ThreadPoolExecutor(BATCH_CONCURRENCY, thread_name_prefix="batch")
+        in_flight = {}
+        queue = iter(applicants)
+        try:
+            while True:
+                # keep BATCH_CONCURRENCY applicants in flight; their files are
+                # copied out of the archive only now
+                while len(in_flight) < BATCH_CONCURRENCY:
+                    applicant = next(queue, None)
+                    if applicant is None:
+                        break
+                    aid = applicant["applicantId"]
+                    try:
+                        if not applicant["documents"]:
+                            raise BatchError("No documents uploaded")
+                        uploads = [(label, archive.read(ref, blob_store)) for _, label, ref in applicant["documents"]]
+                    except BatchError as e:
+                        failed += 1
+                        yield line({"applicantId": aid, "status": "failed", "error": str(e)})
+                        continue
+                    in_flight[executor.submit(process_batch_applicant, applicant, uploads)] = aid
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    aid = in_flight.pop(fut)
+                    try:
+                        record = fut.result()
+                    except Exception as e:
+                        request_log.log_exception("/upload/batch", e, batchId=batch_id, applicantId=aid)
+                        failed += 1
+                        yield line({"applicantId": aid, "status": "failed", "error": str(e)})
+                        continue
+                    done += 1
+                    yield line({"applicantId": aid, "status": "done", "recordId": record["_id"], "record": record})
+            elapsed = time.perf_counter() - started
+            request_log.log("batch_done", batchId=batch_id, done=done, failed=failed, seconds=round(elapsed, 3))
+            yield line({"summary": {"batchId": batch_id, "applicants": len(applicants), "done": done,
+                                    "failed": failed, "seconds": round(elapsed, 3)}})
+        finally:
+            # also runs when the client goes away mid-stream
+            executor.shutdown(wait=True, cancel_futures=True)
+            archive.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Batch-Id": batch_id})
 
-        print(f"[UPLOAD] saved record {record['_id']} finalStatus={final_status} overallRisk={overall_risk}")
-        return jsonify(record), 200
+# -----------------------
+# job status / result for queued uploads
+# -----------------------
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(public_job(job)), 200
+    except Exception as e:
+        request_log.log_exception("/jobs", e)
+        return jsonify({"error": str(e)}), 500
 
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        if job["status"] == "done":
+            return jsonify(job["result"]), 200
+        if job["status"] == "failed":
+            return jsonify({"error": job.get("error") or "Job failed", "job": public_job(job)}), 500
+        return jsonify(public_job(job)), 202, {"Retry-After": "2"}
     except Exception as e:
-        print("❌ /upload error:", e)
-        traceback.print_exc()
+        request_log.log_exception("/jobs result", e)
         return jsonify({"error": str(e)}), 500
 
+# -----------------------
+# response cache: GET responses per route + query string, kept until a write
+# bumps one of the data sets they depend on. Every 200 carries an ETag; a
+# request whose If-None-Match matches the current one gets 304 straight away.
+# cache_lookup is shared with the async routes in asgi.py.
+# -----------------------
+NOT_MODIFIED = "not_modified"
+
+def cache_lookup(route, args, datasets, if_none_match):
+    # args: (name, value) query pairs; if_none_match(etag) -> whether the
+    # client's copy is current. Returns (key, versions, etag, hit): hit is
+    # NOT_MODIFIED, a cached (body, content type), or None - run the query
+    # and response_cache.put(key, versions, ...) a 200 body.
+    key = route + "?" + urlencode(sorted(args))
+    versions = cache_versions.get(datasets)   # before the query, see response_cache.py
+    etag = response_etag(key, versions)
+    if if_none_match(etag):
+        hit = NOT_MODIFIED
+    else:
+        hit = response_cache.get(key, versions)
+    CACHE_REQUESTS.inc(route=route, result=NOT_MODIFIED if hit == NOT_MODIFIED else "hit" if hit else "miss")
+    return key, versions, etag, hit
+
+def cached_get(*datasets):
+    def decorator(view):
+        @wraps(view)
+        def cached(*args, **kwargs):
+            if request.method != "GET" or not RESPONSE_CACHE:
+                return view(*args, **kwargs)
+            key, versions, etag, hit = cache_lookup(request.url_rule.rule, request.args.items(multi=True),
+                                                    datasets, request.if_none_match.contains_weak)
+            if hit == NOT_MODIFIED:
+                response = Response(status=304)
+            elif hit:
+                response = Response(hit[0], status=200, content_type=hit[1])
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                response_cache.put(key, versions, response.get_data(), response.content_type)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return cached
+    return decorator
+
 # -----------------------
 # /records: return pending
 # -----------------------
 @app.route("/records", methods=["GET"])
+@cached_get("records")
 def get_records():
     try:
         data = list(collection.find({"status": "Pending"}).sort([("_id", -1)]).limit(500))
@@ -365,7 +875,111 @@ def get_records():
             out.append(d)
         return jsonify(out), 200
     except Exception as e:
-        print("❌ /records error:", e)
+        request_log.log_exception("/records", e)
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# review: move pending records to approved_records / rejected_records.
+# Each batch is one find, one bulk upsert into the target and one delete_many,
+# inside a transaction when the deployment supports them (replica set /
+# mongos). Without transactions the upsert-by-_id makes the copy idempotent, so
+# a batch cut short between copy and delete completes when it is re-run.
+# -----------------------
+_transactions_supported = None
+
+def transactions_supported():
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = client.admin.command("hello")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+def move_records(oids, status, admin_user="admin"):
+    # returns the records moved (as stored in the target collection)
+    target = approved_collection if status == "Approved" else rejected_collection
+    action = {"by": admin_user, "at": datetime.utcnow().isoformat()}
+
+    def move(session=None):
+        docs = list(collection.find({"_id": {"$in": oids}}, session=session))
+        if not docs:
+            return []
+        for d in docs:
+            d["status"] = status
+            d["adminStatus"] = status
+            d["adminAction"] = action
+        target.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+                          ordered=False, session=session)
+        collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}}, session=session)
+        return docs
+
+    if transactions_supported():
+        with client.start_session() as session:
+            moved = session.with_transaction(move)
+    else:
+        moved = move()
+
+    if moved:
+        document_numbers.set_status([d["_id"] for d in moved], status)
+        dashboard_stats.record_review(moved, status)
+        cache_versions.bump("records")
+    return moved
+
+def bulk_review_query(flt):
+    # {finalStatus, riskLevel, olderThanHours, maxFraudScore} -> pending records query
+    query = {"status": "Pending"}
+    if flt.get("finalStatus"):
+        query["finalStatus"] = flt["finalStatus"]
+    if flt.get("riskLevel"):
+        query["overallRiskLevel"] = flt["riskLevel"]
+    if flt.get("olderThanHours") is not None:
+        cutoff = datetime.utcnow() - timedelta(hours=float(flt["olderThanHours"]))
+        query["timestamp"] = {"$lt": cutoff.isoformat()}
+    if flt.get("maxFraudScore") is not None:
+        query["overallFraudScore"] = {"$lte": float(flt["maxFraudScore"])}
+    return query
+
+# -----------------------
+# /graph/cluster/<id> : the identity-graph cluster of a record - the records
+# linked to it, the keys they share and how densely they are linked
+# (?limit= caps the records read, default GRAPH_CLUSTER_MAX)
+# -----------------------
+@app.route("/graph/cluster/<id>", methods=["GET"])
+def graph_cluster(id):
+    try:
+        keys = identity_graph.keys_for(id)
+        if keys is None:
+            return jsonify({"error": "Record not found in identity graph"}), 404
+        limit = page_limit(request.args.get("limit"), default=GRAPH_CLUSTER_MAX, maximum=GRAPH_CLUSTER_MAX)
+        members, truncated = identity_graph.cluster(keys, limit)
+        members.setdefault(id, keys)
+
+        records = {}
+        oids = [ObjectId(r) for r in members if ObjectId.is_valid(r)]
+        for coll in (collection, approved_collection, rejected_collection):
+            for d in coll.find({"_id": {"$in": oids}}, {"userName": 1, "status": 1, "finalStatus": 1,
+                                                        "overallFraudScore": 1, "timestamp": 1}):
+                d["_id"] = str(d["_id"])
+                records[d["_id"]] = d
+
+        counts = {}
+        for ks in members.values():
+            for k in ks:
+                counts[k] = counts.get(k, 0) + 1
+        shared = [{"key": k, "records": n, "degree": identity_graph.degree(k)}
+                  for k, n in sorted(counts.items(), key=lambda kv: -kv[1]) if n > 1]
+
+        return jsonify({
+            "recordId": id,
+            "records": [dict(records.get(r, {"_id": r}), keys=ks) for r, ks in members.items()],
+            "sharedKeys": shared,
+            "score": cluster_score(members),
+            "truncated": truncated
+        }), 200
+    except Exception as e:
+        request_log.log_exception("/graph/cluster", e)
         return jsonify({"error": str(e)}), 500
 
 # -----------------------
@@ -381,27 +995,85 @@ def review(id):
         if status not in ("Approved", "Rejected"):
             return jsonify({"error": "status must be Approved or Rejected"}), 400
 
-        rec = collection.find_one({"_id": ObjectId(id)})
-        if not rec:
+        if not move_records([ObjectId(id)], status, admin_user):
             return jsonify({"error": "Record not found"}), 404
 
-        rec["adminStatus"] = status
-        rec["adminAction"] = {"by": admin_user, "at": datetime.utcnow().isoformat()}
-        rec["status"] = status
+        request_log.log("review", recordId=id, status=status, adminUser=admin_user)
+        return jsonify({"message": f"Record {status}"}), 200
+
+    except Exception as e:
+        request_log.log_exception("/review", e)
+        return jsonify({"error": str(e)}), 500
+
+# -----------------------
+# /review/bulk : review many pending records at once
+# {status, adminUser, ids: [...]} or {status, adminUser, filter: {finalStatus,
+# riskLevel, olderThanHours, maxFraudScore}, limit}; dryRun: true lists the
+# matching ids without moving them
+# -----------------------
+@app.route("/review/bulk", methods=["POST"])
+def review_bulk():
+    try:
+        info = request.get_json() or {}
+        status = info.get("status")
+        admin_user = info.get("adminUser", "admin")
+        if status not in ("Approved", "Rejected"):
+            return jsonify({"error": "status must be Approved or Rejected"}), 400
 
-        if status == "Approved":
-            approved_collection.insert_one(rec)
+        results = []
+        if info.get("ids") is not None:
+            ids = info["ids"]
+            if not isinstance(ids, list):
+                return jsonify({"error": "ids must be a list"}), 400
+            if len(ids) > BULK_REVIEW_MAX:
+                return jsonify({"error": f"at most {BULK_REVIEW_MAX} ids per request"}), 400
+            oids = []
+            for raw in ids:
+                if ObjectId.is_valid(str(raw)):
+                    oids.append(ObjectId(str(raw)))
+                else:
+                    results.append({"id": raw, "outcome": "invalid_id"})
+        elif isinstance(info.get("filter"), dict):
+            limit = page_limit(info.get("limit"), default=BULK_REVIEW_MAX, maximum=BULK_REVIEW_MAX)
+            cursor = collection.find(bulk_review_query(info["filter"]), {"_id": 1}).sort("timestamp", 1).limit(limit)
+            oids = [d["_id"] for d in cursor]
         else:
-            rejected_collection.insert_one(rec)
+            return jsonify({"error": "ids or filter is required"}), 400
 
-        collection.delete_one({"_id": ObjectId(id)})
+        requested = len(oids) + len(results)
+        if info.get("dryRun"):
+            return jsonify({"status": status, "matched": len(oids), "ids": [str(o) for o in oids]}), 200
 
-        print(f"[REVIEW] record {id} -> {status} by {admin_user}")
-        return jsonify({"message": f"Record {status}"}), 200
+        started = time.perf_counter()
+        moved = 0
+        for k in range(0, len(oids), BULK_REVIEW_BATCH):
+            batch = oids[k:k + BULK_REVIEW_BATCH]
+            try:
+                done = {d["_id"] for d in move_records(batch, status, admin_user)}
+            except Exception as e:
+                request_log.log_exception("/review/bulk batch", e)
+                results += [{"id": str(o), "outcome": "error", "error": str(e)} for o in batch]
+                continue
+            moved += len(done)
+            results += [{"id": str(o), "outcome": status if o in done else "not_found"} for o in batch]
+        elapsed = time.perf_counter() - started
+
+        request_log.log("review_bulk", status=status, adminUser=admin_user, moved=moved, matched=len(oids),
+                        seconds=round(elapsed, 3))
+        return jsonify({
+            "status": status,
+            "requested": requested,
+            "moved": moved,
+            "notFound": sum(1 for r in results if r["outcome"] == "not_found"),
+            "failed": sum(1 for r in results if r["outcome"] in ("error", "invalid_id")),
+            "transactional": transactions_supported(),
+            "seconds": round(elapsed, 3),
+            "recordsPerSecond": round(moved / elapsed, 1) if elapsed > 0 else None,
+            "results": results,
+        }), 200
 
     except Exception as e:
-        print("❌ /review error:", e)
-        traceback.print_exc()
+        request_log.log_exception("/review/bulk", e)
         return jsonify({"error": str(e)}), 500
 
 # -----------------------
@@ -410,43 +1082,38 @@ def review(id):
 @app.route("/approve/<id>", methods=["POST"])
 def approve(id):
     try:
-        rec = collection.find_one({"_id": ObjectId(id)})
-        if not rec:
+        if not move_records([ObjectId(id)], "Approved"):
             return jsonify({"error": "Record not found"}), 404
-        rec["status"] = "Approved"
-        rec["adminStatus"] = "Approved"
-        rec["adminAction"] = {"by": "admin", "at": datetime.utcnow().isoformat()}
-        approved_collection.insert_one(rec)
-        collection.delete_one({"_id": ObjectId(id)})
-        print(f"[APPROVE] {id}")
+        request_log.log("review", recordId=id, status="Approved")
         return jsonify({"message": "Approved"}), 200
     except Exception as e:
-        print("❌ /approve error:", e)
-        traceback.print_exc()
+        request_log.log_exception("/approve", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/reject/<id>", methods=["POST"])
 def reject(id):
     try:
-        rec = collection.find_one({"_id": ObjectId(id)})
-        if not rec:
+        if not move_records([ObjectId(id)], "Rejected"):
             return jsonify({"error": "Record not found"}), 404
-        rec["status"] = "Rejected"
-        rec["adminStatus"] = "Rejected"
-        rec["adminAction"] = {"by": "admin", "at": datetime.utcnow().isoformat()}
-        rejected_collection.insert_one(rec)
-        collection.delete_one({"_id": ObjectId(id)})
-        print(f"[REJECT] {id}")
+        request_log.log("review", recordId=id, status="Rejected")
         return jsonify({"message": "Rejected"}), 200
     except Exception as e:
-        print("❌ /reject error:", e)
-        traceback.print_exc()
+        request_log.log_exception("/reject", e)
         return jsonify({"error": str(e)}), 500
 
+# -----------------------
+# paged listings: the body stays a JSON array, the token for the next page
+# (if any) goes in the X-Next-Cursor header
+# -----------------------
+def page_response(rows, next_cursor):
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return jsonify(rows), 200, headers
+
 # -----------------------
 # alerts endpoints
 # -----------------------
 @app.route("/alerts", methods=["GET"])
+@cached_get("records")
 def alerts():
     try:
         data = list(collection.find({"overallRiskLevel": "High"}))
@@ -456,54 +1123,58 @@ def alerts():
             out.append(d)
         return jsonify(out), 200
     except Exception as e:
-        print("❌ /alerts error:", e)
+        request_log.log_exception("/alerts", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/alerts/aml", methods=["GET"])
 def aml_alerts():
     try:
-        data = list(aml_collection.find())
-        out = []
-        for d in data:
-            d["_id"] = str(d["_id"])
-            out.append(d)
-        return jsonify(out), 200
+        rows, next_cursor = fetch_page([(aml_collection, None)], "created_at",
+                                       cursor=decode_cursor(request.args.get("cursor")),
+                                       limit=page_limit(request.args.get("limit")))
+        return page_response(rows, next_cursor)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print("❌ /alerts/aml error:", e)
+        request_log.log_exception("/alerts/aml", e)
         return jsonify({"error": str(e)}), 500
 
 # -----------------------
 # audit trail endpoint
 # -----------------------
+def audit_trail_query(args):
+    risk = args.get("risk")
+    name = args.get("name")
+    num = args.get("number")
+
+    query = {}
+    if risk:
+        query["overallRiskLevel"] = risk
+    if name:
+        query["userName"] = {"$regex": name, "$options": "i"}
+    if num:
+        query["documents.number"] = {"$regex": num, "$options": "i"}
+    return query
+
 @app.route("/audit_trail", methods=["GET"])
 def audit_trail():
     try:
-        risk = request.args.get("risk")
-        name = request.args.get("name")
-        num = request.args.get("number")
-
-        query = {}
-        if risk:
-            query["overallRiskLevel"] = risk
-        if name:
-            query["userName"] = {"$regex": name, "$options": "i"}
-        if num:
-            query["documents.number"] = {"$regex": num, "$options": "i"}
-
-        data = list(approved_collection.find(query)) + list(rejected_collection.find(query))
-        out = []
-        for d in data:
-            d["_id"] = str(d["_id"])
-            out.append(d)
-        return jsonify(out), 200
+        query = audit_trail_query(request.args)
+        rows, next_cursor = fetch_page([(approved_collection, None), (rejected_collection, None)], "timestamp",
+                                       match=query, cursor=decode_cursor(request.args.get("cursor")),
+                                       limit=page_limit(request.args.get("limit")))
+        return page_response(rows, next_cursor)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print("❌ /audit_trail error:", e)
+        request_log.log_exception("/audit_trail", e)
         return jsonify({"error": str(e)}), 500
 
 # -----------------------
 # blacklist CRUD
 # -----------------------
 @app.route("/blacklist", methods=["GET", "POST", "DELETE"])
+@cached_get("blacklist")
 def blacklist():
     try:
         if request.method == "GET":
@@ -516,135 +1187,263 @@ def blacklist():
 
         if request.method == "POST":
             info = request.get_json() or {}
-            entry = {"type": info.get("type"), "number": info.get("number"), "added_at": datetime.utcnow().isoformat()}
+            entry = {"type": info.get("type"), "number": info.get("number"),
+                     "numberKey": normalize_number(info.get("number")), "added_at": datetime.utcnow().isoformat()}
             res = blacklist_collection.insert_one(entry)
             entry["_id"] = str(res.inserted_id)
-            print(f"[BLACKLIST ADD] {entry}")
+            blacklist_index.add(entry["number"])
+            cache_versions.bump("blacklist")
+            request_log.log("blacklist_added", entry=entry)
             return jsonify(entry), 201
 
         if request.method == "DELETE":
             info = request.get_json() or {}
             num = info.get("number")
-            res = blacklist_collection.delete_many({"number": num})
+            key = normalize_number(num)
+            if key:
+                res = blacklist_collection.delete_many({"$or": [{"number": num}, {"numberKey": key}]})
+                blacklist_index.remove(num)
+            else:
+                res = blacklist_collection.delete_many({"number": num})
+            cache_versions.bump("blacklist")
             return jsonify({"deleted": res.deleted_count}), 200
     except Exception as e:
-        print("❌ /blacklist error:", e)
+        request_log.log_exception("/blacklist", e)
         return jsonify({"error": str(e)}), 500
 
 # -----------------------
-# all-records for dashboard
+# AML watchlist (sanctions / PEP names)
+# GET: index stats, or ?name=... to screen a name
+# POST: {name, listType, source} or {entries: [...]}
+# DELETE: {id}
 # -----------------------
-@app.route("/all-records", methods=["GET"])
-def all_records():
-    def safe_ts(val):
-        if isinstance(val, datetime):
-            return val
-        if isinstance(val, str):
-            try:
-                return datetime.fromisoformat(val)
-            except:
-                return datetime.min
-        return datetime.min
-
-    output = []
-
-    # pending
-    pending = list(collection.find())
-    for r in pending:
-        r["_id"] = str(r["_id"])
-        r["source"] = "Pending"
-        output.append(r)
+@app.route("/watchlist", methods=["GET", "POST", "DELETE"])
+def watchlist():
+    try:
+        ensure_watchlist_loaded()
+        if request.method == "GET":
+            name = request.args.get("name")
+            if name:
+                return jsonify({"name": name, "matches": watchlist_store.index.screen(name)}), 200
+            return jsonify(watchlist_store.stats()), 200
 
-    # approved
-    approved = list(approved_collection.find())
-    for r in approved:
-        r["_id"] = str(r["_id"])
-        r["source"] = "Approved"
-        output.append(r)
+        info = request.get_json() or {}
+        if request.method == "POST":
+            entries = [e for e in (info.get("entries") or [info]) if e.get("name")]
+            if not entries:
+                return jsonify({"error": "name is required"}), 400
+            ids = watchlist_store.add(entries)
+            cache_versions.bump("watchlist")    # the other processes read the change
+            request_log.log("watchlist_added", names=len(ids))
+            return jsonify({"added": len(ids), "ids": ids}), 201
 
-    # rejected
-    rejected = list(rejected_collection.find())
-    for r in rejected:
-        r["_id"] = str(r["_id"])
-        r["source"] = "Rejected"
-        output.append(r)
+        if request.method == "DELETE":
+            deleted = watchlist_store.remove(info.get("id"))
+            if deleted:
+                cache_versions.bump("watchlist")
+            return jsonify({"deleted": deleted}), 200
+    except Exception as e:
+        request_log.log_exception("/watchlist", e)
+        return jsonify({"error": str(e)}), 500
 
-    # FIXED SORT
-    output.sort(key=lambda x: safe_ts(x.get("timestamp")), reverse=True)
+# -----------------------
+# all-records for dashboard
+# newest first across pending / approved / rejected, merged in Mongo.
+# ?limit=N (default 200, max 1000), ?cursor=<X-Next-Cursor of the previous page>,
+# ?fields=full for whole records instead of the dashboard columns
+# -----------------------
+DASHBOARD_FIELDS = {"userName": 1, "documents.type": 1, "overallFraudScore": 1, "overallRiskLevel": 1,
+                    "finalStatus": 1, "status": 1, "timestamp": 1}
 
-    return jsonify(output), 200
+@app.route("/all-records", methods=["GET"])
+def all_records():
+    try:
+        projection = None if request.args.get("fields") == "full" else DASHBOARD_FIELDS
+        rows, next_cursor = fetch_page([(collection, "Pending"), (approved_collection, "Approved"),
+                                        (rejected_collection, "Rejected")], "timestamp",
+                                       cursor=decode_cursor(request.args.get("cursor")),
+                                       limit=page_limit(request.args.get("limit")), projection=projection)
+        return page_response(rows, next_cursor)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        request_log.log_exception("/all-records", e)
+        return jsonify({"error": str(e)}), 500
 
 
 # -----------------------
-# CSV export
-# /export_csv?type=all|approved|rejected|alerts
+# CSV export, streamed from batched cursors
+# /export_csv?type=all|approved|rejected|alerts&format=csv|ndjson|parquet&gzip=1
 # -----------------------
 @app.route("/export_csv", methods=["GET"])
 def export_csv():
     try:
         t = request.args.get("type", "all")
-        rows = []
-        headers = []
+        fmt = request.args.get("format", "csv").lower()
+        gz = request.args.get("gzip", "0").lower() in ("1", "true", "yes") and fmt != "parquet"
+        if fmt not in export.FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(export.FORMATS)}"}), 400
+        if fmt == "parquet" and export.pa is None:
+            return jsonify({"error": "parquet export needs pyarrow installed"}), 501
 
         if t == "alerts":
-            data = list(aml_collection.find())
-            headers = ["aml_id", "created_at", "userName", "alert_type", "number", "matches"]
-            for d in data:
-                for a in d.get("alerts", []):
-                    rows.append({
-                        "aml_id": str(d.get("_id")),
-                        "created_at": d.get("created_at"),
-                        "userName": d.get("userName"),
-                        "alert_type": a.get("type"),
-                        "number": a.get("number"),
-                        "matches": ",".join(a.get("matches", [])) if a.get("matches") else ""
-                    })
+            headers = export.ALERT_HEADERS
+            rows = export.alert_rows(export.iter_documents([aml_collection], export.ALERT_FIELDS))
         else:
             if t == "approved":
-                data = list(approved_collection.find())
+                sources = [approved_collection]
             elif t == "rejected":
-                data = list(rejected_collection.find())
+                sources = [rejected_collection]
             else:
-                data = list(collection.find()) + list(approved_collection.find()) + list(rejected_collection.find())
+                sources = [collection, approved_collection, rejected_collection]
+            headers = export.RECORD_HEADERS
+            rows = export.record_rows(export.iter_documents(sources, export.RECORD_FIELDS))
 
-            headers = ["record_id", "userName", "overallFraudScore", "overallRiskLevel", "finalStatus", "status", "timestamp", "documents_summary"]
-            for d in data:
-                rows.append({
-                    "record_id": str(d.get("_id")),
-                    "userName": d.get("userName"),
-                    "overallFraudScore": d.get("overallFraudScore"),
-                    "overallRiskLevel": d.get("overallRiskLevel"),
-                    "finalStatus": d.get("finalStatus"),
-                    "status": d.get("status"),
-                    "timestamp": d.get("timestamp"),
-                    "documents_summary": "; ".join([f"{doc.get('type')}:{doc.get('number') or 'N/A'}" for doc in d.get("documents", [])])
-                })
+        mimetype, ext = export.FORMATS[fmt]
+        filename = f"export_{t}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{ext}"
+        if gz:
+            mimetype, filename = "application/gzip", filename + ".gz"
 
-        mem = io.StringIO()
-        writer = csv.DictWriter(mem, fieldnames=headers)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow({h: r.get(h, "") for h in headers})
-        mem.seek(0)
+        def generate():
+            try:
+                for chunk in export.export_chunks(rows, headers, fmt, gzip=gz):
+                    yield chunk
+            except Exception as e:
+                # headers are already sent; the client sees a truncated file
+                request_log.log_exception("/export_csv stream", e)
+                raise
+
+        return Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={"Content-Disposition": f"attachment; filename={filename}"})
+    except Exception as e:
+        request_log.log_exception("/export_csv", e)
+        return jsonify({"error": str(e)}), 500
 
-        filename = f"export_{t}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
-        return send_file(io.BytesIO(mem.getvalue().encode("utf-8")), mimetype="text/csv",
-                         as_attachment=True, download_name=filename)
+# -----------------------
+# dashboard statistics: counters maintained on upload / review
+# ?hours=N for the hourly series (default 24, max 720)
+# -----------------------
+@app.route("/stats", methods=["GET"])
+def stats():
+    try:
+        hours = page_limit(request.args.get("hours"), default=24, maximum=720)
+        return jsonify(dashboard_stats.snapshot(hours)), 200
     except Exception as e:
-        print("❌ /export_csv error:", e)
-        traceback.print_exc()
+        request_log.log_exception("/stats", e)
         return jsonify({"error": str(e)}), 500
 
+# -----------------------
+# request id, latency / in-flight metrics and JSON request log for every
+# request; /metrics serves them in the Prometheus text format
+# -----------------------
+# endpoints reading pending records or AML alerts: with write-behind on, they
+# wait for uploads that were already answered to reach Mongo
+READ_YOUR_WRITES_ENDPOINTS = {"/records", "/alerts", "/alerts/aml", "/all-records", "/export_csv",
+                              "/graph/cluster/<id>", "/review/<id>", "/review/bulk", "/approve/<id>",
+                              "/reject/<id>"}
+
+def wait_for_uploads():
+    try:
+        if not write_behind.sync(WRITE_BEHIND_SYNC_TIMEOUT):
+            request_log.log("write_behind_sync_timeout", level="warning", pending=write_behind.pending())
+    except Exception as e:
+        request_log.log_exception("write-behind sync", e)
+
+@app.before_request
+def begin_request():
+    g.request_id = request_log.new_request_id(request.headers.get("X-Request-ID"))
+    g.endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    g.started = time.perf_counter()
+    g.started_at = datetime.utcnow().isoformat()
+    request_log.begin(g.request_id)
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.endpoint)
+    g.profile = profiler.start() if profiler else None
+    if write_behind and g.endpoint in READ_YOUR_WRITES_ENDPOINTS and not write_behind.idle():
+        wait_for_uploads()
+
+@app.after_request
+def finish_request(response):
+    if "started" not in g:
+        return response
+    elapsed = time.perf_counter() - g.started
+    g.status = response.status_code
+    REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=g.endpoint, status=response.status_code)
+    response.headers["X-Request-ID"] = g.request_id
+    if REQUEST_LOG and g.endpoint != "/metrics":
+        fields = {"method": request.method, "path": request.path, "endpoint": g.endpoint,
+                  "status": response.status_code, "ms": round(elapsed * 1000, 2)}
+        if response.status_code >= 500 and response.is_json and not response.is_streamed:
+            fields["error"] = (response.get_json(silent=True) or {}).get("error")
+        request_log.log("request", level="error" if response.status_code >= 500 else "info", **fields)
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    # runs after a streamed response is sent, so its profile covers the stream
+    if "started" not in g:
+        return
+    REQUESTS_IN_FLIGHT.dec(endpoint=g.endpoint)
+    if g.get("profile") is not None:
+        profile_id = profiler.finish(g.profile, {
+            "method": request.method, "path": request.path, "endpoint": g.endpoint,
+            "status": g.get("status", 500), "requestId": g.request_id, "started": g.started_at,
+            "error": str(exc) if exc else None})
+        if profile_id:
+            request_log.log("profile_saved", profileId=profile_id, endpoint=g.endpoint)
+    request_log.end()
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(registry.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+# -----------------------
+# /admin/profiles : recent slow / sampled request profiles (metadata, newest
+# first); /admin/profiles/<id> downloads one as collapsed stacks
+# (flamegraph.pl, speedscope)
+# -----------------------
+def profile_admin_allowed():
+    if not PROFILE_ADMIN_TOKEN:
+        return True
+    return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), PROFILE_ADMIN_TOKEN)
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    if not profile_admin_allowed():
+        return jsonify({"error": "forbidden"}), 403
+    if profiler is None:
+        return jsonify({"error": "profiling is disabled"}), 404
+    limit = page_limit(request.args.get("limit"), default=50, maximum=max(1, PROFILE_KEEP))
+    return jsonify({"profiles": profiler.list(limit), "settings": profiler.stats()}), 200
+
+@app.route("/admin/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    if not profile_admin_allowed():
+        return jsonify({"error": "forbidden"}), 403
+    path = profiler.folded_path(profile_id) if profiler else None
+    if not path:
+        return jsonify({"error": "profile not found"}), 404
+    return send_file(path, mimetype="text/plain", as_attachment=True, download_name=f"{profile_id}.folded")
+
+# -----------------------
+# OCR pool / cache / upload store stats
+# -----------------------
+@app.route("/ocr/stats", methods=["GET"])
+def ocr_stats():
+    return jsonify({"pool": ocr_pool.stats(), "cache": ocr_cache.stats(), "blobs": blob_store.stats()}), 200
+
 # -----------------------
 # simple health endpoint
 # -----------------------
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "time": datetime.utcnow().isoformat()}), 200
+    body = {"status": "ok", "time": datetime.utcnow().isoformat()}
+    if write_behind:
+        body["writeBehind"] = write_behind.stats()
+    return jsonify(body), 200
 
 # -----------------------
 # run
 # -----------------------
 if __name__ == "__main__":
-    print("Starting KycVault backend on http://127.0.0.1:5000")
+    request_log.log("server_start", url="http://127.0.0.1:5000")
     app.run(debug=True)
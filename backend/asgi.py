@@ -0,0 +1,220 @@
+# ASGI serving mode.
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 8000 [--workers N]
+#   python asgi.py                       # same, from ASGI_HOST / ASGI_PORT / ASGI_WORKERS
+#
+# The read-heavy compliance endpoints - /records, /alerts, /alerts/aml,
+# /audit_trail, GET /blacklist and /all-records - are coroutines on pymongo's
+# AsyncMongoClient: while one waits on Mongo the event loop serves the others,
+# so a process keeps thousands of dashboard requests open without a thread
+# each. Every other route (uploads, review, export, jobs, admin, ...) is the
+# Flask app behind a2wsgi, on a pool of ASGI_WSGI_THREADS threads; uploads
+# keep running OCR in the OCR process pool and the rest of the pipeline on
+# those threads, never on the event loop.
+#
+# The async routes answer exactly like their Flask versions (same bodies,
+# X-Next-Cursor / X-Request-ID headers, metrics and JSON request log), and
+# /records, /alerts and /blacklist go through the same response cache, ETags
+# and 304s (app.cache_lookup). They are not stack-sampled by /admin/profiles:
+# coroutines share the loop thread.
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from pymongo import AsyncMongoClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse as _JSONResponse, Response
+from starlette.routing import Mount, Route
+
+import metrics
+import request_log
+from app import (app as flask_app, MONGO_URI, DB_NAME, DASHBOARD_FIELDS, REQUEST_LOG, REQUEST_SECONDS,
+                 REQUESTS_IN_FLIGHT, MONGO_SECONDS, MONGO_FAILURES, READ_YOUR_WRITES_ENDPOINTS, audit_trail_query,
+                 wait_for_uploads, write_behind, collection, approved_collection, rejected_collection,
+                 aml_collection, blacklist_collection, RESPONSE_CACHE, NOT_MODIFIED, cache_lookup, response_cache)
+from pagination import (DEFAULT_LIMIT, InvalidCursor, decode_cursor, ensure_sort_index, finish_page, page_limit,
+                        page_pipeline)
+
+# threads running the Flask routes, and connections per process for the async routes
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 32))
+ASGI_MONGO_POOL = int(os.environ.get("ASGI_MONGO_POOL", 100))
+
+mongo = None    # AsyncMongoClient, created on this process's event loop
+
+
+class JSONResponse(_JSONResponse):
+    # rendered by the Flask app's JSON provider, exactly as jsonify renders it
+    # (sorted keys, compact separators, HTTP dates, trailing newline): the
+    # ETag comes from the cache key, not the body, so both servers must
+    # produce the same bytes for it
+    def render(self, content):
+        return flask_app.json.response(content).get_data()
+
+
+def async_coll(coll):
+    # the async handle of one of app.py's collections
+    return mongo[DB_NAME][coll.name]
+
+
+def ensure_read_indexes():
+    # the sort indexes fetch_page creates on first use in the Flask routes
+    for coll, field in ((aml_collection, "created_at"), (collection, "timestamp"),
+                        (approved_collection, "timestamp"), (rejected_collection, "timestamp")):
+        ensure_sort_index(coll, field)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global mongo
+    mongo = AsyncMongoClient(MONGO_URI, maxPoolSize=ASGI_MONGO_POOL,
+                             event_listeners=[metrics.MongoCommandTimer(MONGO_SECONDS, MONGO_FAILURES)])
+    await asyncio.to_thread(ensure_read_indexes)
+    try:
+        yield
+    finally:
+        await mongo.close()
+
+
+async def fetch_page_async(sources, field, match=None, cursor=None, limit=DEFAULT_LIMIT, projection=None):
+    first, pipeline = page_pipeline([(async_coll(c), label) for c, label in sources], field,
+                                    match=match, cursor=cursor, limit=limit, projection=projection)
+    rows = await (await first.aggregate(pipeline)).to_list()
+    return finish_page(rows, field, limit)
+
+
+def rows_response(rows):
+    for d in rows:
+        d["_id"] = str(d["_id"])
+    return JSONResponse(rows)
+
+
+def page_response(rows, next_cursor):
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(rows, headers=headers)
+
+
+def etag_matcher(header):
+    # If-None-Match header -> etag -> whether it lists it (weak comparison)
+    tags = {t.strip().removeprefix("W/").strip('"') for t in (header or "").split(",")}
+    return lambda etag: "*" in tags or etag in tags
+
+
+async def cached(rule, request, handler, datasets):
+    # app.cached_get for an async handler
+    key, versions, etag, hit = await asyncio.to_thread(
+        cache_lookup, rule, request.query_params.multi_items(), datasets,
+        etag_matcher(request.headers.get("if-none-match")))
+    if hit == NOT_MODIFIED:
+        response = Response(status_code=304)
+    elif hit:
+        response = Response(hit[0], headers={"Content-Type": hit[1]})
+    else:
+        response = await handler(request)
+        if response.status_code != 200:
+            return response
+        response_cache.put(key, versions, response.body, response.headers["content-type"])
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def endpoint(rule, handler, datasets=()):
+    # GET route for an async handler, with what app.py's request hooks add;
+    # `datasets` as for app.cached_get
+    async def run(request):
+        request_id = request_log.new_request_id(request.headers.get("X-Request-ID"))
+        request_log.begin(request_id)
+        REQUESTS_IN_FLIGHT.inc(endpoint=rule)
+        started = time.perf_counter()
+        error = None
+        try:
+            try:
+                if write_behind and rule in READ_YOUR_WRITES_ENDPOINTS and not write_behind.idle():
+                    await asyncio.to_thread(wait_for_uploads)
+                if datasets and RESPONSE_CACHE:
+                    response = await cached(rule, request, handler, datasets)
+                else:
+                    response = await handler(request)
+            except InvalidCursor as e:
+                response = JSONResponse({"error": str(e)}, 400)
+            except Exception as e:
+                request_log.log_exception(rule, e)
+                error = str(e)
+                response = JSONResponse({"error": error}, 500)
+            elapsed = time.perf_counter() - started
+            REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=rule, status=response.status_code)
+            response.headers["X-Request-ID"] = request_id
+            if REQUEST_LOG:
+                fields = {"method": request.method, "path": request.url.path, "endpoint": rule,
+                          "status": response.status_code, "ms": round(elapsed * 1000, 2)}
+                if error:
+                    fields["error"] = error
+                request_log.log("request", level="error" if error else "info", **fields)
+            return response
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=rule)
+            request_log.end()
+    return Route(rule, run, methods=["GET"])
+
+
+# -----------------------
+# async read endpoints (see app.py for the Flask versions)
+# -----------------------
+async def records(request):
+    return rows_response(await async_coll(collection).find({"status": "Pending"})
+                         .sort([("_id", -1)]).limit(500).to_list())
+
+async def alerts(request):
+    return rows_response(await async_coll(collection).find({"overallRiskLevel": "High"}).to_list())
+
+async def aml_alerts(request):
+    rows, next_cursor = await fetch_page_async([(aml_collection, None)], "created_at",
+                                               cursor=decode_cursor(request.query_params.get("cursor")),
+                                               limit=page_limit(request.query_params.get("limit")))
+    return page_response(rows, next_cursor)
+
+async def audit_trail(request):
+    rows, next_cursor = await fetch_page_async([(approved_collection, None), (rejected_collection, None)],
+                                               "timestamp", match=audit_trail_query(request.query_params),
+                                               cursor=decode_cursor(request.query_params.get("cursor")),
+                                               limit=page_limit(request.query_params.get("limit")))
+    return page_response(rows, next_cursor)
+
+async def blacklist(request):
+    return rows_response(await async_coll(blacklist_collection).find().to_list())
+
+async def all_records(request):
+    projection = None if request.query_params.get("fields") == "full" else DASHBOARD_FIELDS
+    rows, next_cursor = await fetch_page_async([(collection, "Pending"), (approved_collection, "Approved"),
+                                                (rejected_collection, "Rejected")], "timestamp",
+                                               cursor=decode_cursor(request.query_params.get("cursor")),
+                                               limit=page_limit(request.query_params.get("limit")),
+                                               projection=projection)
+    return page_response(rows, next_cursor)
+
+
+# GET /blacklist is async; POST / DELETE /blacklist fall through to the Flask
+# mount (Starlette only answers 405 when no later route takes the method)
+app = Starlette(
+    routes=[
+        endpoint("/records", records, ("records",)),
+        endpoint("/alerts", alerts, ("records",)),
+        endpoint("/alerts/aml", aml_alerts),
+        endpoint("/audit_trail", audit_trail),
+        endpoint("/blacklist", blacklist, ("blacklist",)),
+        endpoint("/all-records", all_records),
+        Mount("/", WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+                           expose_headers=["X-Next-Cursor", "X-Request-ID"])],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:app", host=os.environ.get("ASGI_HOST", "127.0.0.1"),
+                port=int(os.environ.get("ASGI_PORT", 8000)), workers=int(os.environ.get("ASGI_WORKERS", 1)))
@@ -0,0 +1,121 @@
+# Batch onboarding input: an archive of document images plus a manifest of
+# applicant fields.
+#
+# Manifest (JSON array, or CSV with a header row), one entry per applicant:
+#   applicantId, userName, userDob, userGender, aadhar, pan, dl
+# where aadhar / pan / dl name a member of the archive (or a multipart file
+# field). The manifest comes from the "manifest" form file or field, or from a
+# manifest.json / manifest.csv member of the archive.
+#
+# The archive is spooled to a temporary file the batch owns (request streams
+# are closed before a streamed response finishes). Members are read one
+# applicant at a time, right before that applicant is processed, so only the
+# applicants in flight are ever unpacked.
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from blobs import read_upload
+
+DOCUMENT_FIELDS = [("aadhar", "Aadhaar"), ("pan", "PAN"), ("dl", "Driving Licence")]
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_manifest(raw, name=""):
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8-sig")
+    raw = raw.strip()
+    if not raw:
+        raise BatchError("manifest is empty")
+    if name.lower().endswith(".json") or raw[:1] in "[{":
+        try:
+            rows = json.loads(raw)
+        except ValueError as e:
+            raise BatchError(f"manifest is not valid JSON: {e}")
+        if isinstance(rows, dict):
+            rows = rows.get("applicants") or []
+    else:
+        rows = list(csv.DictReader(io.StringIO(raw)))
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise BatchError("manifest must be a list of applicants")
+    out = []
+    for i, r in enumerate(rows):
+        out.append({
+            "applicantId": str(r.get("applicantId") or r.get("id") or i + 1),
+            "userName": (r.get("userName") or "").strip(),
+            "userDob": (r.get("userDob") or "").strip(),
+            "userGender": (r.get("userGender") or "").strip().lower(),
+            "documents": [(field, label, (r.get(field) or "").strip())
+                          for field, label in DOCUMENT_FIELDS if (r.get(field) or "").strip()],
+        })
+    return out
+
+
+class BatchArchive:
+    # zip members by name, opened lazily; `files` are extra multipart uploads
+    # the manifest may refer to instead of archive members
+    def __init__(self, stream, files=None, max_member_bytes=20 * 1024 * 1024, spool_threshold=8 * 1024 * 1024):
+        self.spool = None
+        self.zip = None
+        self.files = files or {}
+        self.saved = {}
+        self.max_member_bytes = max_member_bytes
+        self.spool_threshold = spool_threshold
+        self.members = {}
+        if stream is not None:
+            self.spool = tempfile.TemporaryFile()
+            shutil.copyfileobj(stream, self.spool, 1024 * 1024)
+            self.spool.seek(0)
+            try:
+                self.zip = zipfile.ZipFile(self.spool)
+            except zipfile.BadZipFile:
+                self.spool.close()
+                raise BatchError("archive is not a valid zip file")
+            for info in self.zip.infolist():
+                if not info.is_dir():
+                    self.members[info.filename] = info
+
+    def manifest(self):
+        if self.zip is None:
+            return None
+        for info_name in self.members:
+            if os.path.basename(info_name).lower() in MANIFEST_NAMES:
+                with self.zip.open(self.members[info_name]) as fh:
+                    return parse_manifest(fh.read(), info_name)
+        return None
+
+    def read_files(self, applicants, read_file):
+        # multipart files the manifest refers to are read while the request
+        # is still open; read_file(FileStorage) -> Upload
+        for a in applicants:
+            for _, _, ref in a["documents"]:
+                if ref not in self.members and ref in self.files and ref not in self.saved:
+                    self.saved[ref] = read_file(self.files[ref])
+
+    def read(self, ref, blob_store):
+        # one document as an Upload, stored in blob_store
+        info = self.members.get(ref)
+        if info is not None:
+            if info.file_size > self.max_member_bytes:
+                raise BatchError(f"{ref} is larger than {self.max_member_bytes} bytes")
+            with self.zip.open(info) as src:
+                up = read_upload(src, os.path.basename(ref), self.spool_threshold, blob_store.spool_dir)
+            blob_store.store(up)
+            return up
+        if ref in self.saved:
+            return self.saved[ref]
+        raise BatchError(f"{ref} not found in the archive")
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.spool is not None:
+            self.spool.close()
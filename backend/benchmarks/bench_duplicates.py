@@ -0,0 +1,104 @@
+# Duplicate-number lookup time vs collection size: the old unanchored $regex over
+# the three record collections against the indexed document_numbers lookup.
+#
+#   python benchmarks/bench_duplicates.py [--sizes 1000,10000,100000] [--mongo mongodb://localhost:27017/]
+#
+# Writes into a throwaway database (KYCDB_bench) which is dropped at the end.
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from doc_numbers import DocumentNumberIndex
+
+
+def synthetic_records(n, seed):
+    rng = random.Random(seed)
+    for i in range(n):
+        aadhaar = "".join(rng.choice("0123456789") for _ in range(12))
+        pan = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5)) + f"{rng.randrange(10000):04d}" + "Z"
+        yield {
+            "userName": f"Applicant {i}",
+            "documents": [
+                {"type": "Aadhaar", "number": f"{aadhaar[:4]} {aadhaar[4:8]} {aadhaar[8:]}"},
+                {"type": "PAN", "number": pan},
+            ],
+            "timestamp": f"2024-01-01T00:00:{i % 60:02d}",
+        }
+
+
+def legacy_find(colls, num):
+    query = {"documents.number": {"$regex": re.escape(str(num)), "$options": "i"}}
+    out = []
+    for c in colls:
+        out += list(c.find(query))
+    return out
+
+
+def timed(fn, probes):
+    samples = []
+    for p in probes:
+        t = time.perf_counter()
+        fn(p)
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return {"p50_ms": statistics.median(samples) * 1000,
+            "p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--probes", type=int, default=50)
+    ap.add_argument("--mongo", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    client = MongoClient(args.mongo)
+    db = client["KYCDB_bench"]
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            client.drop_database("KYCDB_bench")
+            colls = [db["extracted"], db["approved_records"], db["rejected_records"]]
+            index = DocumentNumberIndex(db["document_numbers"])
+            statuses = ["Pending", "Approved", "Rejected"]
+            numbers = []
+            batch = []
+            for i, rec in enumerate(synthetic_records(size, seed=size)):
+                batch.append(rec)
+                if len(batch) == 5000:
+                    colls[i % 3].insert_many(batch)
+                    batch = []
+            if batch:
+                colls[0].insert_many(batch)
+            t = time.perf_counter()
+            index.backfill(dict(zip(statuses, colls)), batch_size=5000)
+            backfill_s = time.perf_counter() - t
+            for c in colls:
+                numbers += [d["documents"][0]["number"] for d in c.aggregate([{"$sample": {"size": args.probes}}])]
+            probes = random.Random(1).sample(numbers, min(args.probes, len(numbers)))
+
+            row = {"records": size, "backfill_s": backfill_s,
+                   "legacy_regex": timed(lambda n: legacy_find(colls, n), probes),
+                   "indexed": timed(index.find, probes)}
+            results.append(row)
+            print(f"{size:>9} records  legacy p50 {row['legacy_regex']['p50_ms']:9.2f} ms"
+                  f"  indexed p50 {row['indexed']['p50_ms']:7.3f} ms  (backfill {backfill_s:.1f} s)")
+    finally:
+        client.drop_database("KYCDB_bench")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Export memory ceiling: stream 1M synthetic records through the export path.
+#
+#   python benchmarks/bench_export.py [--records 1000000] [--ceiling-mb 32] [--formats csv,ndjson,parquet]
+#                                     [--mongo mongodb://localhost:27017/] [--out results.json]
+#
+# Without --mongo the records come from a generator standing in for the
+# batched cursor, which isolates the encoder: peak traced memory must stay
+# under --ceiling-mb however many records go through (exit code 1 if not).
+# With --mongo the records are inserted into KYCDB_bench.export_bench and read
+# back through iter_documents. The old build-everything-then-copy export is
+# timed on a slice and its peak extrapolated for comparison.
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export
+
+LEVELS = ["Low", "Medium", "High"]
+TYPES = ["Aadhaar", "PAN", "Driving Licence"]
+
+
+def synthetic_records(n, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        docs = [{"type": t, "number": f"{rng.randrange(10 ** 11, 10 ** 12)}"} for t in rng.sample(TYPES, rng.randint(1, 3))]
+        score = rng.randint(0, 100)
+        yield {
+            "_id": ObjectId(),
+            "userName": f"User {i}",
+            "overallFraudScore": score,
+            "overallRiskLevel": LEVELS[min(2, score // 34)],
+            "finalStatus": "Auto-Verified" if score < 34 else "Review",
+            "status": "Pending",
+            "timestamp": f"2026-01-{1 + i % 28:02d}T10:{i % 60:02d}:00",
+            "documents": docs,
+        }
+
+
+def legacy_export(docs):
+    rows = list(export.record_rows(list(docs)))
+    mem = io.StringIO()
+    writer = csv.DictWriter(mem, fieldnames=export.RECORD_HEADERS)
+    writer.writeheader()
+    for r in rows:
+        writer.writerow(r)
+    return io.BytesIO(mem.getvalue().encode("utf-8"))
+
+
+def measure(fn):
+    tracemalloc.start()
+    t = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=1000000)
+    ap.add_argument("--ceiling-mb", type=float, default=32)
+    ap.add_argument("--formats", default="csv,ndjson,csv+gzip,parquet")
+    ap.add_argument("--legacy-slice", type=int, default=50000)
+    ap.add_argument("--mongo")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    source = lambda: synthetic_records(args.records)
+    if args.mongo:
+        from pymongo import MongoClient
+        coll = MongoClient(args.mongo)["KYCDB_bench"]["export_bench"]
+        if coll.estimated_document_count() != args.records:
+            coll.drop()
+            batch = []
+            for rec in synthetic_records(args.records):
+                batch.append(rec)
+                if len(batch) == 10000:
+                    coll.insert_many(batch)
+                    batch = []
+            if batch:
+                coll.insert_many(batch)
+        source = lambda: export.iter_documents([coll], export.RECORD_FIELDS)
+
+    results, ok = [], True
+    for name in args.formats.split(","):
+        fmt, _, gz = name.partition("+")
+        if fmt == "parquet" and export.pa is None:
+            print(f"{name:>10}  skipped (pyarrow not installed)")
+            continue
+
+        def run():
+            total = 0
+            for chunk in export.export_chunks(export.record_rows(source()), export.RECORD_HEADERS, fmt, gzip=bool(gz)):
+                total += len(chunk)
+            return total
+
+        size, elapsed, peak = measure(run)
+        row = {"format": name, "records": args.records, "bytes": size, "seconds": elapsed,
+               "records_per_s": args.records / elapsed, "peak_mb": peak / 2 ** 20}
+        ok = ok and row["peak_mb"] <= args.ceiling_mb
+        results.append(row)
+        print(f"{name:>10}  {args.records} records  {size / 2 ** 20:8.1f} MB out  {elapsed:6.1f} s"
+              f"  {row['records_per_s']:9.0f} rec/s  peak {row['peak_mb']:6.1f} MB")
+
+    n = min(args.legacy_slice, args.records)
+    _, elapsed, peak = measure(lambda: legacy_export(synthetic_records(n)))
+    legacy = {"format": "legacy csv", "records": n, "seconds": elapsed, "peak_mb": peak / 2 ** 20,
+              "peak_mb_extrapolated": peak / 2 ** 20 * args.records / n}
+    results.append(legacy)
+    print(f"{'legacy':>10}  {n} records  {elapsed:6.1f} s  peak {legacy['peak_mb']:6.1f} MB"
+          f"  (~{legacy['peak_mb_extrapolated']:.0f} MB at {args.records})")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    if not ok:
+        print(f"FAIL: peak above {args.ceiling_mb} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# Micro-benchmark: registry extractor (extractors.py) vs the original chain of
+# per-type re.search fallbacks, over a synthetic corpus of OCR-like texts.
+#
+#   python benchmarks/bench_extract.py [--texts 20000] [--seed 0] [--out results.json]
+#
+# Also reports how many texts the two disagree on. Texts classified as one of
+# the newly registered types (Voter ID, Passport) are counted separately, since
+# the original code had no branch for them.
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import extract_details_from_text
+
+NEW_TYPES = ("Voter ID", "Passport")
+
+
+# --- original implementation, kept verbatim for comparison ---
+def find_name_loose(text):
+    if not text:
+        return None
+    # look for explicit label
+    m = re.search(r"(?:Name|Naam|नाम)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{1,120})", text, re.IGNORECASE)
+    if m:
+        cand = m.group(1).strip()
+        cand = re.split(r"\s{2,}|,|DOB|D\.O\.B|Father|S\/O|S\.O\.", cand, maxsplit=1)[0].strip()
+        return cand
+    # a few heuristics on first lines
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    for ln in lines[:10]:
+        if re.match(r"^[A-Z][a-z]+(?:\s[A-Z][a-z]+)+$", ln):
+            return ln
+        if re.match(r"^[A-Z\s]{3,}$", ln) and len(ln.split()) >= 2:
+            return ln.title()
+    for ln in lines[:12]:
+        if re.match(r"^[A-Za-z][A-Za-z\s\.'\-]{3,}$", ln) and len(ln.split()) >= 2:
+            return ln
+    return None
+
+def find_father_name_loose(text):
+    if not text:
+        return None
+    m = re.search(r"(?:Father|Father's Name|FATHER|S\/O|S\.O\.|Shri)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{2,80})", text, re.IGNORECASE)
+    if m:
+        return m.group(1).strip()
+    m = re.search(r"\b(?:S\/O|D\/O|Son of|Daughter of)\s+([A-Za-z][A-Za-z\s\.\-]{2,80})", text, re.IGNORECASE)
+    if m:
+        return m.group(1).strip()
+    return None
+
+def normalize_date_string(s):
+    s = (s or "").strip()
+    parts = re.split(r"[-/\.]", s)
+    if len(parts) == 3:
+        # handle yyyy-mm-dd and dd-mm-yyyy
+        if len(parts[0]) == 4:
+            yyyy, mm, dd = parts
+        else:
+            dd, mm, yyyy = parts
+        if len(yyyy) == 2:
+            yy = int(yyyy)
+            yyyy = f"19{yyyy}" if yy > 30 else f"20{yyyy}"
+        try:
+            return f"{str(int(dd)).zfill(2)}/{str(int(mm)).zfill(2)}/{int(yyyy)}"
+        except:
+            return s
+    return s
+
+def find_dob_loose(text):
+    if not text:
+        return None
+    m = re.search(r"(?:DOB|D\.O\.B|Date of Birth|Birth)[:\s\-]*([0-9]{1,4}[-/\.][0-9]{1,2}[-/\.][0-9]{2,4})", text, re.IGNORECASE)
+    if m:
+        return normalize_date_string(m.group(1))
+    m = re.search(r"([0-9]{2}[-/\.][0-9]{2}[-/\.][0-9]{4})", text)
+    if m:
+        return normalize_date_string(m.group(1))
+    return None
+
+def find_gender_loose(text):
+    if not text:
+        return None
+    m = re.search(r"\b(Male|Female|Other|M|F)\b", text, re.IGNORECASE)
+    if not m:
+        return None
+    g = m.group(1).lower()
+    if g in ("m", "male"):
+        return "Male"
+    if g in ("f", "female"):
+        return "Female"
+    return "Other"
+
+# --- Patterns for document numbers ---
+AADHAAR_SPACED = re.compile(r"\b\d{4}\s\d{4}\s\d{4}\b")
+AADHAAR_CONTIG = re.compile(r"\b\d{12}\b")
+PAN_PATTERN = re.compile(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", re.IGNORECASE)
+DL_PATTERN = re.compile(r"\b[A-Z]{2}\d{2}\s?\d{6,12}\b", re.IGNORECASE)
+
+def legacy_extract_details_from_text(text):
+    out = {
+        "Document Type": "Unknown",
+        "Name": None,
+        "FatherName": None,
+        "DOB": None,
+        "Gender": None,
+        "number": None,
+        "fraudScore": 30,
+        "reasons": []
+    }
+    if not text:
+        out["reasons"].append("No OCR text")
+        out["fraudScore"] = 80
+        return out
+
+    m = AADHAAR_SPACED.search(text) or AADHAAR_CONTIG.search(text)
+    if m:
+        digits = re.sub(r"\D", "", m.group(0))
+        if len(digits) >= 12:
+            out["Document Type"] = "Aadhaar"
+            out["number"] = f"{digits[:4]} {digits[4:8]} {digits[8:12]}"
+        else:
+            out["number"] = m.group(0)
+        out["Name"] = find_name_loose(text)
+        out["FatherName"] = find_father_name_loose(text)
+        out["DOB"] = find_dob_loose(text)
+        out["Gender"] = find_gender_loose(text)
+        out["fraudScore"] = 10
+        return out
+
+    m = PAN_PATTERN.search(text)
+    if m:
+        out["Document Type"] = "PAN"
+        out["number"] = m.group(0).upper()
+        out["Name"] = find_name_loose(text)
+        out["FatherName"] = find_father_name_loose(text)
+        out["fraudScore"] = 15
+        return out
+
+    m = DL_PATTERN.search(text)
+    if m:
+        out["Document Type"] = "Driving Licence"
+        out["number"] = m.group(0).upper()
+        out["Name"] = find_name_loose(text)
+        out["FatherName"] = find_father_name_loose(text)
+        out["DOB"] = find_dob_loose(text)
+        out["fraudScore"] = 20
+        return out
+
+    out["reasons"].append("Document not recognized")
+    out["fraudScore"] = 80
+    return out
+
+
+
+# --- synthetic OCR texts ---
+FIRST = ["Rahul", "Suresh", "Priya", "Anita", "Mohammed", "Lakshmi", "Arjun"]
+LAST = ["Sharma", "Khan", "Reddy", "Iyer", "Patel"]
+HEADERS = ["GOVERNMENT OF INDIA", "INCOME TAX DEPARTMENT", "Union of India", "DRIVING LICENCE",
+           "ELECTION COMMISSION OF INDIA", "REPUBLIC OF INDIA PASSPORT", "", "~~ |:; noise"]
+
+
+def digits(r, n):
+    return "".join(r.choice("0123456789") for _ in range(n))
+
+
+def letters(r, n):
+    return "".join(r.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(n))
+
+
+def person(r):
+    return f"{r.choice(FIRST)} {r.choice(LAST)}"
+
+
+def any_case(r, s):
+    return r.choice([s, s.upper(), s.lower(), s.title()])
+
+
+def doc_number(r, kind):
+    if kind == "aadhaar":
+        return f"{digits(r, 4)} {digits(r, 4)} {digits(r, 4)}"
+    if kind == "aadhaar_contig":
+        return digits(r, 12)
+    if kind == "pan":
+        return any_case(r, letters(r, 5)) + digits(r, 4) + letters(r, 1)
+    if kind == "dl":
+        return letters(r, 2) + digits(r, 2) + digits(r, r.randint(6, 12))
+    if kind == "dl_spaced":
+        return letters(r, 2) + digits(r, 2) + " " + digits(r, r.randint(5, 13))
+    if kind == "voter":
+        return letters(r, 3) + digits(r, 7)
+    if kind == "passport":
+        return letters(r, 1) + digits(r, 7)
+    return digits(r, r.randint(3, 9))
+
+
+def ocr_text(r):
+    dob = (f"{r.randint(1, 28):02d}{r.choice('/-.')}{r.randint(1, 12):02d}{r.choice('/-.')}"
+           f"{r.choice([str(r.randint(1950, 2005)), str(r.randint(50, 99))])}")
+    lines = [r.choice(HEADERS)]
+    if r.random() < 0.7:
+        lines.append(f"{any_case(r, r.choice(['Name', 'Naam', 'NAME']))}{r.choice([': ', ':', ' - ', ' '])}{any_case(r, person(r))}")
+    else:
+        lines.append(any_case(r, person(r)))
+    if r.random() < 0.6:
+        lines.append(f"{r.choice(['Father', 'S/O', 'D/O', 'Son of', 'Shri', 'Father' + chr(39) + 's Name'])}{r.choice([': ', ' '])}{person(r)}")
+    if r.random() < 0.7:
+        lines.append(f"{r.choice(['DOB', 'D.O.B', 'Date of Birth', 'Year of Birth', 'dob'])}{r.choice([': ', ':', ' '])}{dob}")
+    elif r.random() < 0.5:
+        lines.append(dob)
+    if r.random() < 0.6:
+        lines.append(r.choice(["Male", "FEMALE", "M", "F", "Other", "male / MALE"]))
+    kind = r.choice(["aadhaar", "aadhaar_contig", "pan", "dl", "dl_spaced", "unknown", "voter", "passport"])
+    lines.insert(r.randint(0, len(lines)), r.choice(["", "No. ", "ID:", "x", "1"]) + doc_number(r, kind))
+    # address / noise lines full of digit runs
+    filler = lambda: r.choice(["Address", "H.No", digits(r, r.randint(1, 6)), "Street", "Mumbai",
+                               letters(r, r.randint(1, 6)), "PIN " + digits(r, 6), dob])
+    for _ in range(r.randint(0, 4)):
+        lines.insert(r.randint(0, len(lines)), " ".join(filler() for _ in range(r.randint(1, 8))))
+    text = "\n".join(ln for ln in lines if ln)
+    if r.random() < 0.1:
+        text = text.replace("\n", " ")
+    return text
+
+
+def corpus(n, seed=0):
+    r = random.Random(seed)
+    return [ocr_text(r) for _ in range(n)]
+
+
+def timed(fn, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for x in texts:
+            fn(x)
+        el = time.perf_counter() - t
+        best = el if best is None else min(best, el)
+    return best / len(texts)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    texts = corpus(args.texts, args.seed)
+    same = new_type = differ = 0
+    types = Counter()
+    for t in texts:
+        a, b = legacy_extract_details_from_text(t), extract_details_from_text(t)
+        types[b["Document Type"]] += 1
+        if a == b:
+            same += 1
+        elif b["Document Type"] in NEW_TYPES and a["Document Type"] == "Unknown":
+            new_type += 1
+        else:
+            differ += 1
+
+    legacy_s = timed(legacy_extract_details_from_text, texts, args.repeat)
+    new_s = timed(extract_details_from_text, texts, args.repeat)
+    result = {
+        "texts": len(texts),
+        "legacy_us": legacy_s * 1e6,
+        "registry_us": new_s * 1e6,
+        "speedup": legacy_s / new_s,
+        "identical": same,
+        "newlyRecognized": new_type,
+        "different": differ,
+        "documentTypes": dict(types),
+    }
+    print(f"{len(texts)} texts: legacy {result['legacy_us']:.1f} us/text, registry {result['registry_us']:.1f} us/text"
+          f" ({result['speedup']:.2f}x)")
+    print(f"identical {same}, newly recognized types {new_type}, different {differ}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Identity-graph build and lookup cost at 100k / 1M records, and ring scoring.
+#
+#   python benchmarks/bench_identity_graph.py [--sizes 100000,1000000] [--rings 200]
+#                                             [--queries 2000] [--out results.json]
+#
+# Records get 4-5 random keys (numbers, name + DOB, father + DOB)
+# and go straight into the in-memory union-find (no Mongo). Planted rings of
+# 3-12 records share keys with each other: a number reused across two records,
+# one father + DOB. A share of names + DOBs is common enough to pass
+# the key degree cap, so hot keys are exercised too. Reports the per-record
+# insert cost, ring-size lookup latency, memory held by the graph, whether
+# every planted ring is found at full size, and cluster_score time per size.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from identity_graph import IdentityGraph, cluster_score
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def graph_bytes(graph):
+    # node dict (table + int key and value objects) and the four int arrays
+    ints = sys.getsizeof(2 ** 63) + sys.getsizeof(2 ** 20)
+    arrays = (graph._parent, graph._size, graph._records, graph._degree)
+    return (sys.getsizeof(graph._nodes) + len(graph._nodes) * ints
+            + sum(a.buffer_info()[1] * a.itemsize for a in arrays))
+
+
+def random_keys(rng, i):
+    dob = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}"
+    keys = [f"num:{i:012d}", f"num:P{i:09d}", f"fd:father {i}|{dob}"]
+    # 1 in 20 names is one of 200 common ones (with a common DOB): hot keys
+    if rng.random() < 0.05:
+        keys.append(f"nd:common {rng.randrange(200)}|01/01/1990")
+    else:
+        keys.append(f"nd:name {i}|{dob}")
+    return keys
+
+
+def ring_records(rng, ring, size):
+    # each member shares a number with the next, and some share a father
+    out = []
+    for m in range(size):
+        keys = [f"num:R{ring:06d}-{m}", f"num:R{ring:06d}-{(m + 1) % size}", f"nd:ring {ring} member {m}|02/02/1980"]
+        if rng.random() < 0.5:
+            keys.append(f"fd:ring father {ring}|03/03/1960")
+        out.append(keys)
+    return out
+
+
+def bench_size(n, rings, queries, seed):
+    rng = random.Random(seed)
+    graph = IdentityGraph(None)
+    graph._loaded, graph._refreshed_at = True, float("inf")
+
+    planted = [ring_records(rng, r, rng.randint(3, 12)) for r in range(rings)]
+    t = time.perf_counter()
+    for i in range(n):
+        graph._add(random_keys(rng, i))
+    for members in planted:
+        for keys in members:
+            graph._add(keys)
+    build_s = time.perf_counter() - t
+    mem = graph_bytes(graph)
+
+    # a new applicant re-using one number of a planted ring must see the whole ring
+    found = sum(graph.linked_records([members[0][0]]) == len(members) for members in planted)
+
+    samples = []
+    for _ in range(queries):
+        keys = random_keys(rng, rng.randrange(n))
+        t = time.perf_counter()
+        graph.linked_records(keys)
+        samples.append((time.perf_counter() - t) * 1e6)
+
+    total = n + sum(len(m) for m in planted)
+    return {
+        "records": total,
+        "keys": len(graph._nodes),
+        "build_s": build_s,
+        "insert_us": build_s / total * 1e6,
+        "lookup_p50_us": pct(samples, 0.5),
+        "lookup_p95_us": pct(samples, 0.95),
+        "memory_mb": mem / 1e6,
+        "bytes_per_key": mem / len(graph._nodes),
+        "rings_found": found,
+        "rings": rings,
+    }
+
+
+def bench_scoring(sizes, seed):
+    rng = random.Random(seed)
+    out = []
+    for size in sizes:
+        members = {f"r{m}": keys for m, keys in enumerate(ring_records(rng, 0, size))}
+        runs = max(3, 2000 // size)
+        t = time.perf_counter()
+        for _ in range(runs):
+            score = cluster_score(members)
+        out.append({"size": size, "score_ms": (time.perf_counter() - t) / runs * 1000,
+                    "density": score["density"], "linkedPairs": score["linkedPairs"]})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--rings", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    results = {"graph": [], "scoring": []}
+    for n in (int(s) for s in args.sizes.split(",")):
+        r = bench_size(n, args.rings, args.queries, args.seed)
+        results["graph"].append(r)
+        print(f"{r['records']:>9} records {r['keys']:>9} keys  build {r['build_s']:6.1f} s ({r['insert_us']:.1f} us/record)"
+              f"  lookup p50 {r['lookup_p50_us']:.1f} us p95 {r['lookup_p95_us']:.1f} us"
+              f"  memory {r['memory_mb']:.0f} MB ({r['bytes_per_key']:.0f} B/key)"
+              f"  rings found {r['rings_found']}/{r['rings']}")
+
+    results["scoring"] = bench_scoring([10, 50, 200, 500], args.seed)
+    for r in results["scoring"]:
+        print(f"cluster_score {r['size']:>4} records  {r['score_ms']:7.2f} ms  density {r['density']:.3f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Near-duplicate image lookup latency at 100k / 1M indexed images.
+#
+#   python benchmarks/bench_image_hash.py [--sizes 100000,1000000] [--queries 1000] [--out results.json]
+#
+# The index is filled with random 64-bit hash pairs (no Mongo: entries go
+# straight into the in-memory tables), each with a document number. Queries
+# are indexed hashes with 0..8 random bit flips and the same number, which
+# must be found, plus random hashes, which must not.
+# Also times hashing a 12 MP phone-sized JPEG, the per-document cost on upload.
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_hash import ImageHashIndex, image_hashes
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def flip(h, k, rng):
+    for b in rng.sample(range(64), k):
+        h ^= 1 << b
+    return h
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rng = random.Random(size)
+        index = ImageHashIndex(None)
+        index._loaded, index._refreshed_at, index.refresh_interval = True, time.time(), float("inf")
+        hashes = [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(size)]
+        t = time.perf_counter()
+        for i, (ph, dh) in enumerate(hashes):
+            index._add(ph, dh, {"recordId": i, "fields": {"number": str(i)}})
+        build_s = time.perf_counter() - t
+
+        samples, found, listed, false_hits = [], 0, 0, 0
+        for q in range(args.queries):
+            if q % 2 == 0:
+                i = rng.randrange(size)
+                ph, dh = hashes[i]
+                query = {"phash": flip(ph, rng.randint(0, 8), rng), "dhash": flip(dh, rng.randint(0, 8), rng)}
+                fields = {"number": str(i)}
+                expect = i
+                listed += 1
+            else:
+                query = {"phash": rng.getrandbits(64), "dhash": rng.getrandbits(64)}
+                fields = {"number": "query"}
+                expect = None
+            t = time.perf_counter()
+            hits = index.near(query, fields)
+            samples.append(time.perf_counter() - t)
+            if expect is not None and any(h["recordId"] == expect for h in hits):
+                found += 1
+            if expect is None and hits:
+                false_hits += 1
+
+        row = {
+            "images": size,
+            "build_s": build_s,
+            "p50_ms": pct(samples, 0.50) * 1000,
+            "p95_ms": pct(samples, 0.95) * 1000,
+            "p99_ms": pct(samples, 0.99) * 1000,
+            "recall": found / listed,
+            "false_hits": false_hits,
+        }
+        results.append(row)
+        print(f"{size:>9} images  build {build_s:5.1f} s  p50 {row['p50_ms']:5.2f} ms  p95 {row['p95_ms']:5.2f} ms"
+              f"  p99 {row['p99_ms']:5.2f} ms  recall {row['recall']:.1%}  false hits {false_hits}")
+
+    # hashing cost per uploaded document
+    rng = np.random.default_rng(0)
+    # smooth gradient + mild sensor noise, closer to a photo than pure noise
+    yy, xx = np.mgrid[0:3000, 0:4000]
+    base = (xx / 4000 * 160 + yy / 3000 * 60)[..., None] + rng.normal(0, 6, (3000, 4000, 3))
+    photo = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    photo.save(buf, "JPEG", quality=90)
+    data = buf.getvalue()
+    t = time.perf_counter()
+    for _ in range(10):
+        image_hashes(data)
+    hash_ms = (time.perf_counter() - t) / 10 * 1000
+    results.append({"hash_12mp_jpeg_ms": hash_ms})
+    print(f"hashing a 12 MP JPEG: {hash_ms:.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Per-image OCR cost of the pooled tesserocr engine vs pytesseract.
+#
+#   python benchmarks/bench_ocr_engines.py [--count 20] [--width 600] [--runs 3] [--out results.json]
+#
+# Both engines read the same synthetic ID card crops (benchmarks/synthetic_docs.py)
+# after the same preprocessing. Also times a 64x32 blank image, where
+# recognition is close to free, so its time is the fixed per-image overhead
+# (for pytesseract: temp file, process start, language data load). Engine
+# start-up (tesserocr loading language data once) is reported separately.
+# Engines that cannot be loaded here are listed and skipped.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr import PytesseractEngine, TesserocrEngine, ocr_image
+from synthetic_docs import generate
+
+ENGINES = {"pytesseract": PytesseractEngine, "tesserocr": TesserocrEngine}
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def time_images(engine, images, runs):
+    samples, texts = [], []
+    for _ in range(runs):
+        texts = []
+        for data in images:
+            t = time.perf_counter()
+            text, timings = ocr_image(data, engine=engine)
+            if "ocr" not in timings:
+                raise RuntimeError("OCR failed")
+            samples.append((time.perf_counter() - t) * 1000)
+            texts.append(text)
+    return samples, texts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--count", type=int, default=20, help="applicants (3 cards each)")
+    ap.add_argument("--width", type=int, default=600, help="card crop width in pixels")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    cards = [doc["data"] for a in generate(args.count, args.seed, width=args.width, noise=4)
+             for doc in a["documents"].values()]
+    blank = Image.new("L", (64, 32), 255)
+
+    results, texts = {}, {}
+    for name, cls in ENGINES.items():
+        t = time.perf_counter()
+        try:
+            engine = cls()
+            engine.image_to_string(blank)
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+        startup_ms = (time.perf_counter() - t) * 1000
+        try:
+            overhead = [time_images(engine, [blank], 1)[0][0] for _ in range(20)]
+            samples, texts[name] = time_images(engine, cards, args.runs)
+        except Exception as e:
+            print(f"{name:<12} failed: {e}")
+            continue
+        r = results[name] = {
+            "startup_ms": startup_ms,
+            "overhead_p50_ms": statistics.median(overhead),
+            "card_p50_ms": pct(samples, 0.5),
+            "card_p95_ms": pct(samples, 0.95),
+            "images_per_s": 1000 / statistics.mean(samples),
+        }
+        r["overhead_share"] = r["overhead_p50_ms"] / r["card_p50_ms"]
+        print(f"{name:<12} start {startup_ms:7.1f} ms  blank {r['overhead_p50_ms']:6.1f} ms"
+              f"  card p50 {r['card_p50_ms']:6.1f} ms p95 {r['card_p95_ms']:6.1f} ms"
+              f"  ({r['images_per_s']:.1f} img/s, overhead {r['overhead_share']:.0%})")
+
+    if len(results) == 2:
+        same = sum(a == b for a, b in zip(texts["pytesseract"], texts["tesserocr"]))
+        saved = results["pytesseract"]["card_p50_ms"] - results["tesserocr"]["card_p50_ms"]
+        results["comparison"] = {"identical_text": same, "images": len(cards), "saved_p50_ms": saved}
+        print(f"tesserocr saves {saved:.1f} ms per card (p50); identical text on {same}/{len(cards)} cards")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
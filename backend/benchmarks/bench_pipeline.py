@@ -0,0 +1,236 @@
+# End-to-end benchmark of the upload pipeline on synthetic cards
+# (benchmarks/synthetic_docs.py): OCR, field extraction, name similarity and
+# the full /upload request.
+#
+#   python benchmarks/bench_pipeline.py [--applicants 20] [--seed 0] [--width 1000] [--noise 6]
+#                                       [--rotation 2] [--mongo URI] [--out results.json]
+#                                       [--compare previous.json]
+#
+# Per stage: throughput, p50 / p95 / p99 latency and, where the stage reads
+# fields, extraction accuracy against the cards' ground truth. Stages:
+#   ocr         extract_text_from_image per card (skipped without Tesseract);
+#               accuracy of extract_details_from_text on the OCR text
+#   extract     extract_details_from_text on the exact text drawn on each card
+#   similarity  similarity() of each name against itself, a re-cased copy and a typo
+#   upload      POST /upload with an applicant's three cards, through the app
+#
+# /upload runs against mongomock (a local Mongo stand-in, `pip install mongomock`)
+# or, with --mongo, a real server; it uses the KYCDB_bench database, which is
+# dropped first. Blobs go to a temporary directory. --compare prints the
+# change in every stage's numbers against an earlier --out file.
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_docs import LABELS, generate
+from extractors import extract_details_from_text
+
+BENCH_DB = "KYCDB_bench"
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def latency(samples, wall):
+    return {
+        "count": len(samples),
+        "throughput_per_s": len(samples) / wall if wall else None,
+        "p50_ms": pct(samples, 0.50) * 1000,
+        "p95_ms": pct(samples, 0.95) * 1000,
+        "p99_ms": pct(samples, 0.99) * 1000,
+    }
+
+
+def same(got, expected):
+    return got is not None and str(got).strip().lower() == str(expected).strip().lower()
+
+
+def accuracy(pairs):
+    # pairs: [(extracted fields, expected fields)] -> overall and per-field hit rate
+    hits = {}
+    for got, expected in pairs:
+        for k, v in expected.items():
+            hits.setdefault(k, []).append(same(got.get(k), v))
+    every = [h for v in hits.values() for h in v]
+    return {"overall": sum(every) / len(every) if every else None,
+            "fields": {k: sum(v) / len(v) for k, v in hits.items()}}
+
+
+def timed(fn, items):
+    samples, results = [], []
+    started = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        results.append(fn(item))
+        samples.append(time.perf_counter() - t)
+    return samples, results, time.perf_counter() - started
+
+
+def bench_ocr(cards):
+    import pytesseract
+    from ocr import extract_text_from_image
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        return {"skipped": f"Tesseract not available ({type(e).__name__})"}
+    samples, texts, wall = timed(lambda c: extract_text_from_image(c["data"]), cards)
+    row = latency(samples, wall)
+    row["accuracy"] = accuracy([(extract_details_from_text(t), c["fields"]) for t, c in zip(texts, cards)])
+    return row
+
+
+def bench_extract(cards, repeat):
+    items = [c for _ in range(repeat) for c in cards]
+    samples, out, wall = timed(lambda c: extract_details_from_text(c["text"]), items)
+    row = latency(samples, wall)
+    row["accuracy"] = accuracy([(o, c["fields"]) for o, c in zip(out[:len(cards)], cards)])
+    return row
+
+
+def bench_similarity(app_module, applicants, repeat, rng):
+    pairs = []
+    for a in applicants:
+        name = a["identity"]["name"]
+        i = rng.randrange(len(name))
+        pairs += [(name, name), (name, name.upper()), (name, name[:i] + name[i + 1:])]
+    samples, _, wall = timed(lambda p: app_module.similarity(*p), pairs * repeat)
+    return latency(samples, wall)
+
+
+def bench_upload(app_module, applicants):
+    client = app_module.app.test_client()
+    statuses = {}
+    pairs = []
+
+    def post(a):
+        ident = a["identity"]
+        data = {"userName": ident["name"], "userDob": ident["dob"], "userGender": ident["gender"].lower()}
+        for kind, doc in a["documents"].items():
+            data[kind] = (io.BytesIO(doc["data"]), doc["filename"])
+        resp = client.post("/upload", data=data, content_type="multipart/form-data")
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        if resp.status_code == 200:
+            by_type = {d.get("type"): d for d in (resp.get_json() or {}).get("documents", [])}
+            for kind, doc in a["documents"].items():
+                pairs.append((by_type.get(LABELS[kind], {}), {k: v for k, v in doc["fields"].items()
+                                                               if k != "Document Type"}))
+
+    samples, _, wall = timed(post, applicants)
+    row = latency(samples, wall)
+    row["statuses"] = {str(k): v for k, v in statuses.items()}
+    row["accuracy"] = accuracy(pairs)
+    return row
+
+
+def load_app(mongo_uri):
+    # configure the app for the benchmark, then import it
+    os.environ["MONGO_DB"] = BENCH_DB
+    os.environ.setdefault("BLOB_DIR", tempfile.mkdtemp(prefix="kyc-bench-blobs-"))
+    os.environ["ASYNC_UPLOADS"] = "0"
+    os.environ["OCR_CACHE_STORE"] = ""
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    else:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    import app as app_module
+    app_module.client.drop_database(BENCH_DB)
+    return app_module
+
+
+def compare(previous, current):
+    for stage, row in current["stages"].items():
+        old = previous.get("stages", {}).get(stage)
+        if not old or "skipped" in old or "skipped" in row:
+            continue
+        parts = []
+        for key in ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = old.get(key), row.get(key)
+            if a and b is not None:
+                parts.append(f"{key} {a:.4g} -> {b:.4g} ({(b - a) / a:+.1%})")
+        acc_a = (old.get("accuracy") or {}).get("overall")
+        acc_b = (row.get("accuracy") or {}).get("overall")
+        if acc_a is not None and acc_b is not None:
+            parts.append(f"accuracy {acc_a:.1%} -> {acc_b:.1%}")
+        print(f"  {stage:<10} " + "  ".join(parts))
+
+
+def print_row(stage, row):
+    if "skipped" in row:
+        print(f"{stage:<10} skipped: {row['skipped']}")
+        return
+    acc = (row.get("accuracy") or {}).get("overall")
+    print(f"{stage:<10} n={row['count']:<6} {row['throughput_per_s']:10.1f}/s  p50 {row['p50_ms']:8.3f} ms"
+          f"  p95 {row['p95_ms']:8.3f} ms  p99 {row['p99_ms']:8.3f} ms"
+          + (f"  accuracy {acc:.1%}" if acc is not None else ""))
+    for field, hit in (row.get("accuracy") or {}).get("fields", {}).items():
+        print(f"{'':<12}{field:<14} {hit:.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--applicants", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--width", type=int, default=1000)
+    ap.add_argument("--noise", type=float, default=6.0)
+    ap.add_argument("--rotation", type=float, default=2.0)
+    ap.add_argument("--format", choices=["png", "jpeg"], default="png")
+    ap.add_argument("--repeat", type=int, default=50, help="rounds of the sub-millisecond stages")
+    ap.add_argument("--mongo", help="real Mongo URI for /upload (default: mongomock)")
+    ap.add_argument("--skip-upload", action="store_true")
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    args = ap.parse_args()
+
+    applicants = list(generate(args.applicants, args.seed, args.width, args.noise, args.rotation, args.format))
+    cards = [doc for a in applicants for doc in a["documents"].values()]
+    rng = random.Random(args.seed)
+
+    stages = {"ocr": bench_ocr(cards), "extract": bench_extract(cards, args.repeat)}
+    app_module = None
+    try:
+        app_module = load_app(args.mongo)
+    except ImportError as e:
+        print(f"app not loaded ({e}); similarity and upload skipped")
+    if app_module is not None:
+        stages["similarity"] = bench_similarity(app_module, applicants, args.repeat, rng)
+        if not args.skip_upload:
+            stages["upload"] = bench_upload(app_module, applicants)
+        app_module.client.drop_database(BENCH_DB)
+
+    results = {
+        "meta": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "mongo": "server" if args.mongo else "mongomock"},
+        "started": datetime.utcnow().isoformat(),
+        "stages": stages,
+    }
+    results["meta"]["cards"] = len(cards)
+    for stage, row in stages.items():
+        print_row(stage, row)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            previous = json.load(fh)
+        print(f"vs {args.compare}:")
+        compare(previous, results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
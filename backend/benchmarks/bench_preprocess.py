@@ -0,0 +1,92 @@
+# Compare OCR with and without the preprocessing stage.
+#
+#   python benchmarks/bench_preprocess.py IMAGE_DIR [--truth truth.json] [--out results.json]
+#
+# truth.json maps an image file name to the fields expected from
+# extract_details_from_text, e.g. {"IMG1.png": {"number": "ABCDE1234F", "Name": "..."}}
+import argparse
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr import ocr_image
+from extractors import extract_details_from_text
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+
+
+def field_accuracy(details, expected):
+    if not expected:
+        return None
+    ok = 0
+    for k, v in expected.items():
+        got = details.get(k)
+        if got is not None and str(got).strip().lower() == str(v).strip().lower():
+            ok += 1
+    return ok / len(expected)
+
+
+def run(paths, truth, preprocess):
+    rows = []
+    for p in paths:
+        text, timings = ocr_image(p, preprocess=preprocess)
+        details = extract_details_from_text(text)
+        rows.append({
+            "image": os.path.basename(p),
+            "timings": timings,
+            "total": sum(v for k, v in timings.items() if k != "skewAngle"),
+            "accuracy": field_accuracy(details, truth.get(os.path.basename(p))),
+        })
+    return rows
+
+
+def summarize(rows):
+    totals = [r["total"] for r in rows]
+    steps = {}
+    for r in rows:
+        for k, v in r["timings"].items():
+            if k != "skewAngle":
+                steps.setdefault(k, []).append(v)
+    acc = [r["accuracy"] for r in rows if r["accuracy"] is not None]
+    return {
+        "images": len(rows),
+        "meanSeconds": statistics.mean(totals) if totals else 0.0,
+        "stepMeanSeconds": {k: statistics.mean(v) for k, v in steps.items()},
+        "fieldAccuracy": statistics.mean(acc) if acc else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("image_dir")
+    ap.add_argument("--truth")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    paths = sorted(os.path.join(args.image_dir, n) for n in os.listdir(args.image_dir)
+                   if n.lower().endswith(IMAGE_EXTS))
+    truth = {}
+    if args.truth:
+        with open(args.truth, "r", encoding="utf-8") as fh:
+            truth = json.load(fh)
+
+    result = {}
+    for label, flag in (("raw", False), ("preprocessed", True)):
+        rows = run(paths, truth, flag)
+        result[label] = {"summary": summarize(rows), "images": rows}
+        s = result[label]["summary"]
+        acc = "n/a" if s["fieldAccuracy"] is None else f"{s['fieldAccuracy']:.1%}"
+        print(f"{label:>13}: {s['images']} images, mean {s['meanSeconds'] * 1000:.1f} ms, field accuracy {acc}")
+        for k, v in s["stepMeanSeconds"].items():
+            print(f"{'':>15}{k:<10} {v * 1000:8.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
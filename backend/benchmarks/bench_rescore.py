@@ -0,0 +1,166 @@
+# Bulk re-scoring cost: vectorized (SignalTable + score_table) vs one record at a time.
+#
+#   python benchmarks/bench_rescore.py [--records 1000000] [--scalar 100000] [--out results.json]
+#   MONGO_DB=KYCDB_rescore python benchmarks/bench_rescore.py --records 200000 --mongo   # throwaway DB
+#
+# Records of 1-3 documents get random signals in the shapes /upload stores
+# (name similarity, DOB outcome, watchlist list types, flags, tamper score,
+# ring size and density). They are first scored with the current rules, then
+# re-scored under a changed rule set (new High threshold, heavier DOB
+# mismatch, lighter tamper weight). Reports records/s for building the signal
+# columns, the NumPy pass and the scalar loop (on the first --scalar records),
+# and checks both paths agree on every compared record. With --mongo the
+# records are written to MONGO_DB and `rescore_collection` runs end to end
+# (read, score, bulk $set of the changed ones).
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import RuleSet, SignalTable, load_rules, rescore_collection
+
+
+def changed_rules(rules_v1):
+    spec = copy.deepcopy(rules_v1.spec)
+    spec["version"] = rules_v1.version + 1
+    for r in spec["riskLevels"]:
+        if r["level"] == "High":
+            r["min"] = 60
+    for r in spec["document"]:
+        if r.get("value") == "mismatch":
+            r["points"] = 35
+        if r["op"] == "scale":
+            r["factor"] = 0.3
+    return RuleSet(spec)
+
+
+def random_signals(rng):
+    s = {"base": rng.choice((0, 5, 10, 15, 20))}
+    if rng.random() < 0.9:
+        s["nameMatch"] = round(rng.random(), 4)
+    if rng.random() < 0.9:
+        s["dob"] = rng.choices(("match", "mismatch", "missing"), (8, 1, 1))[0]
+    if rng.random() < 0.5:
+        s["genderMismatch"] = rng.random() < 0.05
+    if rng.random() < 0.01:
+        s["watchlistName"] = rng.choice(("sanctions", "pep"))
+    if rng.random() < 0.005:
+        s["watchlistFatherName"] = "pep"
+    s["blacklisted"] = rng.random() < 0.01
+    s["duplicateNumber"] = rng.random() < 0.03
+    s["nearDuplicateImage"] = rng.random() < 0.02
+    s["tamperScore"] = rng.choice((0,) * 8 + (20, 60))
+    return s
+
+
+def make_records(n, rules, seed):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        docs = []
+        for _ in range(rng.randint(1, 3)):
+            signals = random_signals(rng)
+            score, risk, _ = rules.score_document(signals)
+            docs.append({"signals": signals, "fraudScore": score, "riskLevel": risk})
+        ring = rng.random() < 0.01
+        rec_signals = {"ringLinked": rng.randint(2, 12) if ring else 0,
+                       "ringDensity": round(rng.random(), 3) if ring else None,
+                       "amlAlerts": rng.choice((0,) * 9 + (1,))}
+        score, risk, status, _ = rules.score_record([d["fraudScore"] for d in docs], rec_signals)
+        records.append({"_id": i, "documents": docs, "signals": rec_signals,
+                        "overallFraudScore": score, "overallRiskLevel": risk, "finalStatus": status})
+    return records
+
+
+def score_scalar(rules, records):
+    out = []
+    for rec in records:
+        docs = [rules.score_document(d["signals"]) for d in rec["documents"]]
+        score, risk, status, _ = rules.score_record([d[0] for d in docs], rec["signals"])
+        out.append((score, risk, status, [d[0] for d in docs]))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=1000000)
+    ap.add_argument("--scalar", type=int, default=100000, help="records scored one at a time for comparison")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--mongo", action="store_true", help="also run rescore_collection against MONGO_DB")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    v1 = load_rules(1)
+    v2 = changed_rules(v1)
+    t = time.perf_counter()
+    records = make_records(args.records, v1, args.seed)
+    print(f"generated {len(records)} records ({sum(len(r['documents']) for r in records)} documents)"
+          f" in {time.perf_counter() - t:.1f} s")
+
+    doc_signals, rec_signals = v2.signals()
+    t = time.perf_counter()
+    table = SignalTable(records, doc_signals, rec_signals)
+    table_s = time.perf_counter() - t
+    t = time.perf_counter()
+    out = v2.score_table(table)
+    vector_s = time.perf_counter() - t
+
+    sample = records[:args.scalar]
+    t = time.perf_counter()
+    scalar = score_scalar(v2, sample)
+    scalar_s = time.perf_counter() - t
+
+    starts = np.concatenate([[0], np.cumsum(np.bincount(table.doc_record, minlength=len(records)))])
+    mismatches = sum((int(out["score"][i]), v2.levels[out["risk"][i]], v2.statuses[out["status"][i]],
+                      [int(x) for x in out["docScore"][starts[i]:starts[i + 1]]]) != scalar[i]
+                     for i in range(len(sample)))
+    changed = sum(int(out["score"][i]) != r["overallFraudScore"] or v2.statuses[out["status"][i]] != r["finalStatus"]
+                  for i, r in enumerate(records))
+
+    n = len(records)
+    results = {
+        "records": n,
+        "changed": changed,
+        "table_records_per_s": n / table_s,
+        "numpy_records_per_s": n / vector_s,
+        "vectorized_total_s": table_s + vector_s,
+        "scalar_records_per_s": len(sample) / scalar_s,
+        "scalar_compared": len(sample),
+        "mismatches": mismatches,
+    }
+    results["speedup"] = (n / (table_s + vector_s)) / results["scalar_records_per_s"]
+    print(f"signal columns  {results['table_records_per_s']:12,.0f} records/s ({table_s:.2f} s)")
+    print(f"numpy pass      {results['numpy_records_per_s']:12,.0f} records/s ({vector_s:.2f} s)")
+    print(f"scalar loop     {results['scalar_records_per_s']:12,.0f} records/s (first {len(sample)})")
+    print(f"vectorized {results['speedup']:.1f}x the scalar loop; {changed} of {n} records change under"
+          f" v{v2.version}; {mismatches} mismatches on {len(sample)} compared")
+
+    if args.mongo:
+        from pymongo import MongoClient
+        db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))[
+            os.environ.get("MONGO_DB", "KYCDB_rescore")]
+        coll = db["extracted"]
+        coll.drop()
+        for i in range(0, n, 10000):
+            coll.insert_many(records[i:i + 10000])
+        t = time.perf_counter()
+        counts = rescore_collection(coll, v2)
+        secs = time.perf_counter() - t
+        results["mongo"] = dict(counts, seconds=secs, records_per_s=counts["records"] / secs)
+        print(f"rescore_collection: {counts['records']} records, {counts['changed']} changed in {secs:.1f} s"
+              f" ({counts['records'] / secs:,.0f} records/s)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
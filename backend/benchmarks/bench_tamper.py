@@ -0,0 +1,121 @@
+# Cost of the tampering check on phone-sized photos, next to the OCR it runs
+# alongside, and what it scores on a clean card vs a retouched one.
+#
+#   python benchmarks/bench_tamper.py [IMAGE ...] [--runs 10] [--ela] [--out results.json]
+#
+# Without images, a synthetic 12 MP card photo (gradient background, card,
+# text, sensor noise, JPEG) is used, plus a copy with the number painted over
+# and re-typed. OCR is timed with ocr_image when Tesseract is installed.
+# --ela also runs error-level analysis, which is off by default.
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tamper import analyze_image
+
+
+def card_photo(h=3000, w=4000, noise=5, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = (xx / w * 120 + yy / h * 50 + 60)[..., None] + rng.normal(0, noise, (h, w, 3))
+    img = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([w * 0.1, h * 0.15, w * 0.9, h * 0.85], fill=(235, 235, 225))
+    draw.rectangle([w * 0.13, h * 0.25, w * 0.3, h * 0.6], fill=(150, 120, 100))
+    for i in range(14):
+        draw.text((w * 0.35, h * 0.2 + i * h * 0.045), "NAME RAHUL KUMAR 1234 5678 9012 DOB 12/05/1990",
+                  fill=(20, 20, 20), font_size=int(h * 0.03))
+    # the camera's noise is over everything, card included
+    a = np.asarray(img, dtype=np.float32) + rng.normal(0, noise, (h, w, 3))
+    return Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+
+
+def jpeg(img, quality=88):
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def painted(data):
+    # number covered with card-coloured fill and typed again
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    w, h = img.size
+    box = (int(w * 0.35), int(h * 0.4), int(w * 0.75), int(h * 0.5))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(box, fill=(235, 235, 225))
+    draw.text(box[:2], "9999 9999 9999", fill=(20, 20, 20), font_size=int(h * 0.03))
+    return jpeg(img)
+
+
+def time_tamper(data, runs, ela=False):
+    samples, result = [], None
+    for _ in range(runs):
+        t = time.perf_counter()
+        result = analyze_image(data, {"budget_ms": float("inf"), "ela": ela})
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples), result
+
+
+def time_ocr(data):
+    # preprocessing + Tesseract, as on upload; None when Tesseract is missing
+    from ocr import ocr_image
+    t = time.perf_counter()
+    _, timings = ocr_image(data)
+    if "ocr" not in timings:
+        return None
+    return (time.perf_counter() - t) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("images", nargs="*")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--ela", action="store_true", help="also run error-level analysis")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    samples = []
+    for p in args.images:
+        with open(p, "rb") as fh:
+            samples.append((os.path.basename(p), fh.read()))
+    if not samples:
+        clean = jpeg(card_photo())
+        samples = [("synthetic-12mp-clean.jpg", clean), ("synthetic-12mp-painted.jpg", painted(clean))]
+
+    results = []
+    for name, data in samples:
+        size = Image.open(io.BytesIO(data)).size
+        tamper_ms, r = time_tamper(data, args.runs, args.ela)
+        ocr_ms = time_ocr(data)
+        row = {
+            "image": name,
+            "pixels": size[0] * size[1],
+            "tamper_p50_ms": tamper_ms,
+            "ocr_ms": ocr_ms,
+            "tamper_share_of_ocr": tamper_ms / ocr_ms if ocr_ms else None,
+            "score": r["score"],
+            "ela": r["ela"],
+            "noise": r["noise"],
+        }
+        results.append(row)
+        share = f"  ({row['tamper_share_of_ocr']:.1%} of OCR {ocr_ms:.0f} ms)" if ocr_ms else ""
+        ela = f"{r['ela']['outlierFraction']:.3f}" if r["ela"] else "  off"
+        print(f"{name:<32} {size[0]}x{size[1]}  tamper p50 {tamper_ms:6.1f} ms{share}  score {r['score']:>3}"
+              f"  ela {ela}  noise {r['noise']['outlierFraction']:.3f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Watchlist screening latency at 100k / 1M names.
+#
+#   python benchmarks/bench_watchlist.py [--sizes 100000,1000000] [--queries 500] [--out results.json]
+#
+# Builds a synthetic list of Indian-style names, screens perturbed copies of
+# listed names (typos, romanization variants, swapped token order) plus names
+# that are not listed, and reports p50/p95/p99 latency and recall. A pairwise
+# difflib scan over a slice of the list is timed for comparison.
+import argparse
+import difflib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from watchlist import WatchlistIndex
+
+FIRST = ["rahul", "suresh", "ramesh", "mahesh", "lakshmi", "priya", "anita", "sunita", "vijay", "ajay",
+         "sanjay", "mohammed", "iqbal", "bhupinder", "harpreet", "gurpreet", "deepak", "pooja", "neha",
+         "arjun", "karthik", "venkatesh", "srinivas", "ganesh", "dinesh", "rajesh", "kavita", "shreya",
+         "abdul", "imran", "farhan", "zubair", "naveen", "pradeep", "sandeep", "manoj", "anil", "sunil"]
+LAST = ["sharma", "verma", "gupta", "singh", "kumar", "reddy", "naidu", "iyer", "iyengar", "nair",
+        "menon", "patel", "shah", "mehta", "khan", "qureshi", "siddiqui", "chowdhury", "banerjee",
+        "mukherjee", "chatterjee", "das", "bose", "ghosh", "yadav", "jadhav", "patil", "kulkarni", "joshi"]
+SYLLABLES = ["ra", "ma", "sha", "vi", "ja", "ya", "ka", "ri", "na", "dee", "pa", "la", "su", "ni", "to",
+             "bha", "dha", "ksh", "vee", "har", "pre", "gu", "an", "in", "ee", "oo", "ch", "th", "ga"]
+
+VARIANTS = [("ksh", "x"), ("ee", "i"), ("oo", "u"), ("sh", "s"), ("v", "w"), ("ph", "f"), ("th", "t")]
+
+
+def make_name(rng):
+    first = rng.choice(FIRST) if rng.random() < 0.5 else "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    middle = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    last = rng.choice(LAST)
+    return f"{first} {middle} {last}".title()
+
+
+def perturb(rng, name):
+    s = name.lower()
+    r = rng.random()
+    if r < 0.3:
+        a, b = rng.choice(VARIANTS)
+        s = s.replace(a, b) if a in s else s.replace(b, a, 1)
+    elif r < 0.6:
+        i = rng.randrange(len(s))
+        s = s[:i] + rng.choice("aeioulnrst") + s[i + 1:]
+    elif r < 0.8:
+        parts = s.split()
+        s = " ".join(parts[-1:] + parts[:-1])
+    return s.title()
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--difflib-slice", type=int, default=20000)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rng = random.Random(size)
+        names = [make_name(rng) for _ in range(size)]
+        index = WatchlistIndex()
+        t = time.perf_counter()
+        index.bulk_load({"name": n, "ref": i} for i, n in enumerate(names))
+        build_s = time.perf_counter() - t
+
+        listed = rng.sample(range(size), args.queries // 2)
+        queries = [(perturb(rng, names[i]), i) for i in listed]
+        queries += [(make_name(random.Random(10 ** 9 + k)), None) for k in range(args.queries - len(listed))]
+
+        samples, found = [], 0
+        for q, expect in queries:
+            t = time.perf_counter()
+            hits = index.screen(q, limit=10)
+            samples.append(time.perf_counter() - t)
+            if expect is not None and any(h["ref"] == expect for h in hits):
+                found += 1
+
+        # pairwise difflib over a slice, extrapolated to the full list
+        slice_names = [n.lower() for n in names[:args.difflib_slice]]
+        t = time.perf_counter()
+        probe = queries[0][0].lower()
+        for n in slice_names:
+            difflib.SequenceMatcher(None, probe, n).ratio()
+        difflib_s = (time.perf_counter() - t) * size / len(slice_names)
+
+        row = {
+            "entries": size,
+            "build_s": build_s,
+            "p50_ms": pct(samples, 0.50) * 1000,
+            "p95_ms": pct(samples, 0.95) * 1000,
+            "p99_ms": pct(samples, 0.99) * 1000,
+            "mean_ms": statistics.mean(samples) * 1000,
+            "recall": found / len(listed),
+            "difflib_pairwise_s": difflib_s,
+            "stats": index.stats(),
+        }
+        results.append(row)
+        print(f"{size:>9} names  build {build_s:6.1f} s  p50 {row['p50_ms']:6.2f} ms  p95 {row['p95_ms']:6.2f} ms"
+              f"  p99 {row['p99_ms']:6.2f} ms  recall {row['recall']:.1%}  (difflib pairwise ~{difflib_s:.1f} s/query)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
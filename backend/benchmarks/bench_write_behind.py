@@ -0,0 +1,155 @@
+# Upload persistence throughput: one insert_one per document vs write-behind group commit.
+#
+#   MONGO_DB=KYCDB_bench python benchmarks/bench_write_behind.py [--uploads 20000] [--threads 1,8,32]
+#       [--alert-rate 0.3] [--fsync] [--flush-ms 20] [--batch 500] [--out results.json]
+#
+# Needs a running MongoDB (MONGO_URI); writes into throwaway collections of
+# MONGO_DB (dropped before each run). Every simulated upload persists a record
+# of 3 documents shaped like /upload's, plus an AML alert for --alert-rate of
+# them, from --threads request threads at once:
+#   single   aml_collection.insert_one + collection.insert_one, as /upload did
+#   group    WriteBehind.submit (journal append), flushed with insert_many
+# Reports uploads/s, the time each upload spends persisting on its request
+# thread (p50 / p99) and, for group commit, the time until the last upload
+# is in Mongo and the mean batch size.
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from write_behind import WriteBehind
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def make_upload(rng, i, alert_rate):
+    documents = []
+    for label in ("Aadhaar", "PAN", "Driving Licence"):
+        score = rng.randint(0, 100)
+        documents.append({
+            "type": label, "filename": f"{i}_{label}.png", "number": f"{rng.getrandbits(40):012d}",
+            "Name": f"Applicant {i}", "DOB": "01/01/1990", "Gender": "Male", "FatherName": f"Father {i}",
+            "blob": f"{rng.getrandbits(256):064x}", "phash": f"{rng.getrandbits(64):016x}",
+            "dhash": f"{rng.getrandbits(64):016x}", "size": rng.randint(50000, 400000), "detected": True,
+            "fraudScore": score, "riskLevel": "High" if score >= 70 else "Low", "match": round(rng.random(), 3),
+            "signals": {"base": 10, "nameMatch": round(rng.random(), 4), "dob": "match", "tamperScore": 0},
+            "tamper": {"score": 0, "complete": True, "ms": 40.0}, "reasons": ["DOB not found on document"]})
+    record = {"userName": f"Applicant {i}", "userDob": "01/01/1990", "userGender": "male", "documents": documents,
+              "overallFraudScore": 40, "overallRiskLevel": "Medium", "finalStatus": "Review", "amlAlerts": [],
+              "amlEntryId": None, "reasons": ["DOB not found on document"], "status": "Pending",
+              "adminStatus": None, "timestamp": datetime.utcnow().isoformat()}
+    alert = None
+    if rng.random() < alert_rate:
+        alert = {"alerts": [{"type": "Duplicate Number", "number": documents[0]["number"], "matches": []}],
+                 "created_at": record["timestamp"], "userName": record["userName"], "documents_sample": documents}
+    return record, alert
+
+
+def run(mode, uploads, threads, records, alerts, args):
+    records.drop()
+    alerts.drop()
+    journal = tempfile.mkdtemp(prefix="write_behind_")
+    wb = None
+    if mode == "group":
+        wb = WriteBehind({records.name: records, alerts.name: alerts}, journal, flush_interval=args.flush_ms / 1000,
+                         batch_size=args.batch, max_pending=max(args.batch, len(uploads) * 2), fsync=args.fsync)
+        wb.start()
+    latencies = [[] for _ in range(threads)]
+
+    def worker(t):
+        for record, alert in uploads[t::threads]:
+            record, alert = dict(record), dict(alert) if alert else None
+            started = time.perf_counter()
+            if wb:
+                if alert:
+                    alert["_id"] = ObjectId()
+                    record["amlEntryId"] = str(alert["_id"])
+                wb.submit(([(alerts.name, alert)] if alert else []) + [(records.name, record)])
+            else:
+                if alert:
+                    alerts.insert_one(alert)
+                    record["amlEntryId"] = str(alert["_id"])
+                records.insert_one(record)
+            latencies[t].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    acked = time.perf_counter() - started
+    if wb:
+        wb.sync()
+    persisted = time.perf_counter() - started
+    ms = [x * 1000 for lat in latencies for x in lat]
+    result = {
+        "mode": mode, "threads": threads, "uploads": len(uploads),
+        "uploads_per_s": len(uploads) / persisted,
+        "acked_per_s": len(uploads) / acked,
+        "persist_p50_ms": pct(ms, 0.5), "persist_p99_ms": pct(ms, 0.99),
+        "all_in_mongo_s": persisted,
+    }
+    if wb:
+        stats = wb.stats()
+        result["batches"] = stats["batches"]
+        result["mean_batch"] = stats["committed"] / max(1, stats["batches"])
+        wb.close()
+    shutil.rmtree(journal, ignore_errors=True)
+    expected = sum(1 for _, a in uploads if a)
+    if records.count_documents({}) != len(uploads) or alerts.count_documents({}) != expected:
+        raise RuntimeError(f"{mode}: documents missing after the run")
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=20000)
+    ap.add_argument("--threads", default="1,8,32")
+    ap.add_argument("--alert-rate", type=float, default=0.3)
+    ap.add_argument("--fsync", action="store_true", help="fsync the journal before each submit returns")
+    ap.add_argument("--flush-ms", type=float, default=20)
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))[
+        os.environ.get("MONGO_DB", "KYCDB_bench")]
+    records, alerts = db["bench_write_behind_records"], db["bench_write_behind_alerts"]
+    rng = random.Random(args.seed)
+    uploads = [make_upload(rng, i, args.alert_rate) for i in range(args.uploads)]
+
+    results = []
+    for threads in (int(x) for x in args.threads.split(",")):
+        for mode in ("single", "group"):
+            r = run(mode, uploads, threads, records, alerts, args)
+            results.append(r)
+            extra = f"  batch {r['mean_batch']:6.1f}" if mode == "group" else ""
+            print(f"{mode:<7} threads {threads:<3} {r['uploads_per_s']:9.1f} uploads/s"
+                  f"  persist p50 {r['persist_p50_ms']:7.3f} ms p99 {r['persist_p99_ms']:7.3f} ms"
+                  f"  all in Mongo {r['all_in_mongo_s']:6.2f} s{extra}")
+    records.drop()
+    alerts.drop()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Load test for the read endpoints: the Flask server (app.run) vs the ASGI mode.
+#
+#   MONGO_DB=KYCDB_load python benchmarks/load_read_endpoints.py --seed 5000     # fill a throwaway DB
+#   MONGO_DB=KYCDB_load python app.py                                           # :5000
+#   MONGO_DB=KYCDB_load uvicorn asgi:app --port 8000
+#   python benchmarks/load_read_endpoints.py --target flask=http://127.0.0.1:5000 \
+#       --target asgi=http://127.0.0.1:8000 [--concurrency 10,100,1000] [--duration 10] [--out results.json]
+#
+# Each concurrency level opens that many keep-alive connections (a dashboard
+# tab each), every one sending GETs back to back, round-robin over --paths,
+# for --duration seconds. Reports throughput, latency p50/p95/p99/max and
+# errors (refused / reset connections and non-2xx answers) per target and
+# level. The client is plain asyncio, so it is not the bottleneck at 1000+.
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = "/records,/alerts,/alerts/aml?limit=50,/audit_trail?limit=50,/blacklist,/all-records?limit=50"
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else None
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for ln in lines[1:]:
+        if ":" in ln:
+            k, v = ln.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def connection(host, port, paths, deadline, latencies, errors):
+    reader = writer = None
+    i = random.randrange(len(paths))
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: application/json\r\n\r\n".encode())
+            await writer.drain()
+            status, close = await asyncio.wait_for(read_response(reader), 60)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            errors["connection"] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if not 200 <= status < 300:
+            errors["status"] += 1
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(url, paths, concurrency, duration):
+    u = urlsplit(url)
+    latencies, errors = [], {"connection": 0, "status": 0}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(connection(u.hostname, u.port or 80, paths, deadline, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ms = [x * 1000 for x in latencies]
+    return {
+        "concurrency": concurrency,
+        "requests": len(ms),
+        "rps": len(ms) / elapsed,
+        "p50_ms": pct(ms, 0.5),
+        "p95_ms": pct(ms, 0.95),
+        "p99_ms": pct(ms, 0.99),
+        "max_ms": max(ms) if ms else None,
+        "connection_errors": errors["connection"],
+        "status_errors": errors["status"],
+    }
+
+
+def seed(n):
+    # n records spread over pending / approved / rejected, a tenth with an AML alert
+    from pymongo import MongoClient
+    db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))[os.environ.get("MONGO_DB", "KYCDB_load")]
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    colls = {"Pending": db["extracted"], "Approved": db["approved_records"], "Rejected": db["rejected_records"]}
+    batches = {k: [] for k in colls}
+    alerts = []
+    for i in range(n):
+        status = rng.choice(list(colls))
+        score = rng.randint(0, 100)
+        ts = (now - timedelta(minutes=i)).isoformat()
+        batches[status].append({
+            "userName": f"Applicant {i}", "userDob": "01/01/1990", "status": status, "timestamp": ts,
+            "documents": [{"type": "PAN", "number": f"ABCDE{i % 10000:04d}F", "fraudScore": score}],
+            "overallFraudScore": score, "overallRiskLevel": "High" if score >= 70 else "Low",
+            "finalStatus": "Flagged" if score >= 70 else "Auto-Pass", "reasons": []})
+        if i % 10 == 0:
+            alerts.append({"alerts": [{"type": "Duplicate Number"}], "created_at": ts, "userName": f"Applicant {i}"})
+    for status, docs in batches.items():
+        if docs:
+            colls[status].insert_many(docs)
+    if alerts:
+        db["aml_alerts"].insert_many(alerts)
+    db["blacklist"].insert_many([{"type": "PAN", "number": f"ZZZZZ{i:04d}Z", "added_at": now.isoformat()}
+                                 for i in range(100)])
+    print(f"seeded {n} records, {len(alerts)} AML alerts, 100 blacklist entries into {db.name}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", action="append", default=[], help="name=base URL (repeatable)")
+    ap.add_argument("--concurrency", default="10,100,1000")
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--paths", default=DEFAULT_PATHS)
+    ap.add_argument("--seed", type=int, help="insert this many synthetic records first")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+    if not args.target:
+        return
+
+    # one socket per connection
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    paths = args.paths.split(",")
+    results = {}
+    for target in args.target:
+        name, url = target.split("=", 1)
+        results[name] = []
+        for c in (int(x) for x in args.concurrency.split(",")):
+            r = asyncio.run(run_level(url, paths, c, args.duration))
+            results[name].append(r)
+            fmt = lambda v: f"{v:8.1f}" if v is not None else "       -"
+            print(f"{name:<8} c={c:<5} {r['rps']:8.1f} req/s  p50 {fmt(r['p50_ms'])}  p95 {fmt(r['p95_ms'])}"
+                  f"  p99 {fmt(r['p99_ms'])}  max {fmt(r['max_ms'])} ms"
+                  f"  errors {r['connection_errors']} conn / {r['status_errors']} status")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Synthetic Aadhaar / PAN / Driving Licence card images with ground truth.
+#
+#   python benchmarks/synthetic_docs.py OUT_DIR [--count 30] [--seed 0] [--width 1000]
+#                                       [--noise 6] [--rotation 2] [--format png|jpeg]
+#
+# Writes <id>_<kind>.<ext> per card plus truth.json, which maps each file name
+# to the fields extract_details_from_text should return for it (the format
+# bench_preprocess.py --truth reads). The same cards can be generated in
+# memory with generate(), which also returns the exact text drawn on each card.
+#
+# Cards are drawn at a fixed 856x540 layout (ID-1 card proportions) and
+# scaled to `width`; noise is the std of per-pixel Gaussian noise, rotation
+# the maximum skew in degrees (each card gets a random angle within it).
+import argparse
+import io
+import json
+import os
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+KINDS = ("aadhar", "pan", "dl")
+LABELS = {"aadhar": "Aadhaar", "pan": "PAN", "dl": "Driving Licence"}   # /upload field -> documentType
+
+FIRST = ["Rahul", "Suresh", "Priya", "Anita", "Mohammed", "Lakshmi", "Arjun", "Kavya", "Vikram", "Meera"]
+LAST = ["Sharma", "Khan", "Reddy", "Iyer", "Patel", "Singh", "Nair", "Gupta"]
+STATES = ["MH", "DL", "KA", "TN", "UP", "GJ", "WB", "RJ"]
+
+CARD_W, CARD_H = 856, 540
+_FONTS = {}
+
+
+def font(size):
+    f = _FONTS.get(size)
+    if f is None:
+        try:
+            f = ImageFont.truetype("DejaVuSans.ttf", size)
+        except OSError:
+            f = ImageFont.load_default(size)
+        _FONTS[size] = f
+    return f
+
+
+def random_identity(rng):
+    gender = rng.choice(["Male", "Female"])
+    return {
+        "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "father": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "dob": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}",
+        "gender": gender,
+        "aadhar": " ".join("".join(rng.choice("0123456789") for _ in range(4)) for _ in range(3)),
+        "pan": "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5))
+               + "".join(rng.choice("0123456789") for _ in range(4)) + rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ"),
+        "dl": f"{rng.choice(STATES)}{rng.randint(1, 99):02d} {rng.randint(1990, 2024)}{rng.randint(0, 9999999):07d}",
+    }
+
+
+def document_lines(kind, ident):
+    # [(text, font size)] top to bottom, in card layout pixels
+    if kind == "aadhar":
+        return [("GOVERNMENT OF INDIA", 34), (ident["name"], 30), (f"DOB: {ident['dob']}", 28),
+                (ident["gender"].upper(), 28), (ident["aadhar"], 44)]
+    if kind == "pan":
+        return [("INCOME TAX DEPARTMENT", 34), (f"Name: {ident['name']}", 28),
+                (f"Father's Name: {ident['father']}", 28), (f"Date of Birth: {ident['dob']}", 28),
+                ("Permanent Account Number", 24), (ident["pan"], 40)]
+    if kind == "dl":
+        return [("DRIVING LICENCE", 34), (f"DL No: {ident['dl']}", 30), (f"Name: {ident['name']}", 28),
+                (f"S/O: {ident['father']}", 28), (f"DOB: {ident['dob']}", 28)]
+    raise ValueError(f"unknown document kind {kind!r}")
+
+
+def expected_fields(kind, ident):
+    # what extract_details_from_text should read off the card
+    if kind == "aadhar":
+        return {"Document Type": "Aadhaar", "number": ident["aadhar"], "Name": ident["name"],
+                "DOB": ident["dob"], "Gender": ident["gender"]}
+    if kind == "pan":
+        return {"Document Type": "PAN", "number": ident["pan"], "Name": ident["name"],
+                "FatherName": ident["father"]}
+    return {"Document Type": "Driving Licence", "number": ident["dl"], "Name": ident["name"],
+            "FatherName": ident["father"], "DOB": ident["dob"]}
+
+
+def render(kind, ident, width=1000, noise=0.0, rotation=0.0, rng=None):
+    rng = rng or random.Random(0)
+    img = Image.new("RGB", (CARD_W, CARD_H), (246, 244, 236))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, CARD_W - 1, 70], fill=(222, 232, 242))
+    draw.rectangle([30, 110, 210, 330], fill=(170, 150, 135))    # photo
+    y = 14
+    for i, (line, size) in enumerate(document_lines(kind, ident)):
+        x = 40 if i == 0 else 240
+        draw.text((x, y), line, fill=(20, 20, 28), font=font(size))
+        y += size + (36 if i == 0 else 22)
+    if width != CARD_W:
+        img = img.resize((width, round(CARD_H * width / CARD_W)), Image.LANCZOS)
+    if rotation:
+        img = img.rotate(rng.uniform(-rotation, rotation), resample=Image.BICUBIC, expand=True,
+                         fillcolor=(128, 128, 128))
+    if noise:
+        a = np.asarray(img, dtype=np.float32)
+        a += np.random.default_rng(rng.getrandbits(32)).normal(0, noise, a.shape)
+        img = Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+    return img
+
+
+def encode(img, fmt="png"):
+    buf = io.BytesIO()
+    if fmt == "jpeg":
+        img.save(buf, "JPEG", quality=90)
+    else:
+        img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def generate(count, seed=0, width=1000, noise=0.0, rotation=0.0, fmt="png", kinds=KINDS):
+    # yields one applicant at a time: {"id", "identity", "documents": {kind: {...}}}
+    rng = random.Random(seed)
+    for i in range(count):
+        ident = random_identity(rng)
+        docs = {}
+        for kind in kinds:
+            img = render(kind, ident, width=width, noise=noise, rotation=rotation, rng=rng)
+            docs[kind] = {
+                "filename": f"{i:05d}_{kind}.{'jpg' if fmt == 'jpeg' else 'png'}",
+                "data": encode(img, fmt),
+                "text": "\n".join(line for line, _ in document_lines(kind, ident)),
+                "fields": expected_fields(kind, ident),
+            }
+        yield {"id": i, "identity": ident, "documents": docs}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("out_dir")
+    ap.add_argument("--count", type=int, default=30, help="applicants (one card of each kind)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--width", type=int, default=1000)
+    ap.add_argument("--noise", type=float, default=6.0)
+    ap.add_argument("--rotation", type=float, default=2.0)
+    ap.add_argument("--format", choices=["png", "jpeg"], default="png")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    truth = {}
+    for applicant in generate(args.count, args.seed, args.width, args.noise, args.rotation, args.format):
+        for doc in applicant["documents"].values():
+            with open(os.path.join(args.out_dir, doc["filename"]), "wb") as fh:
+                fh.write(doc["data"])
+            truth[doc["filename"]] = doc["fields"]
+    with open(os.path.join(args.out_dir, "truth.json"), "w", encoding="utf-8") as fh:
+        json.dump(truth, fh, indent=2)
+    print(f"wrote {len(truth)} cards to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
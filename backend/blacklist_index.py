@@ -0,0 +1,143 @@
+import hashlib
+import math
+import threading
+import time
+
+import request_log
+
+
+def normalize_number(num):
+    # canonical form for document numbers: uppercase, no whitespace
+    if num is None:
+        return ""
+    return "".join(str(num).split()).upper()
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, int(capacity))
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+# --- in-process blacklist index ---
+# hash set of normalized numbers, loaded once from Mongo and kept current by the
+# /blacklist handlers, plus a change-stream watcher (replica sets) or a periodic
+# reload so other processes (e.g. job workers) see changes too
+class BlacklistIndex:
+    def __init__(self, coll, use_bloom=False, refresh_interval=60):
+        self.coll = coll
+        self.use_bloom = use_bloom
+        self.refresh_interval = refresh_interval
+        self._keys = set()
+        self._bloom = None
+        self._bloom_dirty = False
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.loaded_at = None
+
+    def _rebuild_bloom(self):
+        bloom = BloomFilter(max(1024, 2 * len(self._keys)))
+        for k in self._keys:
+            bloom.add(k)
+        self._bloom = bloom
+        self._bloom_dirty = False
+
+    def reload(self):
+        keys = set()
+        legacy = []
+        for d in self.coll.find({}, {"number": 1, "numberKey": 1}):
+            key = d.get("numberKey") or normalize_number(d.get("number"))
+            if not key:
+                continue
+            keys.add(key)
+            if not d.get("numberKey"):
+                legacy.append((d["_id"], key))
+        # backfill the indexed key on entries written before it existed
+        for _id, key in legacy:
+            self.coll.update_one({"_id": _id}, {"$set": {"numberKey": key}})
+        with self._lock:
+            self._keys = keys
+            if self.use_bloom:
+                self._rebuild_bloom()
+            self._loaded = True
+            self.loaded_at = time.time()
+        return len(keys)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.coll.create_index("numberKey")
+            self.reload()
+            self.start_watcher()
+
+    def contains(self, num):
+        key = normalize_number(num)
+        if not key:
+            return False
+        self._ensure_loaded()
+        if self.use_bloom:
+            if self._bloom_dirty:
+                with self._lock:
+                    self._rebuild_bloom()
+            if key not in self._bloom:
+                return False
+        return key in self._keys
+
+    def add(self, num):
+        key = normalize_number(num)
+        if not key:
+            return
+        with self._lock:
+            self._keys.add(key)
+            if self._bloom is not None:
+                self._bloom.add(key)
+
+    def remove(self, num):
+        key = normalize_number(num)
+        with self._lock:
+            self._keys.discard(key)
+            # bloom filters cannot delete; rebuild on next lookup
+            self._bloom_dirty = self._bloom is not None
+
+    def size(self):
+        return len(self._keys)
+
+    def start_watcher(self):
+        if self._watcher is not None or self.refresh_interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="blacklist-watch", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        try:
+            with self.coll.watch() as stream:
+                for change in stream:
+                    op = change.get("operationType")
+                    if op == "insert" and change.get("fullDocument"):
+                        self.add(change["fullDocument"].get("number"))
+                    else:
+                        self.reload()
+        except Exception as e:
+            # standalone servers have no change streams; poll instead
+            request_log.log("blacklist_polling", level="warning", error=str(e))
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                request_log.log_exception("blacklist reload", e)
@@ -0,0 +1,145 @@
+# Uploaded document bytes and their content-addressed store.
+#
+# An upload is read once from the request stream: hashed as it is read and
+# kept in memory, or spooled to a temp file once it passes the spool
+# threshold. OCR works from that copy. The store keeps one file per SHA-256
+# (root/ab/cd/<sha256>), so identical uploads are stored once and client
+# filenames never collide. In-memory uploads are written by a background
+# thread; spooled ones are renamed into place.
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import request_log
+
+
+class Upload:
+    def __init__(self, filename, sha256, size, data=None, path=None, content_type=None):
+        self.filename = filename          # as sent by the client, informational only
+        self.sha256 = sha256
+        self.size = size
+        self.data = data                  # bytes, or None when spooled / stored
+        self.path = path
+        self.content_type = content_type
+        self.pending = None               # future of a background store write
+
+    @property
+    def source(self):
+        # what the OCR pool gets: the bytes, or a path
+        return self.data if self.data is not None else self.path
+
+    def read(self):
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as fh:
+            return fh.read()
+
+    def ref(self):
+        return [self.filename, self.sha256, self.size, self.content_type]
+
+
+def read_upload(stream, filename, spool_threshold, spool_dir, content_type=None, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    buf = bytearray()
+    spool = None
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        h.update(chunk)
+        size += len(chunk)
+        if spool is None:
+            buf += chunk
+            if len(buf) > spool_threshold:
+                spool = tempfile.NamedTemporaryFile(dir=spool_dir, prefix="spool-", delete=False)
+                spool.write(buf)
+                buf = None
+        else:
+            spool.write(chunk)
+    if spool is not None:
+        spool.close()
+        return Upload(filename, h.hexdigest(), size, path=spool.name, content_type=content_type)
+    return Upload(filename, h.hexdigest(), size, data=bytes(buf), content_type=content_type)
+
+
+class BlobStore:
+    def __init__(self, root, writers=2):
+        self.root = root
+        self.spool_dir = os.path.join(root, "tmp")   # same filesystem, so spool files rename in
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.writers = writers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_stored = 0
+        self.errors = 0
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, upload):
+        dest = self.path(upload.sha256)
+        spooled = upload.data is None and upload.path and upload.path != dest
+        if os.path.exists(dest):
+            if spooled:
+                os.remove(upload.path)
+            with self._lock:
+                self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if spooled:
+                os.replace(upload.path, dest)
+            else:
+                with tempfile.NamedTemporaryFile(dir=self.spool_dir, prefix="blob-", delete=False) as tmp:
+                    tmp.write(upload.data)
+                os.replace(tmp.name, dest)
+            with self._lock:
+                self.stored += 1
+                self.bytes_stored += upload.size
+        upload.path = dest
+        return dest
+
+    def _put_logged(self, upload):
+        try:
+            return self.put(upload)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            request_log.log_exception("blob store", e, sha256=upload.sha256)
+            raise
+
+    def put_async(self, upload):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.writers, thread_name_prefix="blob-writer")
+        upload.pending = self._executor.submit(self._put_logged, upload)
+        return upload.pending
+
+    def store(self, upload):
+        # spooled uploads are renamed in right away (OCR then reads the stored
+        # copy); in-memory ones are written in the background
+        if upload.data is None:
+            return self.put(upload)
+        return self.put_async(upload)
+
+    def wait(self, upload, timeout=None):
+        if upload.pending is not None:
+            upload.pending.result(timeout=timeout)
+
+    def open_upload(self, filename, digest, size=None, content_type=None):
+        path = self.path(digest)
+        if size is None:
+            size = os.path.getsize(path)
+        return Upload(filename, digest, size, path=path, content_type=content_type)
+
+    def stats(self):
+        with self._lock:
+            return {"stored": self.stored, "deduplicated": self.deduplicated,
+                    "bytesStored": self.bytes_stored, "errors": self.errors}
@@ -0,0 +1,97 @@
+# Canonical document-number lookup used for duplicate detection.
+#
+# One small entry per (record, document number) in the document_numbers
+# collection, indexed on numberKey, so a duplicate check is a single indexed
+# query over pending, approved and rejected records alike.
+#
+#   python doc_numbers.py backfill     # index records written before this existed
+import sys
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from blacklist_index import normalize_number
+
+
+class DocumentNumberIndex:
+    def __init__(self, coll):
+        self.coll = coll
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            self.coll.create_index([("numberKey", 1), ("recordId", 1)], unique=True)
+            self.coll.create_index("recordId")
+            self._indexed = True
+
+    def find(self, num, limit=50):
+        key = normalize_number(num)
+        if not key:
+            return []
+        self.ensure_indexes()
+        return list(self.coll.find({"numberKey": key}, {"_id": 0, "recordId": 1, "status": 1}).limit(limit))
+
+    def _ops(self, record_id, documents, status, created_at):
+        ops = []
+        for doc in documents or []:
+            key = doc.get("numberKey") or normalize_number(doc.get("number"))
+            if not key:
+                continue
+            ops.append(UpdateOne(
+                {"numberKey": key, "recordId": record_id},
+                {"$set": {"status": status, "type": doc.get("type")},
+                 "$setOnInsert": {"created_at": created_at}},
+                upsert=True))
+        return ops
+
+    def add_record(self, record_id, documents, status="Pending"):
+        self.ensure_indexes()
+        ops = self._ops(str(record_id), documents, status, datetime.utcnow().isoformat())
+        if ops:
+            self.coll.bulk_write(ops, ordered=False)
+
+    def set_status(self, record_ids, status):
+        self.ensure_indexes()
+        ids = [str(r) for r in record_ids]
+        if ids:
+            self.coll.update_many({"recordId": {"$in": ids}}, {"$set": {"status": status}})
+
+    def backfill(self, sources, batch_size=1000):
+        # sources: {status: collection}. Also stamps documents.N.numberKey on
+        # records that predate the canonical field.
+        self.ensure_indexes()
+        total = 0
+        for status, coll in sources.items():
+            ops, record_ops = [], []
+            for rec in coll.find({}, {"documents.number": 1, "documents.type": 1,
+                                      "documents.numberKey": 1, "timestamp": 1}):
+                docs = rec.get("documents") or []
+                ops += self._ops(str(rec["_id"]), docs, status, rec.get("timestamp"))
+                stamp = {f"documents.{i}.numberKey": normalize_number(d.get("number"))
+                         for i, d in enumerate(docs) if d.get("number") and not d.get("numberKey")}
+                if stamp:
+                    record_ops.append(UpdateOne({"_id": rec["_id"]}, {"$set": stamp}))
+                if len(ops) >= batch_size:
+                    self.coll.bulk_write(ops, ordered=False)
+                    total += len(ops)
+                    ops = []
+                if len(record_ops) >= batch_size:
+                    coll.bulk_write(record_ops, ordered=False)
+                    record_ops = []
+            if ops:
+                self.coll.bulk_write(ops, ordered=False)
+                total += len(ops)
+            if record_ops:
+                coll.bulk_write(record_ops, ordered=False)
+            print(f"[BACKFILL] {status}: done")
+        return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("usage: python doc_numbers.py backfill")
+        sys.exit(1)
+    from app import collection, approved_collection, rejected_collection, document_numbers
+    n = document_numbers.backfill({"Pending": collection, "Approved": approved_collection,
+                                   "Rejected": rejected_collection})
+    print(f"[BACKFILL] {n} document numbers indexed")
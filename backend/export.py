@@ -0,0 +1,172 @@
+# Streaming exports for /export_csv.
+#
+# Rows are read off batched cursors with a projection and encoded into
+# fixed-size chunks as they arrive, so memory stays flat however many records
+# are exported. Formats: csv (default), ndjson, parquet (needs pyarrow); csv
+# and ndjson can be gzipped on the fly.
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet export is optional
+    pa = None
+
+EXPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+PARQUET_ROW_GROUP = 20000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+RECORD_HEADERS = ["record_id", "userName", "overallFraudScore", "overallRiskLevel", "finalStatus", "status",
+                  "timestamp", "documents_summary"]
+RECORD_FIELDS = {"userName": 1, "overallFraudScore": 1, "overallRiskLevel": 1, "finalStatus": 1, "status": 1,
+                 "timestamp": 1, "documents.type": 1, "documents.number": 1}
+
+ALERT_HEADERS = ["aml_id", "created_at", "userName", "alert_type", "number", "matches"]
+ALERT_FIELDS = {"created_at": 1, "userName": 1, "alerts.type": 1, "alerts.number": 1, "alerts.matches": 1}
+
+
+def iter_documents(collections, projection, batch_size=EXPORT_BATCH_SIZE):
+    for coll in collections:
+        cursor = coll.find({}, projection, batch_size=batch_size)
+        try:
+            for doc in cursor:
+                yield doc
+        finally:
+            cursor.close()
+
+
+def record_rows(docs):
+    for d in docs:
+        yield {
+            "record_id": str(d.get("_id")),
+            "userName": d.get("userName"),
+            "overallFraudScore": d.get("overallFraudScore"),
+            "overallRiskLevel": d.get("overallRiskLevel"),
+            "finalStatus": d.get("finalStatus"),
+            "status": d.get("status"),
+            "timestamp": d.get("timestamp"),
+            "documents_summary": "; ".join([f"{doc.get('type')}:{doc.get('number') or 'N/A'}"
+                                            for doc in d.get("documents", [])]),
+        }
+
+
+def _match_ref(m):
+    # record ids, or watchlist hits ({name, listType, ...})
+    if isinstance(m, dict):
+        return str(m.get("recordId") or m.get("name") or "")
+    return str(m)
+
+
+def alert_rows(docs):
+    for d in docs:
+        for a in d.get("alerts", []):
+            yield {
+                "aml_id": str(d.get("_id")),
+                "created_at": d.get("created_at"),
+                "userName": d.get("userName"),
+                "alert_type": a.get("type"),
+                "number": a.get("number"),
+                "matches": ",".join(_match_ref(m) for m in a.get("matches") or []),
+            }
+
+
+def csv_chunks(rows, headers, chunk_size=CHUNK_SIZE):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=headers)
+    writer.writeheader()
+    for r in rows:
+        writer.writerow({h: r.get(h, "") for h in headers})
+        if buf.tell() >= chunk_size:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(rows, headers, chunk_size=CHUNK_SIZE):
+    parts, size = [], 0
+    for r in rows:
+        line = json.dumps({h: r.get(h) for h in headers}, default=str) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    # write-only file object that hands written bytes back to the generator
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        out = b"".join(self.parts)
+        self.parts = []
+        return out
+
+
+def parquet_chunks(rows, headers, row_group_size=PARQUET_ROW_GROUP):
+    # one row group per batch; every column is written as a string so the
+    # schema does not depend on what the first batch happens to contain
+    schema = pa.schema([(h, pa.string()) for h in headers])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        batch = []
+        for r in rows:
+            batch.append(r)
+            if len(batch) >= row_group_size:
+                writer.write_table(_parquet_table(batch, headers, schema))
+                batch = []
+                out = sink.drain()
+                if out:
+                    yield out
+        if batch:
+            writer.write_table(_parquet_table(batch, headers, schema))
+    finally:
+        writer.close()
+    out = sink.drain()
+    if out:
+        yield out
+
+
+def _parquet_table(batch, headers, schema):
+    cols = [[None if r.get(h) is None else str(r.get(h)) for r in batch] for h in headers]
+    return pa.Table.from_arrays(cols, schema=schema)
+
+
+def gzip_chunks(chunks, level=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for c in chunks:
+        out = z.compress(c)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def export_chunks(rows, headers, fmt="csv", gzip=False):
+    if fmt == "parquet":
+        if pa is None:
+            raise RuntimeError("parquet export needs pyarrow")
+        return parquet_chunks(rows, headers)
+    chunks = ndjson_chunks(rows, headers) if fmt == "ndjson" else csv_chunks(rows, headers)
+    return gzip_chunks(chunks) if gzip else chunks
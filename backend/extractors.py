@@ -0,0 +1,278 @@
+import re
+
+# --- field extraction from OCR text ---
+# Document types live in a registry: each declares its number patterns, the
+# fields to read and its base fraud score. Text is prepared once per call:
+# lines are split once, label patterns run against one lower-cased copy, and a
+# single scan over digit runs (bucketed by run length) yields the candidate
+# positions for every number pattern, which are then confirmed with an anchored
+# match. Results are identical to trying each pattern with re.search.
+
+DIGIT_RUN = re.compile(r"\d+")
+
+# label patterns, lower-case versions for the lowered text; the *_I variants
+# are used on the original text when lower() changes its length
+NAME_LABEL = re.compile(r"(?:name|naam|नाम)[:\s\-]*([a-z][a-z\s\.\-]{1,120})")
+NAME_LABEL_I = re.compile(r"(?:Name|Naam|नाम)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{1,120})", re.IGNORECASE)
+NAME_CUT = re.compile(r"\s{2,}|,|DOB|D\.O\.B|Father|S\/O|S\.O\.")
+NAME_TITLE_LINE = re.compile(r"^[A-Z][a-z]+(?:\s[A-Z][a-z]+)+$")
+NAME_UPPER_LINE = re.compile(r"^[A-Z\s]{3,}$")
+NAME_LOOSE_LINE = re.compile(r"^[A-Za-z][A-Za-z\s\.'\-]{3,}$")
+
+FATHER_LABEL = re.compile(r"(?:father|father's name|father|s\/o|s\.o\.|shri)[:\s\-]*([a-z][a-z\s\.\-]{2,80})")
+FATHER_LABEL_I = re.compile(r"(?:Father|Father's Name|FATHER|S\/O|S\.O\.|Shri)[:\s\-]*([A-Za-z][A-Za-z\s\.\-]{2,80})", re.IGNORECASE)
+RELATION = re.compile(r"\b(?:s\/o|d\/o|son of|daughter of)\s+([a-z][a-z\s\.\-]{2,80})")
+RELATION_I = re.compile(r"\b(?:S\/O|D\/O|Son of|Daughter of)\s+([A-Za-z][A-Za-z\s\.\-]{2,80})", re.IGNORECASE)
+
+DOB_LABEL = re.compile(r"(?:dob|d\.o\.b|date of birth|birth)[:\s\-]*([0-9]{1,4}[-/\.][0-9]{1,2}[-/\.][0-9]{2,4})")
+DOB_LABEL_I = re.compile(r"(?:DOB|D\.O\.B|Date of Birth|Birth)[:\s\-]*([0-9]{1,4}[-/\.][0-9]{1,2}[-/\.][0-9]{2,4})", re.IGNORECASE)
+BARE_DATE = re.compile(r"([0-9]{2}[-/\.][0-9]{2}[-/\.][0-9]{4})")
+
+GENDER = re.compile(r"\b(male|female|other|m|f)\b")
+GENDER_I = re.compile(r"\b(Male|Female|Other|M|F)\b", re.IGNORECASE)
+
+DATE_PARTS = re.compile(r"[-/\.]")
+NON_DIGIT = re.compile(r"\D")
+
+
+class TextContext:
+    # per-call view of the OCR text shared by all extractors
+    def __init__(self, text):
+        self.text = text
+        low = text.lower()
+        # lower() can change the length of some non-ASCII text; spans taken
+        # from the lowered copy are only valid when it does not
+        self.low = low if len(low) == len(text) else None
+        self._lines = None
+        self._runs = None   # run length -> [start, ...] in text order
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = [ln.strip() for ln in self.text.splitlines() if ln.strip()]
+        return self._lines
+
+    @property
+    def digit_runs(self):
+        if self._runs is None:
+            runs = {}
+            for m in DIGIT_RUN.finditer(self.text):
+                s, e = m.span()
+                runs.setdefault(e - s, []).append(s)
+            self._runs = runs
+        return self._runs
+
+    def search(self, low_pattern, pattern):
+        # returns (start, end) of group 1, or None
+        if self.low is not None:
+            m = low_pattern.search(self.low)
+        else:
+            m = pattern.search(self.text)
+        return m.span(1) if m else None
+
+    def first_at_runs(self, pattern, offset, lengths):
+        # leftmost match of pattern starting `offset` chars before a digit run
+        # whose length is one of `lengths`
+        runs = self.digit_runs
+        best = None
+        for n in lengths:
+            for s in runs.get(n, ()):
+                pos = s - offset
+                if pos < 0:
+                    continue
+                if best is not None and pos >= best.start():
+                    break
+                m = pattern.match(self.text, pos)
+                if m:
+                    best = m
+                    break
+        return best
+
+
+class NumberPattern:
+    # pattern: compiled regex for the number.
+    # offset / lengths: every match starts `offset` chars before a digit run of
+    # one of these lengths (see TextContext.first_at_runs); lengths=None falls
+    # back to a plain search.
+    def __init__(self, pattern, offset=0, lengths=None):
+        self.pattern = pattern
+        self.offset = offset
+        self.lengths = tuple(lengths) if lengths is not None else None
+
+    def find(self, ctx):
+        if self.lengths is None:
+            return self.pattern.search(ctx.text)
+        return ctx.first_at_runs(self.pattern, self.offset, self.lengths)
+
+
+class DocumentType:
+    def __init__(self, name, numbers, fields, fraud_score, format_number=None, keywords=None):
+        self.name = name
+        self.numbers = numbers
+        self.fields = fields
+        self.fraud_score = fraud_score
+        self.format_number = format_number or (lambda m: m.group(0).upper())
+        self.keywords = keywords
+
+    def match(self, ctx):
+        if self.keywords:
+            hay = ctx.low if ctx.low is not None else ctx.text.lower()
+            if not any(k in hay for k in self.keywords):
+                return None
+        for num in self.numbers:
+            m = num.find(ctx)
+            if m:
+                return m
+        return None
+
+
+# --- field extractors ---
+def find_name(ctx):
+    span = ctx.search(NAME_LABEL, NAME_LABEL_I)
+    if span:
+        cand = ctx.text[span[0]:span[1]].strip()
+        return NAME_CUT.split(cand, maxsplit=1)[0].strip()
+    # a few heuristics on first lines
+    lines = ctx.lines
+    for ln in lines[:10]:
+        if NAME_TITLE_LINE.match(ln):
+            return ln
+        if NAME_UPPER_LINE.match(ln) and len(ln.split()) >= 2:
+            return ln.title()
+    for ln in lines[:12]:
+        if NAME_LOOSE_LINE.match(ln) and len(ln.split()) >= 2:
+            return ln
+    return None
+
+
+def find_father_name(ctx):
+    span = ctx.search(FATHER_LABEL, FATHER_LABEL_I) or ctx.search(RELATION, RELATION_I)
+    if span:
+        return ctx.text[span[0]:span[1]].strip()
+    return None
+
+
+def normalize_date_string(s):
+    s = (s or "").strip()
+    parts = DATE_PARTS.split(s)
+    if len(parts) == 3:
+        # handle yyyy-mm-dd and dd-mm-yyyy
+        if len(parts[0]) == 4:
+            yyyy, mm, dd = parts
+        else:
+            dd, mm, yyyy = parts
+        if len(yyyy) == 2:
+            yy = int(yyyy)
+            yyyy = f"19{yyyy}" if yy > 30 else f"20{yyyy}"
+        try:
+            return f"{str(int(dd)).zfill(2)}/{str(int(mm)).zfill(2)}/{int(yyyy)}"
+        except:
+            return s
+    return s
+
+
+def find_dob(ctx):
+    span = ctx.search(DOB_LABEL, DOB_LABEL_I)
+    if span:
+        return normalize_date_string(ctx.text[span[0]:span[1]])
+    m = BARE_DATE.search(ctx.text)
+    if m:
+        return normalize_date_string(m.group(1))
+    return None
+
+
+def find_gender(ctx):
+    span = ctx.search(GENDER, GENDER_I)
+    if not span:
+        return None
+    g = ctx.text[span[0]:span[1]].lower()
+    if g in ("m", "male"):
+        return "Male"
+    if g in ("f", "female"):
+        return "Female"
+    return "Other"
+
+
+FIELD_EXTRACTORS = {
+    "Name": find_name,
+    "FatherName": find_father_name,
+    "DOB": find_dob,
+    "Gender": find_gender,
+}
+
+# --- document type registry (checked in order) ---
+DOCUMENT_TYPES = []
+
+
+def register_document_type(doc_type, before=None):
+    names = [d.name for d in DOCUMENT_TYPES]
+    if doc_type.name in names:
+        DOCUMENT_TYPES.pop(names.index(doc_type.name))
+        names.remove(doc_type.name)
+    if before in names:
+        DOCUMENT_TYPES.insert(names.index(before), doc_type)
+    else:
+        DOCUMENT_TYPES.append(doc_type)
+    return doc_type
+
+
+def _aadhaar_number(m):
+    digits = NON_DIGIT.sub("", m.group(0))
+    return f"{digits[:4]} {digits[4:8]} {digits[8:12]}"
+
+
+# --- Patterns for document numbers ---
+AADHAAR_SPACED = re.compile(r"\b\d{4}\s\d{4}\s\d{4}\b")
+AADHAAR_CONTIG = re.compile(r"\b\d{12}\b")
+PAN_PATTERN = re.compile(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", re.IGNORECASE)
+DL_PATTERN = re.compile(r"\b[A-Z]{2}\d{2}\s?\d{6,12}\b", re.IGNORECASE)
+EPIC_PATTERN = re.compile(r"\b[A-Z]{3}[0-9]{7}\b")
+PASSPORT_PATTERN = re.compile(r"\b[A-Z][0-9]{7}\b")
+
+register_document_type(DocumentType(
+    "Aadhaar",
+    [NumberPattern(AADHAAR_SPACED, 0, [4]), NumberPattern(AADHAAR_CONTIG, 0, [12])],
+    ["Name", "FatherName", "DOB", "Gender"], 10, format_number=_aadhaar_number))
+register_document_type(DocumentType(
+    "PAN", [NumberPattern(PAN_PATTERN, 5, [4])], ["Name", "FatherName"], 15))
+register_document_type(DocumentType(
+    "Driving Licence", [NumberPattern(DL_PATTERN, 2, [2] + list(range(8, 15)))], ["Name", "FatherName", "DOB"], 20))
+register_document_type(DocumentType(
+    "Voter ID", [NumberPattern(EPIC_PATTERN, 3, [7])], ["Name", "FatherName", "DOB", "Gender"], 20,
+    keywords=("election commission", "elector", "epic")))
+register_document_type(DocumentType(
+    "Passport", [NumberPattern(PASSPORT_PATTERN, 1, [7])], ["Name", "DOB", "Gender"], 20,
+    keywords=("passport",)))
+
+
+def extract_details_from_text(text):
+    out = {
+        "Document Type": "Unknown",
+        "Name": None,
+        "FatherName": None,
+        "DOB": None,
+        "Gender": None,
+        "number": None,
+        "fraudScore": 30,
+        "reasons": []
+    }
+    if not text:
+        out["reasons"].append("No OCR text")
+        out["fraudScore"] = 80
+        return out
+
+    ctx = TextContext(text)
+    for doc_type in DOCUMENT_TYPES:
+        m = doc_type.match(ctx)
+        if not m:
+            continue
+        out["Document Type"] = doc_type.name
+        out["number"] = doc_type.format_number(m)
+        for field in doc_type.fields:
+            out[field] = FIELD_EXTRACTORS[field](ctx)
+        out["fraudScore"] = doc_type.fraud_score
+        return out
+
+    out["reasons"].append("Document not recognized")
+    out["fraudScore"] = 80
+    return out
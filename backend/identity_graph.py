@@ -0,0 +1,327 @@
+# Identity graph for fraud-ring detection.
+#
+# Every record is linked to the identifying keys read off it:
+#   num:<numberKey>            a document number
+#   nd:<name>|<dob>            applicant or document name with date of birth
+#   fd:<father's name>|<dob>   father's name with date of birth
+# Document images are not keys: cards of different people printed on the
+# same template share a dHash (see image_hash.py). img:<dhash> keys stored by
+# earlier versions are ignored.
+# Records sharing any key end up in one connected component, a candidate
+# ring. Components are kept with a union-find over the key nodes (path
+# halving, union by size) in flat int arrays, each root counting the records
+# in its component; a record's keys are unioned as it is written. A key
+# carried by more than max_key_degree records (a common name + DOB, a
+# placeholder number) stops joining records together.
+#
+# A component's members are read from identity_keys (one doc per record,
+# multikey index on keys) breadth-first; cluster_score() builds the record x
+# key incidence matrix of those members in CSR form (NumPy index arrays) and
+# measures how many keys they share and how densely they are linked.
+#
+#   python identity_graph.py backfill     # keys for records written before this existed
+import hashlib
+import re
+import sys
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+
+import request_log
+
+_NON_LETTER = re.compile(r"[^a-z ]+")
+_SPACES = re.compile(r"\s+")
+# card headers the extractor can return as a name; as keys they would link
+# everyone born on the same day
+_HEADER_WORDS = {"government", "india", "income", "tax", "department", "driving", "licence", "license"}
+
+
+def _name(s):
+    if not s:
+        return ""
+    # OCR can run a name into the next label ("Suresh Sharma\nDOB")
+    s = str(s).strip().splitlines()[0].lower()
+    s = _SPACES.sub(" ", _NON_LETTER.sub(" ", s)).strip()
+    return "" if _HEADER_WORDS.intersection(s.split()) else s
+
+
+def record_keys(record):
+    # identity keys of a record: {userName, userDob, documents: [...]}
+    keys = []
+    user_dob = (record.get("userDob") or "").strip()
+    name = _name(record.get("userName"))
+    if name and user_dob:
+        keys.append(f"nd:{name}|{user_dob}")
+    for d in record.get("documents") or []:
+        dob = d.get("DOB") or user_dob
+        if d.get("numberKey"):
+            keys.append(f"num:{d['numberKey']}")
+        name = _name(d.get("Name"))
+        if name and dob:
+            keys.append(f"nd:{name}|{dob}")
+        father = _name(d.get("FatherName"))
+        if father and dob:
+            keys.append(f"fd:{father}|{dob}")
+    return list(dict.fromkeys(keys))
+
+
+def _linking(keys):
+    # stored keys minus the image keys earlier versions wrote
+    return [k for k in keys or [] if not k.startswith("img:")]
+
+
+def _key_id(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def cluster_score(members):
+    # members: {recordId: [key, ...]} -> ring statistics
+    ids = list(members)
+    n = len(ids)
+    key_index = {}
+    indices = []
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    for r, rid in enumerate(ids):
+        for k in members[rid]:
+            indices.append(key_index.setdefault(k, len(key_index)))
+        indptr[r + 1] = len(indices)
+    indices = np.asarray(indices, dtype=np.int64)
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+    key_degree = np.bincount(indices, minlength=len(key_index))
+
+    # transpose (key -> records), then the off-diagonal non-zeros of A.A^T:
+    # every pair of records under a shared key
+    order = np.argsort(indices, kind="stable")
+    by_key = rows[order]
+    ends = np.cumsum(key_degree)
+    pairs = []
+    for k in np.nonzero(key_degree >= 2)[0]:
+        m = by_key[ends[k] - key_degree[k]:ends[k]]
+        i, j = np.triu_indices(len(m), 1)
+        pairs.append(np.minimum(m[i], m[j]) * n + np.maximum(m[i], m[j]))
+    linked = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+    links = np.bincount(np.concatenate([linked // n, linked % n]), minlength=n) if n else linked
+
+    keys = list(key_index)
+    shared = key_degree >= 2
+    by_kind = {}
+    for k in np.nonzero(shared)[0]:
+        kind = keys[k].split(":", 1)[0]
+        by_kind[kind] = by_kind.get(kind, 0) + 1
+    possible = n * (n - 1) // 2
+    return {
+        "records": n,
+        "keys": len(keys),
+        "sharedKeys": int(shared.sum()),
+        "sharedByKind": by_kind,
+        "linkedPairs": int(len(linked)),
+        "density": round(len(linked) / possible, 4) if possible else 0.0,
+        "maxLinks": int(links.max()) if n else 0,
+        "numbers": sum(1 for k in keys if k.startswith("num:")),
+    }
+
+
+class IdentityGraph:
+    def __init__(self, coll, max_key_degree=50, refresh_interval=30, overlap=120):
+        self.coll = coll
+        self.max_key_degree = max_key_degree
+        self.refresh_interval = refresh_interval
+        self.overlap = overlap              # seconds of writes re-read on refresh (clock skew)
+        self.writer = uuid.uuid4().hex      # tags this process's writes so refresh skips them
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._nodes = {}                    # key hash -> node
+        self._parent = array("i")
+        self._size = array("i")             # nodes in the component (at roots)
+        self._records = array("i")          # records in the component (at roots)
+        self._degree = array("i")           # records carrying the key
+        self.record_count = 0
+        self._recent = {}
+        self._loaded = False
+        self._refreshed_at = None
+
+    # --- union-find, caller holds _lock ---
+    def _node(self, key):
+        h = _key_id(key)
+        i = self._nodes.get(h)
+        if i is None:
+            i = self._nodes[h] = len(self._parent)
+            self._parent.append(i)
+            self._size.append(1)
+            self._records.append(0)
+            self._degree.append(0)
+        return i
+
+    def _find(self, i):
+        p = self._parent
+        while p[i] != i:
+            p[i] = p[p[i]]
+            i = p[i]
+        return i
+
+    def _union(self, a, b):
+        # a, b: roots
+        if a == b:
+            return a
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self._records[a] += self._records[b]
+        return a
+
+    def _add(self, keys):
+        with self._lock:
+            joining = []
+            for k in keys:
+                i = self._node(k)
+                self._degree[i] += 1
+                if self._degree[i] <= self.max_key_degree:
+                    joining.append(i)
+            self.record_count += 1
+            if not joining:
+                return
+            root = self._find(joining[0])
+            for i in joining[1:]:
+                root = self._union(root, self._find(i))
+            self._records[root] += 1
+
+    def _joinable(self, key):
+        # node of a key a new record would still join through, else None
+        i = self._nodes.get(_key_id(key))
+        if i is None or self._degree[i] >= self.max_key_degree:
+            return None
+        return i
+
+    # --- persistence, as in image_hash.ImageHashIndex ---
+    def _load(self, query, since):
+        n = 0
+        for d in self.coll.find(query, {"keys": 1}):
+            if d["_id"] >= since:
+                if d["_id"] in self._recent:
+                    continue
+                self._recent[d["_id"]] = True
+            self._add(_linking(d.get("keys")))
+            n += 1
+        return n
+
+    def ensure_loaded(self):
+        now = time.time()
+        if self._loaded and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._load_lock:
+            recent = ObjectId.from_datetime(datetime.utcfromtimestamp(now - 2 * self.overlap))
+            if not self._loaded:
+                self.coll.create_index("keys")
+                self.coll.create_index("recordId")
+                n = self._load({}, recent)
+                request_log.log("identity_graph_loaded", records=n, keys=len(self._nodes))
+                self._loaded = True
+            elif now - self._refreshed_at >= self.refresh_interval:
+                since = ObjectId.from_datetime(datetime.utcfromtimestamp(self._refreshed_at - self.overlap))
+                self._load({"_id": {"$gte": since}, "writer": {"$ne": self.writer}}, recent)
+                self._recent = {k: v for k, v in self._recent.items() if k >= recent}
+            self._refreshed_at = now
+
+    def add_record(self, record_id, keys):
+        if not keys:
+            return
+        self.ensure_loaded()
+        self.coll.insert_one({"recordId": str(record_id), "keys": keys, "writer": self.writer,
+                              "created_at": datetime.utcnow().isoformat()})
+        self._add(keys)
+
+    # --- queries ---
+    def linked_records(self, keys):
+        # records already in the components these keys would join
+        self.ensure_loaded()
+        with self._lock:
+            roots = {self._find(i) for i in (self._joinable(k) for k in keys) if i is not None}
+            return sum(self._records[r] for r in roots)
+
+    def keys_for(self, record_id):
+        d = self.coll.find_one({"recordId": str(record_id)}, {"keys": 1})
+        return _linking(d.get("keys")) if d else None
+
+    def degree(self, key):
+        with self._lock:
+            i = self._nodes.get(_key_id(key))
+            return self._degree[i] if i is not None else 0
+
+    def cluster(self, keys, max_records=500):
+        # ({recordId: keys}, truncated): records reachable from `keys` through
+        # keys that still join records, breadth-first over identity_keys
+        self.ensure_loaded()
+        with self._lock:
+            frontier = [k for k in keys if self._degree_of(k) <= self.max_key_degree]
+        seen = set(frontier)
+        members = {}
+        truncated = False
+        while frontier:
+            for d in self.coll.find({"keys": {"$in": frontier}}, {"recordId": 1, "keys": 1}):
+                if d["recordId"] in members:
+                    continue
+                if len(members) >= max_records:
+                    truncated = True
+                    break
+                members[d["recordId"]] = _linking(d.get("keys"))
+            if truncated:
+                break
+            nxt = []
+            with self._lock:
+                for ks in members.values():
+                    for k in ks:
+                        if k not in seen and self._degree_of(k) <= self.max_key_degree:
+                            seen.add(k)
+                            nxt.append(k)
+            frontier = nxt
+        return members, truncated
+
+    def _degree_of(self, key):
+        i = self._nodes.get(_key_id(key))
+        return self._degree[i] if i is not None else 0
+
+    def stats(self):
+        with self._lock:
+            return {"records": self.record_count, "keys": len(self._nodes), "maxKeyDegree": self.max_key_degree}
+
+    def backfill(self, sources, batch_size=1000):
+        # sources: [collection]; keys for records that have none yet
+        self.coll.create_index("keys")
+        self.coll.create_index("recordId")
+        done = {d["recordId"] for d in self.coll.find({}, {"recordId": 1})}
+        total, batch = 0, []
+        for coll in sources:
+            for rec in coll.find({}, {"userName": 1, "userDob": 1, "documents": 1}):
+                rid = str(rec["_id"])
+                if rid in done:
+                    continue
+                keys = record_keys(rec)
+                if keys:
+                    batch.append({"recordId": rid, "keys": keys, "writer": "backfill",
+                                  "created_at": datetime.utcnow().isoformat()})
+                if len(batch) >= batch_size:
+                    self.coll.insert_many(batch)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            self.coll.insert_many(batch)
+            total += len(batch)
+        return total
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("usage: python identity_graph.py backfill")
+        sys.exit(2)
+    from pymongo import MongoClient
+    import os
+    db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))[os.environ.get("MONGO_DB", "KYCDB")]
+    graph = IdentityGraph(db["identity_keys"])
+    n = graph.backfill([db["extracted"], db["approved_records"], db["rejected_records"]])
+    print(f"[IDENTITY GRAPH] backfilled {n} records")
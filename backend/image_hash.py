@@ -0,0 +1,267 @@
+# Perceptual hashes of document images and a Hamming-distance index over them.
+#
+# dHash (gradient signs of a 9x8 grey thumbnail) is what the index searches:
+# it moves only a few bits under re-encoding, resizing, blur, slight crops and
+# local edits such as a retouched number. pHash (low frequencies of a 32x32
+# DCT) is a second, looser check on the same candidates.
+#
+# Neither tells two cards printed on the same template apart: the template
+# (layout, colours, emblem, photo box) carries almost all of a thumbnail's
+# gradients, and cards of different people can be a handful of bits apart.
+# A hash hit is therefore only a candidate. It counts as the same card when
+# the identity fields read off both images (name, DOB, document number) mostly
+# agree: a retouched number keeps the name and DOB, a pasted name keeps the
+# number and DOB. Where no field can be compared (OCR found none on one side,
+# or an entry from before fields were stored) only a near-exact hash match,
+# within exact_distance bits of both hashes, counts.
+#
+# Index: multi-index hashing. The 64-bit dHash is cut into 4 chunks of 16 bits,
+# each with its own table. Two hashes within distance r agree to within r // 4
+# bits on at least one chunk, so probing every chunk value within that radius
+# yields all candidates; their exact distances are one vectorized XOR +
+# popcount.
+import difflib
+import re
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime
+from itertools import combinations
+
+import numpy as np
+from bson import ObjectId
+from PIL import Image, ImageOps
+
+import request_log
+from ocr import open_image
+
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+NAME_MATCH = 0.85     # difflib ratio for two names to count as the same
+_NON_LETTER = re.compile(r"[^a-z]+")
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def to_hex(h):
+    return f"{h:016x}"
+
+
+def from_hex(s):
+    return int(s, 16)
+
+
+def image_hashes(source):
+    # source: path or image bytes -> {"phash": int, "dhash": int}
+    img = open_image(source)
+    if img.format == "JPEG":
+        img.draft("L", (128, 128))   # decode at reduced scale, much cheaper on phone photos
+    img = ImageOps.exif_transpose(img).convert("L")
+    a = np.asarray(img.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ a @ _DCT32.T)[:8, :8]
+    ph = _to_int(low > np.median(low.ravel()[1:]))
+    d = np.asarray(img.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    dh = _to_int(d[:, 1:] > d[:, :-1])
+    return {"phash": ph, "dhash": dh}
+
+
+def card_fields(name=None, dob=None, number_key=None):
+    # identity fields of a card as stored with its hashes; empty ones left out
+    fields = {"name": _NON_LETTER.sub("", str(name or "").lower()), "dob": (dob or "").strip(),
+              "number": number_key or ""}
+    return {k: v for k, v in fields.items() if v}
+
+
+def same_card(a, b):
+    # (comparable fields, whether most of them agree)
+    comparable = shared = 0
+    for key in ("name", "dob", "number"):
+        x, y = a.get(key), b.get(key)
+        if not x or not y:
+            continue
+        comparable += 1
+        if key == "name":
+            shared += x == y or difflib.SequenceMatcher(None, x, y).ratio() >= NAME_MATCH
+        else:
+            shared += x == y
+    return comparable, 2 * shared > comparable
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount64(x):
+        return np.bitwise_count(x)
+else:
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount64(x):
+        return _POP8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+_FLIP_MASKS = {}
+
+
+def _flip_masks(radius):
+    # XOR masks for every CHUNK_BITS-bit value within `radius` bit flips
+    masks = _FLIP_MASKS.get(radius)
+    if masks is None:
+        masks = [0]
+        for r in range(1, radius + 1):
+            for bits in combinations(range(CHUNK_BITS), r):
+                masks.append(sum(1 << b for b in bits))
+        _FLIP_MASKS[radius] = masks
+    return masks
+
+
+class ImageHashIndex:
+    def __init__(self, coll, max_distance=8, phash_distance=12, exact_distance=2, refresh_interval=30, overlap=120):
+        self.coll = coll
+        self.max_distance = max_distance      # dHash bits
+        self.phash_distance = phash_distance
+        self.exact_distance = exact_distance  # both hashes, when no field can be compared
+        self.refresh_interval = refresh_interval
+        self.overlap = overlap            # seconds of writes re-read on refresh (clock skew)
+        self.writer = uuid.uuid4().hex    # tags this process's writes so refresh skips them
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._tables = [dict() for _ in range(CHUNKS)]
+        self._phash = array("Q")
+        self._dhash = array("Q")
+        self._meta = []
+        self._recent = {}
+        self._loaded = False
+        self._refreshed_at = None
+
+    def __len__(self):
+        return len(self._meta)
+
+    def _add(self, ph, dh, meta):
+        with self._lock:
+            idx = len(self._meta)
+            self._phash.append(ph)
+            self._dhash.append(dh)
+            self._meta.append(meta)
+            for c in range(CHUNKS):
+                key = (dh >> (c * CHUNK_BITS)) & CHUNK_MASK
+                p = self._tables[c].get(key)
+                if p is None:
+                    p = self._tables[c][key] = array("i")
+                p.append(idx)
+        return idx
+
+    def _load(self, query, since):
+        # remembers ids from `since` on: a later refresh reads them again
+        n = 0
+        for d in self.coll.find(query, {"recordId": 1, "type": 1, "blob": 1, "phash": 1, "dhash": 1, "fields": 1}):
+            if d["_id"] >= since:
+                if d["_id"] in self._recent:
+                    continue
+                self._recent[d["_id"]] = True
+            self._add(from_hex(d["phash"]), from_hex(d["dhash"]),
+                      {"recordId": d.get("recordId"), "type": d.get("type"), "blob": d.get("blob"),
+                       "fields": d.get("fields") or {}})
+            n += 1
+        return n
+
+    def ensure_loaded(self):
+        # full load once, then every refresh_interval the entries other
+        # processes wrote (ObjectIds from slightly before the last refresh on)
+        now = time.time()
+        if self._loaded and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._load_lock:
+            recent = ObjectId.from_datetime(datetime.utcfromtimestamp(now - 2 * self.overlap))
+            if not self._loaded:
+                self.coll.create_index("recordId")
+                n = self._load({}, recent)
+                request_log.log("image_hashes_loaded", images=n)
+                self._loaded = True
+            elif now - self._refreshed_at >= self.refresh_interval:
+                since = ObjectId.from_datetime(datetime.utcfromtimestamp(self._refreshed_at - self.overlap))
+                self._load({"_id": {"$gte": since}, "writer": {"$ne": self.writer}}, recent)
+                # ids older than the overlap window are never read again
+                self._recent = {k: v for k, v in self._recent.items() if k >= recent}
+            self._refreshed_at = now
+
+    def near(self, hashes, fields=None, max_distance=None, limit=10):
+        # entries within max_distance bits of dHash (and phash_distance of
+        # pHash) that are the same card: see the header
+        if not hashes:
+            return []
+        self.ensure_loaded()
+        r = self.max_distance if max_distance is None else max_distance
+        ph, dh = hashes["phash"], hashes["dhash"]
+        masks = _flip_masks(r // CHUNKS)
+        flat = array("i")
+        with self._lock:
+            for c in range(CHUNKS):
+                table = self._tables[c]
+                chunk = (dh >> (c * CHUNK_BITS)) & CHUNK_MASK
+                for m in masks:
+                    p = table.get(chunk ^ m)
+                    if p:
+                        flat.extend(p)
+            if not flat:
+                return []
+            # an entry can come up in several tables; duplicates are dropped
+            # from the (few) hits below rather than from all candidates
+            cand = np.frombuffer(flat, dtype=np.int32)
+            phs = np.frombuffer(self._phash, dtype=np.uint64)[cand]
+            dhs = np.frombuffer(self._dhash, dtype=np.uint64)[cand]
+            meta = self._meta
+        dist = popcount64(dhs ^ np.uint64(dh)).astype(np.int32)
+        pdist = popcount64(phs ^ np.uint64(ph)).astype(np.int32)
+        keep = np.nonzero((dist <= r) & (pdist <= self.phash_distance))[0]
+        keep = keep[np.unique(cand[keep], return_index=True)[1]]
+        keep = keep[np.argsort(dist[keep], kind="stable")]
+        fields = fields or {}
+        out = []
+        for i in keep:
+            m = meta[cand[i]]
+            comparable, agree = same_card(fields, m.get("fields") or {})
+            if comparable:
+                if not agree:
+                    continue
+            elif dist[i] > self.exact_distance or pdist[i] > self.exact_distance:
+                continue
+            hit = {k: v for k, v in m.items() if k != "fields"}
+            out.append(dict(hit, distance=int(dist[i]), phashDistance=int(pdist[i]), fieldsCompared=comparable))
+            if len(out) >= limit:
+                break
+        return out
+
+    def add_record(self, record_id, entries):
+        # entries: [(doc type, blob sha256, hashes, card_fields)] for one saved record
+        docs = []
+        for doc_type, blob, hashes, fields in entries:
+            if not hashes:
+                continue
+            docs.append({"recordId": str(record_id), "type": doc_type, "blob": blob,
+                         "phash": to_hex(hashes["phash"]), "dhash": to_hex(hashes["dhash"]), "fields": fields or {},
+                         "writer": self.writer, "created_at": datetime.utcnow().isoformat()})
+        if not docs:
+            return 0
+        self.ensure_loaded()
+        self.coll.insert_many(docs)
+        for d in docs:
+            self._add(from_hex(d["phash"]), from_hex(d["dhash"]),
+                      {"recordId": d["recordId"], "type": d["type"], "blob": d["blob"], "fields": d["fields"]})
+        return len(docs)
+
+    def stats(self):
+        return {"images": len(self), "maxDistance": self.max_distance, "phashDistance": self.phash_distance,
+                "exactDistance": self.exact_distance}
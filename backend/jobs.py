@@ -0,0 +1,262 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+# --- durable KYC job queue ---
+# job lifecycle: queued -> running -> done | failed. A running job holds a lease
+# (visibility timeout); if its worker dies the lease lapses and another worker
+# picks it up. Failures are retried with backoff until max_attempts.
+
+def now_iso():
+    return datetime.utcnow().isoformat()
+
+
+def public_job(job):
+    if not job:
+        return None
+    return {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "maxAttempts": job.get("max_attempts"),
+        "stages": job.get("stages", {}),
+        "error": job.get("error"),
+        "recordId": (job.get("result") or {}).get("_id"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+    }
+
+
+class MongoJobQueue:
+    def __init__(self, coll, visibility_timeout=300, max_attempts=3, retry_delay=10):
+        self.coll = coll
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._indexed = False
+
+    def _ensure_index(self):
+        # deferred so importing the app does not need a reachable Mongo
+        if not self._indexed:
+            self.coll.create_index([("status", 1), ("available_at", 1)])
+            self._indexed = True
+
+    def enqueue(self, payload):
+        self._ensure_index()
+        ts = now_iso()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "status": "queued",
+            "payload": payload,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "available_at": time.time(),
+            "lease_until": None,
+            "worker": None,
+            "stages": {"queued": ts},
+            "result": None,
+            "error": None,
+            "created_at": ts,
+            "updated_at": ts,
+        }
+        self.coll.insert_one(job)
+        return job["_id"]
+
+    def claim(self, worker_id):
+        self._ensure_index()
+        now = time.time()
+        ts = now_iso()
+        return self.coll.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "running", "worker": worker_id,
+                      "lease_until": now + self.visibility_timeout,
+                      "stages.started": ts, "updated_at": ts},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def heartbeat(self, job_id, worker_id):
+        self.coll.update_one({"_id": job_id, "worker": worker_id, "status": "running"},
+                             {"$set": {"lease_until": time.time() + self.visibility_timeout}})
+
+    def mark_stage(self, job_id, stage):
+        ts = now_iso()
+        self.coll.update_one({"_id": job_id}, {"$set": {f"stages.{stage}": ts, "updated_at": ts}})
+
+    def complete(self, job_id, worker_id, result):
+        ts = now_iso()
+        self.coll.update_one({"_id": job_id, "worker": worker_id},
+                             {"$set": {"status": "done", "result": result, "error": None,
+                                       "lease_until": None, "stages.finished": ts, "updated_at": ts}})
+
+    def fail(self, job_id, worker_id, error):
+        job = self.coll.find_one({"_id": job_id, "worker": worker_id})
+        if not job:
+            return None
+        ts = now_iso()
+        if job.get("attempts", 0) < job.get("max_attempts", self.max_attempts):
+            update = {"status": "queued", "available_at": time.time() + self.retry_delay * job.get("attempts", 1)}
+        else:
+            update = {"status": "failed", "stages.finished": ts}
+        update.update({"error": error, "lease_until": None, "updated_at": ts})
+        self.coll.update_one({"_id": job_id, "worker": worker_id}, {"$set": update})
+        return update["status"]
+
+    def get(self, job_id):
+        return self.coll.find_one({"_id": job_id})
+
+    def counts(self):
+        out = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for row in self.coll.aggregate([{"$group": {"_id": "$status", "n": {"$sum": 1}}}]):
+            out[row["_id"]] = row["n"]
+        return out
+
+
+class SQLiteJobQueue:
+    # local stand-in with the same interface, for running without Mongo
+    def __init__(self, path, visibility_timeout=300, max_attempts=3, retry_delay=10):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT, payload TEXT, attempts INTEGER,
+                max_attempts INTEGER, available_at REAL, lease_until REAL, worker TEXT,
+                stages TEXT, result TEXT, error TEXT, created_at TEXT, updated_at TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["_id"] = job.pop("id")
+        for k in ("payload", "stages", "result"):
+            job[k] = json.loads(job[k]) if job[k] else None
+        return job
+
+    def enqueue(self, payload):
+        ts = now_iso()
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs VALUES (?, 'queued', ?, 0, ?, ?, NULL, NULL, ?, NULL, NULL, ?, ?)",
+            (job_id, json.dumps(payload), self.max_attempts, time.time(), json.dumps({"queued": ts}), ts, ts))
+        return job_id
+
+    def claim(self, worker_id):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?)"
+                " OR (status = 'running' AND lease_until < ?) ORDER BY available_at LIMIT 1",
+                (now, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job = self._row(row)
+            ts = now_iso()
+            job["stages"]["started"] = ts
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                " stages = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.visibility_timeout, json.dumps(job["stages"]), ts, job["_id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job["_id"])
+
+    def heartbeat(self, job_id, worker_id):
+        self._conn().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + self.visibility_timeout, job_id, worker_id))
+
+    def _update_stages(self, conn, job_id, stage, ts):
+        row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        stages = json.loads(row["stages"]) if row and row["stages"] else {}
+        stages[stage] = ts
+        return json.dumps(stages)
+
+    def mark_stage(self, job_id, stage):
+        conn = self._conn()
+        ts = now_iso()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE jobs SET stages = ?, updated_at = ? WHERE id = ?",
+                     (self._update_stages(conn, job_id, stage, ts), ts, job_id))
+        conn.execute("COMMIT")
+
+    def complete(self, job_id, worker_id, result):
+        conn = self._conn()
+        ts = now_iso()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, stages = ?,"
+            " updated_at = ? WHERE id = ? AND worker = ?",
+            (json.dumps(result), self._update_stages(conn, job_id, "finished", ts), ts, job_id, worker_id))
+        conn.execute("COMMIT")
+
+    def fail(self, job_id, worker_id, error):
+        conn = self._conn()
+        ts = now_iso()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ? AND worker = ?", (job_id, worker_id)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] < row["max_attempts"]:
+                status = "queued"
+                conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, error = ?, lease_until = NULL, updated_at = ?"
+                    " WHERE id = ?",
+                    (status, time.time() + self.retry_delay * row["attempts"], error, ts, job_id))
+            else:
+                status = "failed"
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, stages = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (status, error, self._update_stages(conn, job_id, "finished", ts), ts, job_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def counts(self):
+        out = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for row in self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            out[row["status"]] = row["n"]
+        return out
+
+
+def make_job_queue(backend, db, path, **kwargs):
+    if backend == "sqlite":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteJobQueue(path, **kwargs)
+    return MongoJobQueue(db["jobs"], **kwargs)
@@ -0,0 +1,229 @@
+# In-process metrics, served in the Prometheus text format (version 0.0.4).
+#
+# Counters, gauges and histograms keyed by label values, each behind its own
+# lock; observing is a dict lookup and a few additions. Every process keeps
+# its own values (the API processes export theirs on /metrics; worker.py
+# processes are not exported). Gauges can also be read from a callback at
+# scrape time (e.g. the OCR pool's queue depth).
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# seconds; covers a sub-millisecond lookup up to a slow OCR
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v):
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        # [(suffix, label values, extra label, value)]
+        with self._lock:
+            return [("", k, None, v) for k, v in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_num(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        # fn() is called at scrape time
+        self._functions[self._key(labels)] = fn
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        out = super().samples()
+        for key, fn in self._functions.items():
+            try:
+                out.append(("", key, None, fn()))
+            except Exception:
+                pass
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                # per-bucket counts (not cumulative), +Inf last, then sum
+                h = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            i = 0
+            for b in self.buckets:
+                if value <= b:
+                    break
+                i += 1
+            h[i] += 1
+            h[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(k, list(h)) for k, h in self._values.items()]
+        for key, h in items:
+            total = 0
+            for b, n in zip(self.buckets + (math.inf,), h[:-1]):
+                total += n
+                out.append(("_bucket", key, ("le", _num(b)), total))
+            out.append(("_count", key, None, total))
+            out.append(("_sum", key, None, h[-1]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._add(Gauge(name, doc, labelnames))
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# handshake / auth / session chatter, not the app's own operations
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart",
+                     "saslContinue", "endSessions", "killCursors"}
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    # MongoClient(event_listeners=[...]): duration of every command by
+    # command name and collection, plus failures
+    def __init__(self, histogram, failures):
+        self.histogram = histogram
+        self.failures = failures
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        coll = event.command.get(event.command_name)
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = coll if isinstance(coll, str) else ""
+
+    def _done(self, event):
+        with self._lock:
+            coll = self._collections.pop((event.connection_id, event.request_id), None)
+        if coll is None:
+            return None
+        self.histogram.observe(event.duration_micros / 1e6, command=event.command_name, collection=coll)
+        return coll
+
+    def succeeded(self, event):
+        self._done(event)
+
+    def failed(self, event):
+        coll = self._done(event)
+        if coll is not None:
+            self.failures.inc(command=event.command_name, collection=coll)
@@ -0,0 +1,155 @@
+import io
+import os
+import shlex
+import threading
+import time
+
+from PIL import Image
+import pytesseract
+
+import request_log
+
+from preprocess import DEFAULTS as PREPROCESS_DEFAULTS, preprocess_image, settings_id
+
+# Tesseract settings; they are part of the OCR cache key (with OCR_ENGINE
+# below), so changing them never serves text produced under the old settings
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_CONFIG = os.environ.get("OCR_CONFIG", "")
+
+# preprocessing before Tesseract (OCR_PREPROCESS=0 sends the raw image, e.g.
+# to compare timings and extraction accuracy with benchmarks/bench_preprocess.py)
+OCR_PREPROCESS = os.environ.get("OCR_PREPROCESS", "1") not in ("0", "false", "no", "")
+PREPROCESS_SETTINGS = dict(PREPROCESS_DEFAULTS)
+PREPROCESS_SETTINGS["target_dpi"] = int(os.environ.get("OCR_TARGET_DPI", PREPROCESS_DEFAULTS["target_dpi"]))
+PREPROCESS_SETTINGS["max_side"] = int(os.environ.get("OCR_MAX_SIDE", PREPROCESS_DEFAULTS["max_side"]))
+
+# OCR engine:
+#   "tesserocr"   one Tesseract API handle per worker thread (pip install
+#                 tesserocr), created when the pool worker starts, language
+#                 data loaded once; images are handed over in memory
+#   "pytesseract" runs the tesseract binary per image (temp file, fresh
+#                 process, language data reloaded every time)
+#   "auto"        tesserocr when it can be loaded, else pytesseract
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto").lower()
+
+def ocr_config_id():
+    pre = settings_id(PREPROCESS_SETTINGS) if OCR_PREPROCESS else "off"
+    return f"engine={OCR_ENGINE};lang={OCR_LANG};config={OCR_CONFIG};preprocess={pre}"
+
+def clean_ocr_text(text):
+    return "\n".join([ln.strip() for ln in text.splitlines() if ln.strip()])
+
+# --- OCR engines ---
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def image_to_string(self, img):
+        return pytesseract.image_to_string(img, lang=OCR_LANG, config=OCR_CONFIG)
+
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, lang=OCR_LANG, config=OCR_CONFIG):
+        import tesserocr
+        psm, oem, variables = parse_tesseract_config(config)
+        kwargs = {"lang": lang, "init": True}
+        if oem is not None:
+            kwargs["oem"] = tesserocr.OEM(oem)
+        if psm is not None:
+            kwargs["psm"] = tesserocr.PSM(psm)
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        for k, v in variables.items():
+            if not self._api.SetVariable(k, v):
+                raise ValueError(f"unknown Tesseract variable {k!r}")
+
+    def image_to_string(self, img):
+        self._api.SetImage(img)
+        return self._api.GetUTF8Text()
+
+    def close(self):
+        self._api.End()
+
+
+def parse_tesseract_config(config):
+    # pytesseract-style "--psm 6 --oem 1 -c name=value" -> (psm, oem, {name: value})
+    psm = oem = None
+    variables = {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in ("--psm", "--oem", "-c") and i + 1 < len(args):
+            v = args[i + 1]
+            if a == "--psm":
+                psm = int(v)
+            elif a == "--oem":
+                oem = int(v)
+            else:
+                name, _, value = v.partition("=")
+                variables[name] = value
+            i += 2
+        else:
+            raise ValueError(f"unsupported OCR_CONFIG option {a!r} for tesserocr")
+    return psm, oem, variables
+
+
+_engines = threading.local()
+_fallback_reported = False
+
+def create_engine(name=None):
+    global _fallback_reported
+    name = (name or OCR_ENGINE).lower()
+    if name in ("tesserocr", "auto"):
+        try:
+            return TesserocrEngine()
+        except Exception as e:
+            # pytesseract stays the fallback (tesserocr not installed, no
+            # tessdata for OCR_LANG, options it does not take)
+            if name == "tesserocr" or not isinstance(e, ImportError):
+                if not _fallback_reported:
+                    request_log.log("ocr_engine_fallback", level="warning", engine="pytesseract", error=str(e))
+                    _fallback_reported = True
+    return PytesseractEngine()
+
+def get_engine():
+    # this thread's engine, created on first use
+    engine = getattr(_engines, "engine", None)
+    if engine is None:
+        engine = _engines.engine = create_engine()
+    return engine
+
+def init_engine():
+    # ProcessPoolExecutor initializer: load the engine before the first image
+    get_engine()
+
+# --- OCR ---
+# kept free of Flask / Mongo imports so pool worker processes can load it cheaply
+def open_image(source):
+    # source: a path, or the uploaded bytes
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+def ocr_image(source, preprocess=None, engine=None):
+    # returns (text, timings) with per-step seconds
+    if preprocess is None:
+        preprocess = OCR_PREPROCESS
+    timings = {}
+    try:
+        t = time.perf_counter()
+        img = open_image(source)
+        timings["open"] = time.perf_counter() - t
+        if preprocess:
+            img, steps = preprocess_image(img, PREPROCESS_SETTINGS)
+            timings.update(steps)
+        t = time.perf_counter()
+        text = (engine or get_engine()).image_to_string(img)
+        timings["ocr"] = time.perf_counter() - t
+    except Exception as e:
+        request_log.log_exception("ocr", e)
+        text = ""
+    return clean_ocr_text(text), timings
+
+def extract_text_from_image(source):
+    return ocr_image(source)[0]
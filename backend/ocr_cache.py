@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import request_log
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ocr_cache_key(image_digest, config_id):
+    return hashlib.sha256(f"{image_digest}|{config_id}".encode("utf-8")).hexdigest()
+
+
+# --- persistent tiers ---
+class DiskStore:
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None, True
+            with open(path, "r", encoding="utf-8") as fh:
+                return fh.read(), False
+        except FileNotFoundError:
+            return None, False
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+
+    def sweep(self):
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class MongoStore:
+    # expiry is enforced by a TTL index; the age check on read covers the gap
+    # until Mongo's TTL monitor runs
+    def __init__(self, coll, ttl):
+        self.coll = coll
+        self.ttl = ttl
+        coll.create_index("created_at", expireAfterSeconds=int(ttl))
+
+    def get(self, key):
+        doc = self.coll.find_one({"_id": key})
+        if not doc:
+            return None, False
+        if doc.get("created_at") and doc["created_at"] < datetime.utcnow() - timedelta(seconds=self.ttl):
+            self.coll.delete_one({"_id": key})
+            return None, True
+        return doc.get("text"), False
+
+    def put(self, key, text):
+        self.coll.replace_one({"_id": key}, {"_id": key, "text": text, "created_at": datetime.utcnow()}, upsert=True)
+
+    def sweep(self):
+        return 0
+
+
+# --- two-tier OCR result cache ---
+class OCRCache:
+    def __init__(self, max_entries=1024, store=None):
+        self.max_entries = max(0, int(max_entries))
+        self.store = store
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "memoryHits": 0, "storeHits": 0, "misses": 0,
+                         "lruEvictions": 0, "ttlEvictions": 0, "storeErrors": 0}
+
+    def _remember(self, key, text):
+        if self.max_entries == 0:
+            return
+        self._lru[key] = text
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.counters["lruEvictions"] += 1
+
+    def get(self, key):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.counters["hits"] += 1
+                self.counters["memoryHits"] += 1
+                return self._lru[key]
+        text, expired, failed = None, False, False
+        if self.store is not None:
+            try:
+                text, expired = self.store.get(key)
+            except Exception as e:
+                request_log.log_exception("ocr cache get", e)
+                failed = True
+        with self._lock:
+            self.counters["ttlEvictions"] += int(expired)
+            self.counters["storeErrors"] += int(failed)
+            if text is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self.counters["storeHits"] += 1
+            self._remember(key, text)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+        if self.store is not None:
+            try:
+                self.store.put(key, text)
+            except Exception as e:
+                request_log.log_exception("ocr cache put", e)
+                with self._lock:
+                    self.counters["storeErrors"] += 1
+
+    def sweep(self):
+        removed = self.store.sweep() if self.store is not None else 0
+        with self._lock:
+            self.counters["ttlEvictions"] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            out = dict(self.counters)
+            out["entries"] = len(self._lru)
+            out["maxEntries"] = self.max_entries
+        lookups = out["hits"] + out["misses"]
+        out["hitRate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["store"] = type(self.store).__name__ if self.store is not None else None
+        return out
@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import request_log
+from ocr import extract_text_from_image, init_engine
+
+
+class OCRPoolSaturated(Exception):
+    pass
+
+
+class OCRPoolBroken(OCRPoolSaturated):
+    # a worker process died (killed, out of memory, crashed in Tesseract);
+    # the pool is rebuilt on the next call, so the request can be retried
+    pass
+
+
+# --- bounded OCR process pool ---
+# Each worker process loads its OCR engine (ocr.OCR_ENGINE) when it starts and
+# keeps it for every image it is given.
+# max_pending caps running + queued images across all requests. A request either
+# reserves slots for all of its documents or is rejected straight away, so Flask
+# threads never pile up behind a backlog. A batch of images shares one deadline.
+class OCRPool:
+
+    def __init__(self, workers, max_pending):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(self.workers, int(max_pending))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_engine)
+            return self._executor
+
+    def _discard(self, executor):
+        # drops a broken executor (once, however many requests saw it break)
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        request_log.log("ocr_pool_restart", level="warning", restarts=self.restarts)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reserve(self, n):
+        taken = 0
+        for _ in range(n):
+            if not self._slots.acquire(blocking=False):
+                break
+            taken += 1
+        if taken < n:
+            for _ in range(taken):
+                self._slots.release()
+            raise OCRPoolSaturated(f"OCR queue full ({self.max_pending} images pending)")
+        with self._lock:
+            self._pending += n
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _start(self, executor, fn, *args):
+        try:
+            fut = executor.submit(fn, *args)
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            raise OCRPoolBroken(str(e)) from e
+        fut.add_done_callback(self._release)
+        return fut
+
+    def submit(self, fn, *args):
+        self._reserve(1)
+        try:
+            return self._start(self._get_executor(), fn, *args)
+        except Exception:
+            self._release()
+            raise
+
+    def map(self, fn, items, timeout=None):
+        # results come back in input order; TimeoutError if they are not all
+        # in within `timeout` seconds of the call
+        items = list(items)
+        if not items:
+            return []
+        self._reserve(len(items))
+        futures = []
+        try:
+            executor = self._get_executor()
+            for it in items:
+                futures.append(self._start(executor, fn, it))
+        except Exception:
+            # slots for items that never started
+            for _ in range(len(items) - len(futures)):
+                self._release()
+            for f in futures:
+                f.cancel()
+            raise
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            # queued ones never start; running ones free their slot when they finish
+            for f in not_done:
+                f.cancel()
+            raise TimeoutError(f"{len(not_done)} of {len(futures)} images not done after {timeout} s")
+        results = []
+        for f in futures:
+            try:
+                results.append(f.result())
+            except BrokenProcessPool as e:
+                self._discard(executor)
+                raise OCRPoolBroken(str(e)) from e
+        return results
+
+    def extract_texts(self, sources, timeout=None):
+        # sources: image paths or image bytes (pickled over to the workers)
+        return self.map(extract_text_from_image, sources, timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "maxPending": self.max_pending, "pending": self._pending,
+                    "restarts": self.restarts}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
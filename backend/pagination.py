@@ -0,0 +1,115 @@
+# Keyset pagination for the listing endpoints.
+#
+# Pages are ordered by (sort field desc, _id desc) and the continuation token
+# carries the last row's (sort value, _id), so page N costs the same index seek
+# as page 1. Timestamps are ISO strings and sort correctly as strings; rows
+# without one sort last.
+import base64
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+_indexed = set()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_limit(raw, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        n = int(raw) if raw not in (None, "") else default
+    except (TypeError, ValueError):
+        n = default
+    return max(1, min(n, maximum))
+
+
+def encode_cursor(doc, field):
+    payload = json.dumps({"v": doc.get(field), "id": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw.decode("utf-8"))
+        return data.get("v"), ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise InvalidCursor("invalid cursor")
+
+
+def ensure_sort_index(coll, field):
+    key = (coll.full_name, field)
+    if key not in _indexed:
+        coll.create_index([(field, -1), ("_id", -1)])
+        _indexed.add(key)
+
+
+def keyset_match(field, cursor):
+    # rows strictly after the cursor in (field desc, _id desc) order
+    if cursor is None:
+        return {}
+    value, oid = cursor
+    if value is None:
+        return {field: None, "_id": {"$lt": oid}}
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": oid}},
+        {field: None},
+    ]}
+
+
+def _branch(field, match, cursor, limit, projection, label):
+    after = keyset_match(field, cursor)
+    cond = {"$and": [match, after]} if match and after else (match or after)
+    stages = []
+    if cond:
+        stages.append({"$match": cond})
+    stages += [{"$sort": {field: -1, "_id": -1}}, {"$limit": limit}]
+    if projection:
+        stages.append({"$project": projection})
+    if label:
+        stages.append({"$addFields": {"source": label}})
+    return stages
+
+
+def page_pipeline(sources, field, match=None, cursor=None, limit=DEFAULT_LIMIT, projection=None):
+    # (collection to aggregate on, pipeline) for fetch_page; shared with the
+    # async endpoints (asgi.py), which run it on the async driver
+    if projection:
+        projection = dict(projection, **{field: 1})
+    first, label = sources[0]
+    pipeline = _branch(field, match, cursor, limit + 1, projection, label)
+    for coll, label in sources[1:]:
+        pipeline.append({"$unionWith": {
+            "coll": coll.name,
+            "pipeline": _branch(field, match, cursor, limit + 1, projection, label),
+        }})
+    if len(sources) > 1:
+        pipeline += [{"$sort": {field: -1, "_id": -1}}, {"$limit": limit + 1}]
+    return first, pipeline
+
+
+def finish_page(rows, field, limit):
+    # rows: up to limit + 1 from page_pipeline -> (rows, next cursor token or None)
+    next_token = encode_cursor(rows[limit - 1], field) if len(rows) > limit else None
+    rows = rows[:limit]
+    for r in rows:
+        r["_id"] = str(r["_id"])
+    return rows, next_token
+
+
+def fetch_page(sources, field, match=None, cursor=None, limit=DEFAULT_LIMIT, projection=None):
+    # sources: [(collection, source label or None)], merged in the database with
+    # $unionWith; every branch is already cut to `limit` rows off its own index.
+    # Returns (rows, next cursor token or None).
+    for coll, _ in sources:
+        ensure_sort_index(coll, field)
+    first, pipeline = page_pipeline(sources, field, match, cursor, limit, projection)
+    return finish_page(list(first.aggregate(pipeline)), field, limit)
@@ -0,0 +1,180 @@
+# Slow-request profiles: a sampling profiler over the request threads.
+#
+# Every request registers its thread when it starts (a dict insert). One
+# sampler thread, started with the first request, wakes every `interval`
+# seconds while requests are in flight and records the current stack of
+#   - requests picked at random (sample_rate), from their start, and
+#   - any request that has been running for `watch_after` seconds (half the
+#     slow threshold by default), so a slow request is caught even when it
+#     was not picked; its profile covers the time from then on.
+# When a request ends its stacks are kept if it was picked or took at least
+# `slow_seconds`: collapsed stacks ("frame;frame;frame count" per line, the
+# input of flamegraph.pl and speedscope) in <id>.folded next to the request
+# metadata in <id>.json. Only the newest `keep` profiles are kept. With
+# nothing in flight the sampler sleeps on an event, so an idle hook costs a
+# dict insert and delete per request.
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import request_log
+
+PROFILE_ID_RE = re.compile(r"\d{13}-[0-9a-f]{8}")
+
+
+def collapse(frame, max_depth=96):
+    # root-first "func (file:line)" names joined by ';'
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Active:
+    __slots__ = ("thread_id", "started", "picked", "stacks", "samples", "first_sample")
+
+    def __init__(self, thread_id, started, picked):
+        self.thread_id = thread_id
+        self.started = started
+        self.picked = picked
+        self.stacks = Counter()
+        self.samples = 0
+        self.first_sample = None
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, slow_seconds=2.0, interval=0.01, watch_after=None, keep=200):
+        self.directory = os.path.abspath(directory)
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.watch_after = slow_seconds / 2 if watch_after is None else watch_after
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.saved = 0
+        self.errors = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                    self._thread.start()
+
+    def start(self):
+        # call on the request's thread; returns a token for finish()
+        self._ensure_thread()
+        a = _Active(threading.get_ident(), time.perf_counter(),
+                    self.sample_rate > 0 and random.random() < self.sample_rate)
+        with self._lock:
+            self._active[id(a)] = a
+        self._wake.set()
+        return a
+
+    def finish(self, token, meta):
+        # profile id when the request was picked or slow, else None
+        with self._lock:
+            self._active.pop(id(token), None)
+        elapsed = time.perf_counter() - token.started
+        slow = elapsed >= self.slow_seconds
+        if not (token.picked or slow) or not token.samples:
+            return None
+        meta = dict(meta, ms=round(elapsed * 1000, 1), reason="slow" if slow else "sampled",
+                    samples=token.samples, intervalMs=self.interval * 1000,
+                    profiledFromMs=round((token.first_sample - token.started) * 1000, 1))
+        try:
+            return self._save(meta, token.stacks)
+        except Exception as e:
+            self.errors += 1
+            request_log.log_exception("profile save", e)
+            return None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                due = [a for a in self._active.values() if a.picked or now - a.started >= self.watch_after]
+            if not due:
+                continue
+            frames = sys._current_frames()
+            for a in due:
+                frame = frames.get(a.thread_id)
+                if frame is None:
+                    continue
+                a.stacks[collapse(frame)] += 1
+                a.samples += 1
+                if a.first_sample is None:
+                    a.first_sample = now
+            del frames
+
+    def _write(self, path, data):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _save(self, meta, stacks):
+        profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        meta = dict(meta, id=profile_id, savedAt=datetime.utcnow().isoformat())
+        folded = "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
+        self._write(os.path.join(self.directory, profile_id + ".folded"), folded)
+        self._write(os.path.join(self.directory, profile_id + ".json"), json.dumps(meta, default=str))
+        self.saved += 1
+        self._prune()
+        return profile_id
+
+    def _ids(self):
+        # newest first; ids start with a millisecond timestamp
+        return sorted((f[:-5] for f in os.listdir(self.directory)
+                       if f.endswith(".json") and PROFILE_ID_RE.fullmatch(f[:-5])), reverse=True)
+
+    def _prune(self):
+        for profile_id in self._ids()[self.keep:]:
+            for ext in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit=50):
+        out = []
+        for profile_id in self._ids()[:limit]:
+            try:
+                with open(os.path.join(self.directory, profile_id + ".json"), encoding="utf-8") as fh:
+                    out.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def folded_path(self, profile_id):
+        if not PROFILE_ID_RE.fullmatch(profile_id or ""):
+            return None
+        path = os.path.join(self.directory, profile_id + ".folded")
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        with self._lock:
+            active = len(self._active)
+        return {"sampleRate": self.sample_rate, "slowMs": self.slow_seconds * 1000,
+                "intervalMs": self.interval * 1000, "watchAfterMs": self.watch_after * 1000,
+                "keep": self.keep, "active": active, "saved": self.saved, "errors": self.errors}
@@ -0,0 +1,53 @@
+# Structured logs: one JSON object per line on stdout, carrying the id of
+# the request being handled (from the client's X-Request-ID header, or a new
+# one), so every line of one request can be picked out of the stream.
+import contextvars
+import json
+import re
+import sys
+import threading
+import traceback
+import uuid
+from datetime import datetime
+
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._\-]{1,64}")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_write_lock = threading.Lock()
+
+
+def new_request_id(incoming=None):
+    # the client's id if it looks like one, else a fresh one
+    if incoming and REQUEST_ID_RE.fullmatch(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def begin(request_id):
+    _request_id.set(request_id)
+
+
+def end():
+    _request_id.set(None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def log(event, level="info", **fields):
+    rec = {"ts": datetime.utcnow().isoformat() + "Z", "level": level, "event": event}
+    rid = _request_id.get()
+    if rid:
+        rec["requestId"] = rid
+    rec.update(fields)
+    line = json.dumps(rec, default=str)
+    with _write_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def log_exception(where, exc, **fields):
+    # an error caught in `where` (a route, a pipeline stage), with its traceback
+    log("error", level="error", where=where, error=str(exc), errorType=type(exc).__name__,
+        traceback=traceback.format_exc(), **fields)
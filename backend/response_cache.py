@@ -0,0 +1,102 @@
+# Response cache for the polled GET endpoints.
+#
+# Each cached route depends on named data sets ("records", "blacklist"). A
+# data set has a version counter in Mongo (cache_versions: {_id: name, v}),
+# which every write to it bumps after writing. A response is stored with the
+# versions read before its query ran, so it is never older than the data at
+# those versions, and served while they are current. The ETag is a hash of
+# the route key and the versions alone: a poll whose If-None-Match still
+# matches gets 304 with no cache lookup, query or serialization.
+#
+# Versions are read from Mongo at most every `refresh_interval` seconds per
+# process (one find over a handful of counters) and moved forward right away
+# by this process's own writes; a write made by another process (a second
+# API server, worker.py) shows up within the interval.
+#
+# Bodies are kept in an LRU bounded by total bytes; a body bigger than
+# max_entry_bytes is served but not kept.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import ReturnDocument
+
+
+class VersionCounters:
+    def __init__(self, coll, refresh_interval=1.0):
+        self.coll = coll
+        self.refresh_interval = refresh_interval
+        self._values = {}
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+
+    def _refresh(self):
+        values = {d["_id"]: d.get("v", 0) for d in self.coll.find({})}
+        with self._lock:
+            for name, v in values.items():
+                # never step back past a bump this process already made
+                if v > self._values.get(name, 0):
+                    self._values[name] = v
+            self._refreshed_at = time.monotonic()
+
+    def get(self, names):
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self._refresh()
+        with self._lock:
+            return tuple(self._values.get(n, 0) for n in names)
+
+    def bump(self, *names):
+        for name in names:
+            doc = self.coll.find_one_and_update({"_id": name}, {"$inc": {"v": 1}}, upsert=True,
+                                                return_document=ReturnDocument.AFTER)
+            with self._lock:
+                self._values[name] = max(self._values.get(name, 0), doc["v"])
+
+
+def response_etag(key, versions):
+    # unquoted entity tag
+    return hashlib.blake2b(f"{key}|{versions}".encode("utf-8"), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self._entries = OrderedDict()    # key -> (versions, body, content type)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, versions):
+        # (body, content type), or None when missing or stale
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != versions:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, versions, body, content_type):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (versions, body, content_type)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "maxBytes": self.max_bytes,
+                    "evictions": self.evictions}
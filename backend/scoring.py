@@ -0,0 +1,341 @@
+# Fraud scoring rules.
+#
+# The points each check adds, the risk-level thresholds and the final-status
+# rule are data: scoring_rules/<version>.json. Uploads store what every check
+# found as signals (documents[].signals, plus the record's own signals), and
+# the active rule version turns them into fraudScore / riskLevel /
+# overallFraudScore / overallRiskLevel / finalStatus. A new rule version can
+# then be applied to existing records without re-running OCR:
+#
+#   python scoring.py rescore [--version N] [--dry-run] [--batch 1000]
+#
+# loads the signals column-wise (one NumPy array per signal per chunk of
+# records), evaluates the rules on whole columns and writes the records whose
+# scores changed back with batched bulk writes. Reasons describe the checks
+# that fired and are not rewritten.
+#
+# Rules run in file order; each looks at one signal:
+#   lt / lte / gt / gte / eq   compare with "value", add "points"
+#   true                       signal set (a flag, or a watchlist list type)
+#   scale                      add round(factor * signal)
+#   ring                       signal >= min: round(min(max, perUnit * signal)
+#                              * (0.5 + 0.5 * the "density" signal))
+# "reason" may name the signal's value as {value}. A document scores its
+# "base" signal (the document type's base score from extractors.py) plus the
+# rules, floored at "floor"; a record averages its documents and adds the
+# record rules. riskLevels / finalStatus: first entry that matches wins.
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from pymongo import UpdateMany, UpdateOne
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_rules")
+COMPARISONS = {"lt": np.less, "lte": np.less_equal, "gt": np.greater, "gte": np.greater_equal}
+OPS = set(COMPARISONS) | {"eq", "true", "scale", "ring"}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def available_versions():
+    return sorted(int(f[:-5]) for f in os.listdir(RULES_DIR) if f.endswith(".json") and f[:-5].isdigit())
+
+
+def load_rules(version=None):
+    # the given version, or the newest one
+    versions = available_versions()
+    if not versions:
+        raise RuleError(f"no scoring rules in {RULES_DIR}")
+    version = int(version) if version not in (None, "") else versions[-1]
+    if version not in versions:
+        raise RuleError(f"scoring rules version {version} not found (have {versions})")
+    with open(os.path.join(RULES_DIR, f"{version}.json"), encoding="utf-8") as fh:
+        return RuleSet(json.load(fh))
+
+
+def _round(x):
+    return int(round(x))
+
+
+class RuleSet:
+    def __init__(self, spec):
+        self.spec = spec
+        self.version = spec["version"]
+        self.floor = spec.get("floor", 0)
+        self.document_rules = spec.get("document", [])
+        self.record_rules = spec.get("record", [])
+        self.risk_levels = spec.get("riskLevels", [])
+        self.default_risk_level = spec["defaultRiskLevel"]
+        self.final_status = spec.get("finalStatus", [])
+        self.default_final_status = spec["defaultFinalStatus"]
+        for rule in self.document_rules + self.record_rules:
+            if rule.get("op") not in OPS:
+                raise RuleError(f"unknown op {rule.get('op')!r} in rule on {rule.get('signal')!r}")
+        self.levels = [r["level"] for r in self.risk_levels] + [self.default_risk_level]
+        self.statuses = [r["status"] for r in self.final_status] + [self.default_final_status]
+
+    def signals(self):
+        # (document signals, record signals) the rules read
+        doc = {"base"} | {r["signal"] for r in self.document_rules}
+        rec = {r["signal"] for r in self.record_rules} | {r["density"] for r in self.record_rules if r.get("density")}
+        return sorted(doc), sorted(rec | {"amlAlerts"})
+
+    # --- one record at a time (uploads) ---
+    def _apply(self, rule, signals):
+        # (points, fired)
+        v = signals.get(rule["signal"])
+        op = rule["op"]
+        if op == "scale":
+            points = _round(rule["factor"] * (v or 0))
+            return points, points != 0
+        if op == "ring":
+            if v is None or v < rule["min"]:
+                return 0, False
+            density = signals.get(rule.get("density")) or 0
+            return _round(min(rule["max"], rule["perUnit"] * v) * (0.5 + 0.5 * density)), True
+        if op == "true":
+            fired = bool(v)
+        elif op == "eq":
+            fired = v is not None and v == rule["value"]
+        else:
+            fired = v is not None and bool(COMPARISONS[op](v, rule["value"]))
+        return (rule.get("points", 0) if fired else 0), fired
+
+    def _run(self, rules, signals, score):
+        reasons = []
+        for rule in rules:
+            points, fired = self._apply(rule, signals)
+            score += points
+            if fired and rule.get("reason"):
+                reasons.append(rule["reason"].format(value=signals.get(rule["signal"])))
+        return score, reasons
+
+    def risk_level(self, score):
+        for r in self.risk_levels:
+            if score >= r["min"]:
+                return r["level"]
+        return self.default_risk_level
+
+    def final_status_for(self, risk_level, alerts):
+        for r in self.final_status:
+            if "riskLevels" in r and risk_level not in r["riskLevels"]:
+                continue
+            if "minAlerts" in r and alerts < r["minAlerts"]:
+                continue
+            return r["status"]
+        return self.default_final_status
+
+    def score_document(self, signals):
+        # (fraudScore, riskLevel, reasons)
+        score, reasons = self._run(self.document_rules, signals, signals.get("base") or 0)
+        score = max(self.floor, score)
+        return score, self.risk_level(score), reasons
+
+    def score_record(self, doc_scores, signals):
+        # (overallFraudScore, overallRiskLevel, finalStatus, reasons)
+        score, reasons = self._run(self.record_rules, signals, _round(sum(doc_scores) / len(doc_scores)))
+        risk = self.risk_level(score)
+        return score, risk, self.final_status_for(risk, signals.get("amlAlerts") or 0), reasons
+
+    # --- whole columns (bulk re-scoring) ---
+    def _apply_column(self, rule, columns, n):
+        col = columns.get(rule["signal"])
+        if col is None:
+            return np.zeros(n)
+        op = rule["op"]
+        if op == "scale":
+            return np.rint(rule["factor"] * _numeric(col))
+        if op == "ring":
+            v = _numeric(col)
+            density = _numeric(columns[rule["density"]]) if rule.get("density") in columns else 0
+            points = np.rint(np.minimum(rule["max"], rule["perUnit"] * v) * (0.5 + 0.5 * density))
+            return np.where(np.greater_equal(np.asarray(col, dtype=float), rule["min"]), points, 0)
+        if op == "true":
+            fired = _truthy(col)
+        elif op == "eq":
+            if col.dtype != object and isinstance(rule["value"], str):
+                fired = np.zeros(n, dtype=bool)      # no value of this signal is a string
+            else:
+                fired = np.asarray(col == rule["value"], dtype=bool)
+        else:
+            fired = COMPARISONS[op](np.asarray(col, dtype=float), rule["value"])
+        return np.where(fired, rule.get("points", 0), 0)
+
+    def risk_codes(self, scores):
+        # index into self.levels
+        codes = np.full(len(scores), len(self.risk_levels))
+        for i in reversed(range(len(self.risk_levels))):
+            codes[scores >= self.risk_levels[i]["min"]] = i
+        return codes
+
+    def score_table(self, table):
+        # SignalTable -> dict of arrays: docScore, docRisk, score, risk, status
+        # (risk / status as indexes into self.levels / self.statuses)
+        n_docs, n = len(table.doc_record), table.n_records
+        doc_score = _numeric(table.doc["base"]) if "base" in table.doc else np.zeros(n_docs)
+        for rule in self.document_rules:
+            doc_score = doc_score + self._apply_column(rule, table.doc, n_docs)
+        doc_score = np.maximum(self.floor, doc_score)
+
+        per_record = np.bincount(table.doc_record, minlength=n)
+        score = np.rint(np.bincount(table.doc_record, weights=doc_score, minlength=n) / np.maximum(per_record, 1))
+        for rule in self.record_rules:
+            score = score + self._apply_column(rule, table.rec, n)
+        risk = self.risk_codes(score)
+
+        alerts = _numeric(table.rec["amlAlerts"]) if "amlAlerts" in table.rec else np.zeros(n)
+        status = np.full(n, len(self.final_status))
+        for i in reversed(range(len(self.final_status))):
+            r = self.final_status[i]
+            c = np.ones(n, dtype=bool)
+            if "riskLevels" in r:
+                c &= np.isin(risk, [self.levels.index(lv) for lv in r["riskLevels"] if lv in self.levels])
+            if "minAlerts" in r:
+                c &= alerts >= r["minAlerts"]
+            status[c] = i
+        return {"docScore": doc_score.astype(np.int64), "docRisk": self.risk_codes(doc_score),
+                "score": score.astype(np.int64), "risk": risk, "status": status}
+
+
+def _numeric(col):
+    return np.nan_to_num(np.asarray(col, dtype=float))
+
+
+def _truthy(col):
+    if col.dtype == object:
+        return col.astype(bool)
+    return np.nan_to_num(col) != 0
+
+
+def _column(values):
+    # float64 (None -> NaN) for numbers and flags, else an object array
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
+
+
+class SignalTable:
+    # signals of a chunk of records, one array per signal; documents are rows
+    # of `doc`, doc_record[i] the record row of document i
+    def __init__(self, records, doc_signals, rec_signals):
+        doc_values = {s: [] for s in doc_signals}
+        rec_values = {s: [] for s in rec_signals}
+        doc_record = []
+        for i, rec in enumerate(records):
+            signals = rec.get("signals") or {}
+            for s in rec_signals:
+                rec_values[s].append(signals.get(s))
+            for d in rec.get("documents") or []:
+                ds = d.get("signals") or {}
+                doc_record.append(i)
+                for s in doc_signals:
+                    doc_values[s].append(ds.get(s))
+        self.n_records = len(records)
+        self.doc_record = np.array(doc_record, dtype=np.int64)
+        self.doc = {s: _column(v) for s, v in doc_values.items()}
+        self.rec = {s: _column(v) for s, v in rec_values.items()}
+
+
+def rescore_collection(coll, rules, batch_size=1000, chunk_size=100000, dry_run=False):
+    # applies `rules` to every record of coll carrying signals; returns counts
+    doc_signals, rec_signals = rules.signals()
+    levels, statuses = np.array(rules.levels, dtype=object), np.array(rules.statuses, dtype=object)
+    projection = {"signals": 1, "documents.signals": 1, "documents.fraudScore": 1, "documents.riskLevel": 1,
+                  "overallFraudScore": 1, "overallRiskLevel": 1, "finalStatus": 1}
+    counts = {"records": 0, "changed": 0, "skipped": 0}
+    stamp = datetime.utcnow().isoformat()
+
+    def flush(chunk):
+        table = SignalTable(chunk, doc_signals, rec_signals)
+        out = rules.score_table(table)
+        old_score = np.array([r.get("overallFraudScore") for r in chunk], dtype=object)
+        old_risk = np.array([r.get("overallRiskLevel") for r in chunk], dtype=object)
+        old_status = np.array([r.get("finalStatus") for r in chunk], dtype=object)
+        old_doc = np.array([(d.get("fraudScore"), d.get("riskLevel")) for r in chunk for d in r["documents"]],
+                           dtype=object).reshape(-1, 2)
+        doc_risk = levels[out["docRisk"]]
+        doc_changed = np.asarray((old_doc[:, 0] != out["docScore"]) | (old_doc[:, 1] != doc_risk), dtype=bool)
+        changed = np.asarray((old_score != out["score"]) | (old_risk != levels[out["risk"]])
+                             | (old_status != statuses[out["status"]]), dtype=bool)
+        changed |= np.bincount(table.doc_record, weights=doc_changed, minlength=len(chunk)) > 0
+        counts["records"] += len(chunk)
+        counts["changed"] += int(changed.sum())
+        if dry_run:
+            return
+        starts = np.concatenate([[0], np.cumsum(np.bincount(table.doc_record, minlength=len(chunk)))])
+        ops, unchanged = [], []
+        for i in np.nonzero(changed)[0]:
+            update = {"overallFraudScore": int(out["score"][i]), "overallRiskLevel": levels[out["risk"][i]],
+                      "finalStatus": statuses[out["status"][i]], "rulesVersion": rules.version, "rescoredAt": stamp}
+            for j, k in enumerate(range(starts[i], starts[i + 1])):
+                update[f"documents.{j}.fraudScore"] = int(out["docScore"][k])
+                update[f"documents.{j}.riskLevel"] = doc_risk[k]
+            ops.append(UpdateOne({"_id": chunk[i]["_id"]}, {"$set": update}))
+            if len(ops) >= batch_size:
+                coll.bulk_write(ops, ordered=False)
+                ops = []
+        for i in np.nonzero(~changed)[0]:
+            unchanged.append(chunk[i]["_id"])
+            if len(unchanged) >= 10 * batch_size:
+                ops.append(UpdateMany({"_id": {"$in": unchanged}}, {"$set": {"rulesVersion": rules.version}}))
+                unchanged = []
+        if unchanged:
+            ops.append(UpdateMany({"_id": {"$in": unchanged}}, {"$set": {"rulesVersion": rules.version}}))
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+
+    chunk = []
+    for rec in coll.find({}, projection).batch_size(batch_size):
+        docs = rec.get("documents") or []
+        if not docs or any("signals" not in d for d in docs):
+            counts["skipped"] += 1    # stored before signals were kept
+            continue
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["rescore"])
+    ap.add_argument("--version", help="rule version (default: newest)")
+    ap.add_argument("--batch", type=int, default=1000, help="updates per bulk write")
+    ap.add_argument("--chunk", type=int, default=100000, help="records scored per NumPy pass")
+    ap.add_argument("--dry-run", action="store_true", help="count the records that would change")
+    args = ap.parse_args()
+
+    from pymongo import MongoClient
+    from response_cache import VersionCounters
+    from stats import DashboardStats
+
+    rules = load_rules(args.version)
+    db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))[os.environ.get("MONGO_DB", "KYCDB")]
+    sources = {"Pending": db["extracted"], "Approved": db["approved_records"], "Rejected": db["rejected_records"]}
+    changed = 0
+    for status, coll in sources.items():
+        started = time.perf_counter()
+        counts = rescore_collection(coll, rules, args.batch, args.chunk, args.dry_run)
+        changed += counts["changed"]
+        secs = time.perf_counter() - started
+        print(f"[SCORING] {coll.name}: {counts['records']} records, {counts['changed']} changed, "
+              f"{counts['skipped']} without signals ({secs:.1f} s){' (dry run)' if args.dry_run else ''}")
+    if changed and not args.dry_run:
+        # risk / final status counters and cached listings follow the new scores
+        DashboardStats(db["stats"]).rebuild(sources)
+        VersionCounters(db["cache_versions"]).bump("records")
+    print(f"[SCORING] rules v{rules.version}: {changed} records changed")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# Dashboard statistics kept up to date as records come and go.
+#
+# One "totals" document of counters plus one document per hour of activity,
+# both updated with $inc on upload and review, so /stats is a primary-key read
+# and a short range scan however many records exist. The counters can drift
+# if a process dies between a record write and its counter update;
+# `python stats.py rebuild` recomputes everything from the record collections.
+# A database that has records but no counters yet (written before they
+# existed) is rebuilt the first time a process reads or updates them.
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+
+import request_log
+
+TOTALS_ID = "totals"
+RISK_LEVELS = ("Low", "Medium", "High")
+STATUSES = ("Pending", "Approved", "Rejected")
+
+
+def _key(value):
+    # counter sub-field for a label; Mongo field names cannot hold "." or start with "$"
+    return str(value if value is not None else "None").replace(".", "_").lstrip("$") or "None"
+
+
+def hour_of(ts):
+    # "2026-10-17T01:12:14.788" -> "2026-10-17T01"
+    return (ts or "")[:13] or None
+
+
+def _bucket_id(hour):
+    return f"hour:{hour}"
+
+
+class DashboardStats:
+    def __init__(self, coll, sources=None):
+        self.coll = coll
+        self.sources = sources    # {status: collection} to rebuild from when the totals are missing
+        self._indexed = False
+        self._checked = False
+        self._check_lock = threading.Lock()
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            self.coll.create_index("hour")
+            self._indexed = True
+
+    def ensure_totals(self):
+        # rebuilds the counters once if there is no totals document; True
+        # when it did (the rebuild already counted what was just written)
+        if self._checked:
+            return False
+        with self._check_lock:
+            if self._checked:
+                return False
+            rebuilt = False
+            if self.sources and self.coll.find_one({"_id": TOTALS_ID}, {"_id": 1}) is None:
+                totals = self.rebuild(self.sources)
+                request_log.log("stats_rebuilt", records=totals["records"])
+                rebuilt = True
+            self._checked = True
+            return rebuilt
+
+    def _inc(self, inc, hour, hour_inc):
+        if self.ensure_totals():
+            return
+        self.coll.update_one({"_id": TOTALS_ID}, {"$inc": inc, "$set": {"updated_at": datetime.utcnow().isoformat()}},
+                             upsert=True)
+        if hour:
+            self.coll.update_one({"_id": _bucket_id(hour)}, {"$inc": hour_inc, "$set": {"hour": hour}}, upsert=True)
+
+    def record_upload(self, record):
+        risk = _key(record.get("overallRiskLevel"))
+        final = _key(record.get("finalStatus"))
+        inc = {"records": 1, "status.Pending": 1, f"risk.{risk}": 1, f"finalStatus.{final}": 1}
+        hour_inc = {"uploads": 1, f"risk.{risk}": 1, f"finalStatus.{final}": 1}
+        self._inc(inc, hour_of(record.get("timestamp")), hour_inc)
+
+    def record_review(self, records, status):
+        # records: the pending records just moved to approved / rejected
+        n = len(records)
+        if not n:
+            return
+        inc = {"status.Pending": -n, f"status.{_key(status)}": n}
+        hour = hour_of(datetime.utcnow().isoformat())
+        self._inc(inc, hour, {f"reviewed.{_key(status)}": n})
+
+    def snapshot(self, hours=24):
+        self.ensure_indexes()
+        self.ensure_totals()
+        totals = self.coll.find_one({"_id": TOTALS_ID}) or {}
+        risk = {r: 0 for r in RISK_LEVELS}
+        risk.update(totals.get("risk") or {})
+        status = {s: 0 for s in STATUSES}
+        status.update(totals.get("status") or {})
+        since = hour_of((datetime.utcnow() - timedelta(hours=hours - 1)).isoformat())
+        buckets = []
+        for b in self.coll.find({"hour": {"$gte": since}}, {"_id": 0, "rebuilt_at": 0}).sort("hour", 1):
+            buckets.append(b)
+        return {
+            "records": totals.get("records", 0),
+            "status": status,
+            "risk": risk,
+            "finalStatus": totals.get("finalStatus") or {},
+            # the dashboard's split: low risk counts as verified
+            "verified": risk.get("Low", 0),
+            "flagged": risk.get("Medium", 0) + risk.get("High", 0),
+            "pending": status.get("Pending", 0),
+            "hourly": buckets,
+            "updated_at": totals.get("updated_at"),
+        }
+
+    def rebuild(self, sources, batch_size=1000):
+        # sources: {status: collection}. Recomputes the totals and hourly
+        # buckets with one aggregation per collection and swaps them in.
+        self.ensure_indexes()
+        totals = {"records": 0, "status": {}, "risk": {}, "finalStatus": {}}
+        hours = {}
+
+        def bucket(hour):
+            if hour not in hours:
+                hours[hour] = {"hour": hour, "uploads": 0, "risk": {}, "finalStatus": {}, "reviewed": {}}
+            return hours[hour]
+
+        def bump(d, k, n):
+            d[k] = d.get(k, 0) + n
+
+        for status, coll in sources.items():
+            groups = coll.aggregate([
+                {"$group": {
+                    "_id": {"risk": "$overallRiskLevel", "final": "$finalStatus",
+                            "hour": {"$substrBytes": [{"$ifNull": ["$timestamp", ""]}, 0, 13]}},
+                    "n": {"$sum": 1}}},
+            ])
+            for g in groups:
+                k, n = g["_id"], g["n"]
+                risk, final = _key(k.get("risk")), _key(k.get("final"))
+                totals["records"] += n
+                bump(totals["status"], _key(status), n)
+                bump(totals["risk"], risk, n)
+                bump(totals["finalStatus"], final, n)
+                if k.get("hour"):
+                    b = bucket(k["hour"])
+                    b["uploads"] += n
+                    bump(b["risk"], risk, n)
+                    bump(b["finalStatus"], final, n)
+            if status != "Pending":
+                for g in coll.aggregate([
+                    {"$match": {"adminAction.at": {"$type": "string"}}},
+                    {"$group": {"_id": {"$substrBytes": ["$adminAction.at", 0, 13]}, "n": {"$sum": 1}}},
+                ]):
+                    bump(bucket(g["_id"])["reviewed"], _key(status), g["n"])
+
+        stamp = datetime.utcnow().isoformat()
+        totals["updated_at"] = stamp
+        ops = [ReplaceOne({"_id": TOTALS_ID}, totals, upsert=True)]
+        for hour, b in hours.items():
+            b["rebuilt_at"] = stamp
+            ops.append(ReplaceOne({"_id": _bucket_id(hour)}, b, upsert=True))
+            if len(ops) >= batch_size:
+                self.coll.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            self.coll.bulk_write(ops, ordered=False)
+        # buckets for hours that no longer have any records
+        self.coll.delete_many({"hour": {"$exists": True}, "rebuilt_at": {"$ne": stamp}})
+        return totals
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("usage: python stats.py rebuild")
+        sys.exit(1)
+    from app import collection, approved_collection, rejected_collection, dashboard_stats
+    totals = dashboard_stats.rebuild({"Pending": collection, "Approved": approved_collection,
+                                      "Rejected": rejected_collection})
+    print(f"[STATS] rebuilt: {totals['records']} records {totals['status']}")
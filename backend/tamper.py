@@ -0,0 +1,173 @@
+# Document tampering heuristics: error-level analysis and noise consistency.
+#
+# Both cut the grey image into square tiles and look for a region that
+# behaves differently from the card around it, which is what a pasted photo,
+# a painted-over number or a spliced region looks like:
+#   ELA    re-save as JPEG at a fixed quality and measure how much each tile
+#          changes, relative to its texture. Regions with a different
+#          compression history than their surroundings stand out.
+#   noise  high-pass residual (pixel minus the mean of its 4 neighbours) per
+#          flat tile; a region from another camera / scan, or a smooth fill,
+#          has a different noise level.
+# Each tile is compared with the median of the tiles around it, as a ratio,
+# so smooth changes across the card (lighting, brightness-dependent noise,
+# background vs card) and the image scale do not count. Per-pixel errors are
+# clipped so a tile is not judged by the few edge pixels it happens to hold.
+# Noise below noise_floor (a clean digital card, a smooth fill) counts as
+# noise_floor, so an almost noiseless card is not flagged for the small
+# differences between its nearly flat tiles.
+#
+# Calibration: on the sample cards in uploads/ and synthetic cards (clean,
+# noisy, rotated, PNG and JPEG) ELA flags about half of the clean ones at any
+# factor that still catches an edit: cards drawn on a computer compress very
+# unevenly. It is off unless settings["ela"] is set. The noise check with
+# these defaults flags none of them, and catches a painted-over number on a
+# card with sensor noise; it misses edits on noiseless cards, and a painted
+# region that the camera's noise covers too.
+# Every step is a whole-array NumPy reduction over a (rows, tile, cols, tile)
+# view, never a per-pixel loop. Large photos are analysed at up to max_pixels
+# (JPEGs decoded at 1/2, 1/4 ... scale, others box-reduced), and a
+# per-document time budget skips whatever steps are left once it is spent.
+import io
+import time
+import warnings
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from ocr import open_image
+
+DEFAULTS = {
+    "tile": 48,              # pixels, a multiple of 4
+    "ela_quality": 90,
+    "ela": False,            # see above
+    "ela_factor": 6.0,       # ELA / texture this many times its neighbourhood's is an outlier
+    "noise_factor": 4.0,     # noise this many times higher or lower than its neighbourhood's
+    "noise_floor": 0.5,      # grey levels; quieter tiles count as this
+    "min_fraction": 0.005,   # outliers covering less than this are noise
+    "max_fraction": 0.25,    # ...and more than this is a global property, not an edit
+    "neighbourhood": 5,      # tiles; each tile is compared with this window around it
+    "max_pixels": 4000000,
+    "budget_ms": 300,
+}
+
+
+def _tiles(a, tile):
+    # crop to whole tiles and view as (rows, tile, cols, tile)
+    h, w = a.shape
+    rows, cols = h // tile, w // tile
+    return a[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile)
+
+
+def _clipped_mean(err, tile):
+    # per-tile mean of |err|, each pixel capped at 3x the image-wide mean
+    err = np.abs(err, out=err)
+    np.minimum(err, 3 * max(float(err.mean()), 0.5), out=err)
+    return _tiles(err, tile).mean(axis=(1, 3))
+
+
+def local_log_ratio(x, size):
+    # log(x / median of the size x size window of tiles around it);
+    # NaN tiles are left out of the medians and stay NaN
+    lx = np.log(x + 1e-3)
+    pad = size // 2
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(lx, pad, mode="edge"), (size, size))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN windows
+        return lx - np.nanmedian(windows, axis=(2, 3))
+
+
+def _outliers(dev, factor, settings):
+    dev = dev[~np.isnan(dev)]
+    frac = float((dev > np.log(factor)).mean()) if dev.size else 0.0
+    suspicious = settings["min_fraction"] <= frac <= settings["max_fraction"]
+    return frac, suspicious
+
+
+def texture(img_l, tile):
+    # mean absolute gradient per tile, on a 4x reduced copy so that sensor
+    # noise does not read as texture
+    small = np.asarray(img_l.reduce(4), dtype=np.float32)
+    g = np.zeros_like(small)
+    g[:, 1:] += np.abs(np.diff(small, axis=1))
+    g[1:, :] += np.abs(np.diff(small, axis=0))
+    # reduce() rounds sizes up, which can add a tile; keep the full-size grid
+    return _tiles(g, tile // 4).mean(axis=(1, 3))[:img_l.height // tile, :img_l.width // tile]
+
+
+def error_level(img_l, grey, tile, quality):
+    # per-tile |image - image re-saved at `quality`|
+    buf = io.BytesIO()
+    img_l.save(buf, "JPEG", quality=quality)
+    buf.seek(0)
+    resaved = np.asarray(Image.open(buf), dtype=np.float32)
+    return _clipped_mean(grey - resaved, tile)
+
+
+def noise_level(grey, tile):
+    # per-tile |4-neighbour high-pass residual|
+    r = np.zeros_like(grey)
+    r[1:-1, 1:-1] = grey[1:-1, 1:-1] - 0.25 * (grey[:-2, 1:-1] + grey[2:, 1:-1] + grey[1:-1, :-2] + grey[1:-1, 2:])
+    return _clipped_mean(r, tile)
+
+
+def analyze_image(source, settings=None):
+    # source: path, image bytes or PIL image -> {score, reasons, ela, noise, ms, complete}
+    s = dict(DEFAULTS, **(settings or {}))
+    started = time.perf_counter()
+    out = {"score": 0, "reasons": [], "ela": None, "noise": None, "complete": False}
+
+    def spent_ms():
+        return (time.perf_counter() - started) * 1000
+
+    img = source if isinstance(source, Image.Image) else open_image(source)
+    factor = 1
+    while img.width * img.height > s["max_pixels"] * factor * factor:
+        factor *= 2
+    if factor > 1:
+        if img.format == "JPEG":
+            # decoded straight to grey at reduced scale, in the DCT domain
+            img.draft("L", (img.width // factor, img.height // factor))
+        else:
+            img = img.reduce(factor)
+    img_l = ImageOps.exif_transpose(img).convert("L")
+    tile = s["tile"]
+    if img_l.width < 2 * tile or img_l.height < 2 * tile:
+        out["complete"] = True
+        out["ms"] = round(spent_ms(), 1)
+        return out
+    grey = np.asarray(img_l, dtype=np.float32)
+    tex = texture(img_l, tile)
+    score = 0.0
+
+    if s["ela"] and spent_ms() < s["budget_ms"]:
+        ela = error_level(img_l, grey, tile, s["ela_quality"])
+        # compression error grows with texture; compare the ratio, not the raw level
+        dev = local_log_ratio(ela / (tex + 1.0), s["neighbourhood"])
+        frac, suspicious = _outliers(dev, s["ela_factor"], s)
+        out["ela"] = {"outlierFraction": round(frac, 4), "suspicious": suspicious}
+        if suspicious:
+            score += 40 + 200 * frac
+            out["reasons"].append("Possible image tampering: error-level analysis shows an inconsistent region")
+
+    if spent_ms() < s["budget_ms"]:
+        noise = noise_level(grey, tile)
+        # flat tiles only: on text and edges the residual is texture, not sensor noise
+        flat = tex <= np.percentile(tex, 60)
+        if flat.sum() >= 8:
+            noise = np.maximum(noise, s["noise_floor"])
+            dev = np.abs(local_log_ratio(np.where(flat, noise, np.nan), s["neighbourhood"]))
+            frac, suspicious = _outliers(dev, s["noise_factor"], s)
+            out["noise"] = {"outlierFraction": round(frac, 4), "suspicious": suspicious}
+            if suspicious:
+                score += 30 + 200 * frac
+                out["reasons"].append("Possible image tampering: noise level inconsistent across the document")
+        else:
+            out["noise"] = {"outlierFraction": 0.0, "suspicious": False}
+
+    out["complete"] = (out["ela"] is not None or not s["ela"]) and out["noise"] is not None
+    if not out["complete"]:
+        out["reasons"].append("Tamper check incomplete (time budget)")
+    out["score"] = int(min(100, round(score)))
+    out["ms"] = round(spent_ms(), 1)
+    return out
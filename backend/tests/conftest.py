@@ -0,0 +1,44 @@
+import os
+import sys
+import uuid
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _server():
+    client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        return None
+    return client
+
+
+def _throwaway(client):
+    name = f"KYCDB_test_{uuid.uuid4().hex[:8]}"
+    yield client[name]
+    client.drop_database(name)
+
+
+@pytest.fixture
+def server_db():
+    # a throwaway database on MONGO_URI, for aggregations mongomock lacks;
+    # skipped without a server
+    client = _server()
+    if client is None:
+        pytest.skip("MongoDB not reachable")
+    yield from _throwaway(client)
+
+
+@pytest.fixture
+def db():
+    # a throwaway database on MONGO_URI, else an in-memory mongomock one
+    client = _server()
+    if client is None:
+        mongomock = pytest.importorskip("mongomock", reason="MongoDB not reachable and mongomock not installed")
+        client = mongomock.MongoClient()
+    yield from _throwaway(client)
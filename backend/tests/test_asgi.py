@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+
+from flask import jsonify
+
+import asgi
+from app import app as flask_app
+
+PAYLOADS = [
+    [{"_id": "65f0c0ffee", "userName": "Ravi Kumar", "overallRiskLevel": "Low", "riskScore": 12.5,
+      "documents": [{"type": "PAN", "Name": "RAVI KUMAR", "numberKey": "ABCDE1234F"}],
+      "timestamp": "2026-10-17T01:12:14.788"}],
+    {"error": "invalid cursor"},
+    {"created_at": datetime(2026, 10, 17, 1, 12, 14), "name": "Zoë Ñúñez", "flags": None, "n": 0},
+    [],
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_asgi_renders_the_bytes_flask_serves(payload):
+    # both servers fill and read one response cache under one ETag
+    with flask_app.test_request_context():
+        expected = jsonify(payload)
+    response = asgi.JSONResponse(payload)
+    assert response.body == expected.get_data()
+    assert response.headers["content-type"] == expected.headers["Content-Type"]
@@ -0,0 +1,34 @@
+import tracemalloc
+
+import pytest
+
+import export
+from benchmarks.bench_export import synthetic_records
+
+# bench_export.py holds 1M records to 32 MB; here memory must simply not grow
+# with the record count: doubling the records past one parquet row group
+# may not raise the peak by more than GROWTH_MB
+RECORDS = 2 * export.PARQUET_ROW_GROUP + 5000
+CEILING_MB = 32
+GROWTH_MB = 1
+
+
+def peak_mb(n, fmt, gzip):
+    tracemalloc.start()
+    try:
+        size = sum(len(c) for c in export.export_chunks(export.record_rows(synthetic_records(n)),
+                                                        export.RECORD_HEADERS, fmt, gzip=gzip))
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20, size
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("fmt,gzip", [("csv", False), ("ndjson", False), ("csv", True), ("parquet", False)])
+def test_export_memory_is_flat(fmt, gzip):
+    if fmt == "parquet" and export.pa is None:
+        pytest.skip("pyarrow not installed")
+    half, half_size = peak_mb(RECORDS // 2, fmt, gzip)
+    full, full_size = peak_mb(RECORDS, fmt, gzip)
+    assert full_size > 1.8 * half_size
+    assert full <= CEILING_MB
+    assert full - half <= GROWTH_MB, (half, full)
@@ -0,0 +1,69 @@
+import io
+import os
+
+from PIL import Image
+
+from benchmarks.synthetic_docs import generate
+from image_hash import ImageHashIndex, card_fields, image_hashes
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+IMG1 = os.path.join(UPLOADS, "IMG1.png")
+GEMINI = os.path.join(UPLOADS, "Gemini_Generated_Image_2jj7sa2jj7sa2jj7.png")
+
+
+def make_index(db, entries):
+    # entries: [(recordId, hashes, fields)], one Aadhaar image per record
+    index = ImageHashIndex(db.image_hashes)
+    for rid, h, fields in entries:
+        index.add_record(rid, [("Aadhaar", rid, h, fields)])
+    return index
+
+
+def reencode(source, width=None):
+    img = Image.open(source).convert("RGB")
+    if width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=75)
+    return buf.getvalue()
+
+
+def test_sample_cards_of_different_people_do_not_match(db):
+    # same template, a few bits apart on both hashes
+    index = make_index(db, [("abi", image_hashes(IMG1), card_fields("Abi", None, "000011112222"))])
+    assert index.near(image_hashes(GEMINI), card_fields("Reina Kapoor", None, "908772345678")) == []
+
+
+def test_same_template_cards_of_different_people_do_not_match(db):
+    people = list(generate(40, seed=3, kinds=("aadhar",)))
+    entries = []
+    for p in people:
+        f = p["documents"]["aadhar"]["fields"]
+        entries.append((str(p["id"]), image_hashes(p["documents"]["aadhar"]["data"]),
+                        card_fields(f["Name"], f["DOB"], f["number"].replace(" ", ""))))
+    index = make_index(db, entries)
+    for rid, h, fields in entries:
+        assert [m["recordId"] for m in index.near(h, fields)] == [rid]
+
+
+def test_same_card_reencoded_matches(db):
+    index = make_index(db, [("abi", image_hashes(IMG1), card_fields("Abi", None, "000011112222"))])
+    hits = index.near(image_hashes(reencode(IMG1, 640)), card_fields("Abi", None, "000011112222"))
+    assert [m["recordId"] for m in hits] == ["abi"]
+
+
+def test_retouched_number_matches(db):
+    # name and DOB agree, only the number was changed
+    p = next(generate(1, seed=5, kinds=("aadhar",)))
+    f = p["documents"]["aadhar"]["fields"]
+    index = make_index(db, [("orig", image_hashes(p["documents"]["aadhar"]["data"]),
+                             card_fields(f["Name"], f["DOB"], f["number"].replace(" ", "")))])
+    hits = index.near(image_hashes(reencode(io.BytesIO(p["documents"]["aadhar"]["data"]))),
+                      card_fields(f["Name"], f["DOB"], "999988887777"))
+    assert [m["recordId"] for m in hits] == ["orig"]
+
+
+def test_without_fields_only_a_near_exact_copy_matches(db):
+    index = make_index(db, [("abi", image_hashes(IMG1), {})])
+    assert [m["recordId"] for m in index.near(image_hashes(IMG1))] == ["abi"]
+    assert index.near(image_hashes(GEMINI)) == []
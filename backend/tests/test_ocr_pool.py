@@ -0,0 +1,49 @@
+import os
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from ocr_pool import OCRPool, OCRPoolBroken
+
+
+def square(x):
+    return x * x
+
+
+def nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def die(_):
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    p = OCRPool(2, 8)
+    yield p
+    p.shutdown()
+
+
+def test_map_keeps_order(pool):
+    assert pool.map(square, range(6)) == [0, 1, 4, 9, 16, 25]
+
+
+def test_map_has_one_deadline(pool):
+    # 4 images of 0.4 s on 2 workers: about 0.8 s, not 4 x the timeout
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.map(nap, [0.4] * 4, timeout=0.5)
+    assert time.monotonic() - started < 0.7
+
+
+def test_broken_pool_is_rebuilt(pool):
+    with pytest.raises(OCRPoolBroken):
+        pool.map(die, [1])
+    assert pool.stats()["restarts"] == 1
+    assert pool.map(square, [3]) == [9]
+    # every slot came back
+    assert pool.stats()["pending"] == 0
+    assert pool.map(square, range(8)) == [x * x for x in range(8)]
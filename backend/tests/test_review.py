@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from doc_numbers import DocumentNumberIndex
+from response_cache import VersionCounters
+from stats import DashboardStats
+
+
+@pytest.fixture
+def kyc(server_db, monkeypatch):
+    # app.py's review path on a throwaway database (counters need a server, see test_stats.py)
+    import app
+    db = server_db
+    sources = {"Pending": db.extracted, "Approved": db.approved_records, "Rejected": db.rejected_records}
+    for name, value in {"client": db.client, "_transactions_supported": None,
+                        "collection": db.extracted, "approved_collection": db.approved_records,
+                        "rejected_collection": db.rejected_records,
+                        "document_numbers": DocumentNumberIndex(db.document_numbers),
+                        "dashboard_stats": DashboardStats(db.stats, sources),
+                        "cache_versions": VersionCounters(db.cache_versions, 0)}.items():
+        monkeypatch.setattr(app, name, value)
+    return app
+
+
+def pending(kyc, final="Auto-Pass", risk="Low", hours_ago=48, number=None):
+    rec = {"userName": "Applicant", "finalStatus": final, "overallRiskLevel": risk, "overallFraudScore": 10,
+           "status": "Pending", "adminStatus": None,
+           "timestamp": (datetime.utcnow() - timedelta(hours=hours_ago)).isoformat(),
+           "documents": [{"type": "PAN", "number": number}] if number else []}
+    kyc.collection.insert_one(rec)
+    kyc.document_numbers.add_record(rec["_id"], rec["documents"])
+    kyc.dashboard_stats.record_upload(rec)
+    return rec["_id"]
+
+
+def post(kyc, body):
+    r = kyc.app.test_client().post("/review/bulk", json=body)
+    return r.status_code, r.get_json()
+
+
+def test_ids_report_an_outcome_each(kyc):
+    a, b = pending(kyc), pending(kyc)
+    missing = ObjectId()
+    code, body = post(kyc, {"status": "Approved", "adminUser": "alice", "ids": [str(a), str(missing), "nope", str(b)]})
+    assert code == 200
+    outcomes = {r["id"]: r["outcome"] for r in body["results"]}
+    assert outcomes == {str(a): "Approved", str(b): "Approved", str(missing): "not_found", "nope": "invalid_id"}
+    assert (body["requested"], body["moved"], body["notFound"], body["failed"]) == (4, 2, 1, 1)
+    assert kyc.collection.count_documents({}) == 0
+    moved = kyc.approved_collection.find_one({"_id": a})
+    assert moved["status"] == moved["adminStatus"] == "Approved"
+    assert moved["adminAction"]["by"] == "alice"
+
+
+def test_filter_moves_only_matching_records(kyc):
+    match = pending(kyc)
+    others = [pending(kyc, hours_ago=1), pending(kyc, final="Review"), pending(kyc, risk="Medium")]
+    flt = {"finalStatus": "Auto-Pass", "riskLevel": "Low", "olderThanHours": 24}
+
+    code, body = post(kyc, {"status": "Approved", "filter": flt, "dryRun": True})
+    assert (code, body["matched"], body["ids"]) == (200, 1, [str(match)])
+    assert kyc.collection.count_documents({}) == 4
+
+    code, body = post(kyc, {"status": "Approved", "filter": flt})
+    assert (code, body["moved"]) == (200, 1)
+    assert kyc.approved_collection.find_one({"_id": match})
+    assert sorted(d["_id"] for d in kyc.collection.find()) == sorted(others)
+
+
+def test_counters_and_number_index_follow_the_move(kyc):
+    ids = [pending(kyc, number=f"ABCDE{i:04d}F") for i in range(3)]
+    before = kyc.dashboard_stats.snapshot()["status"]
+    code, body = post(kyc, {"status": "Rejected", "ids": [str(i) for i in ids[:2]]})
+    assert (code, body["moved"]) == (200, 2)
+    after = kyc.dashboard_stats.snapshot()["status"]
+    assert after["Pending"] == before["Pending"] - 2
+    assert after["Rejected"] == before["Rejected"] + 2
+    assert [d["status"] for d in kyc.document_numbers.find("ABCDE0000F")] == ["Rejected"]
+    assert [d["status"] for d in kyc.document_numbers.find("ABCDE0002F")] == ["Pending"]
+
+
+def test_rejects_bad_requests(kyc):
+    assert post(kyc, {"status": "Maybe", "ids": []})[0] == 400
+    assert post(kyc, {"status": "Approved"})[0] == 400
+    assert post(kyc, {"status": "Approved", "ids": "abc"})[0] == 400
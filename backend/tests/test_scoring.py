@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_rescore import changed_rules
+from scoring import SignalTable, available_versions, load_rules
+
+BASES = (10, 15, 20, 30, 80)    # extractors.py's base score per document type
+
+
+def document_signals():
+    # every combination of the document checks' outcomes
+    keys = ("base", "nameMatch", "dob", "genderMismatch", "watchlistName", "watchlistFatherName",
+            "blacklisted", "duplicateNumber", "nearDuplicateImage", "tamperScore")
+    values = (BASES, (None, 0.2, 0.6, 0.95), (None, "match", "mismatch", "missing"), (None, False, True),
+              (None, "Sanctions"), (None, "PEP"), (False, True), (False, True), (False, True), (None, 0, 35, 100))
+    for combo in itertools.product(*values):
+        yield {k: v for k, v in zip(keys, combo) if v is not None}
+
+
+def records(seed=0):
+    # the combinations dealt into records of 1-3 documents, with record signals
+    rng = random.Random(seed)
+    docs = list(document_signals())
+    rng.shuffle(docs)
+    out, i = [], 0
+    while i < len(docs):
+        n = rng.randint(1, 3)
+        signals = {"amlAlerts": rng.choice((0, 0, 1, 3)), "ringLinked": rng.choice((None, 0, 1, 2, 5, 12)),
+                   "ringDensity": rng.choice((None, 0.0, 0.5, 1.0))}
+        out.append({"signals": {k: v for k, v in signals.items() if v is not None},
+                    "documents": [{"signals": s} for s in docs[i:i + n]]})
+        i += n
+    return out
+
+
+RULES = [load_rules(v) for v in available_versions()]
+
+
+@pytest.mark.parametrize("rules", RULES + [changed_rules(RULES[0])], ids=lambda r: f"v{r.version}")
+def test_bulk_rescore_matches_upload_scoring(rules):
+    recs = records()
+    table = SignalTable(recs, *rules.signals())
+    out = rules.score_table(table)
+    starts = np.concatenate([[0], np.cumsum(np.bincount(table.doc_record, minlength=len(recs)))])
+    for i, rec in enumerate(recs):
+        docs = [rules.score_document(d["signals"]) for d in rec["documents"]]
+        score, risk, status, _ = rules.score_record([d[0] for d in docs], rec["signals"])
+        k = slice(starts[i], starts[i + 1])
+        assert [(s, lv) for s, lv, _ in docs] == [
+            (int(s), rules.levels[lv]) for s, lv in zip(out["docScore"][k], out["docRisk"][k])], rec
+        assert (score, risk, status) == (
+            int(out["score"][i]), rules.levels[out["risk"][i]], rules.statuses[out["status"][i]]), rec
+
+
+def inline_v0(base, name_sim, user_dob, doc_dob, gender_mismatch, blacklisted, duplicate):
+    # the scoring /upload did inline before scoring_rules existed
+    score = base
+    if name_sim is not None:
+        if name_sim < 0.6:
+            score += 25
+        else:
+            score = max(0, score - 5)
+    if user_dob:
+        if doc_dob:
+            if doc_dob != user_dob:
+                score += 25
+        else:
+            score += 10
+    if gender_mismatch:
+        score += 10
+    if blacklisted:
+        score += 50
+    if duplicate:
+        score += 40
+    return score, "High" if score >= 70 else ("Medium" if score >= 30 else "Low")
+
+
+def inline_v0_record(doc_scores, alerts):
+    overall = int(round(sum(doc_scores) / len(doc_scores)))
+    risk = "High" if overall >= 70 else ("Medium" if overall >= 30 else "Low")
+    status = "Auto-Pass"
+    if risk == "Medium":
+        status = "Review"
+    if risk == "High" or alerts > 0:
+        status = "Flagged"
+    return overall, risk, status
+
+
+def test_v1_reproduces_the_inline_scoring():
+    v1 = load_rules(1)
+    cases = list(itertools.product(BASES, (None, 0.2, 0.6, 0.95), (None, "match", "mismatch", "missing"),
+                                   (False, True), (False, True), (False, True)))
+    user_dob = "12/05/1990"
+    docs = []
+    for base, sim, dob, gender, black, dup in cases:
+        # the signal /upload records for each outcome
+        signals = {"base": base, "genderMismatch": gender, "blacklisted": black, "duplicateNumber": dup}
+        if sim is not None:
+            signals["nameMatch"] = sim
+        if dob is not None:
+            signals["dob"] = dob
+        doc_dob = {"match": user_dob, "mismatch": "01/01/1980", "missing": None}.get(dob)
+        expected = inline_v0(base, sim, user_dob if dob else "", doc_dob, gender, black, dup)
+        score, risk, _ = v1.score_document(signals)
+        assert (score, risk) == expected, signals
+        docs.append((score, black + dup))
+
+    for group in (docs[i:i + 3] for i in range(0, len(docs), 3)):
+        scores, alerts = [s for s, _ in group], sum(a for _, a in group)
+        score, risk, status, _ = v1.score_record(scores, {"amlAlerts": alerts})
+        assert (score, risk, status) == inline_v0_record(scores, alerts)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+from stats import TOTALS_ID, DashboardStats
+
+
+@pytest.fixture
+def db(server_db):
+    # the counters are rebuilt with aggregations mongomock does not implement
+    return server_db
+
+
+def record(risk, final):
+    return {"overallRiskLevel": risk, "finalStatus": final, "timestamp": datetime.utcnow().isoformat()}
+
+
+def test_snapshot_rebuilds_missing_totals(db):
+    # records written before the counters existed
+    db.extracted.insert_many([record("Low", "Auto-Pass"), record("High", "Flagged")])
+    db.approved.insert_one(record("Low", "Auto-Pass"))
+    stats = DashboardStats(db.stats, {"Pending": db.extracted, "Approved": db.approved, "Rejected": db.rejected})
+    snap = stats.snapshot()
+    assert snap["records"] == 3
+    assert snap["status"] == {"Pending": 2, "Approved": 1, "Rejected": 0}
+    assert snap["verified"] == 2 and snap["flagged"] == 1
+    assert db.stats.find_one({"_id": TOTALS_ID})["records"] == 3
+
+
+def test_first_upload_on_existing_database_counted_once(db):
+    db.extracted.insert_many([record("Low", "Auto-Pass"), record("Medium", "Review")])
+    stats = DashboardStats(db.stats, {"Pending": db.extracted, "Approved": db.approved, "Rejected": db.rejected})
+    # the new record is written before its counters are updated
+    new = record("High", "Flagged")
+    db.extracted.insert_one(new)
+    stats.record_upload(new)
+    stats.record_upload(record("Low", "Auto-Pass"))
+    snap = stats.snapshot()
+    assert snap["records"] == 4
+    assert snap["risk"] == {"Low": 2, "Medium": 1, "High": 1}
@@ -0,0 +1,58 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from benchmarks.synthetic_docs import generate
+from tamper import analyze_image
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+SAMPLES = ["IMG1.png", "Gemini_Generated_Image_2jj7sa2jj7sa2jj7.png"]
+NO_BUDGET = {"budget_ms": float("inf")}
+
+
+def jpeg(img, quality=85):
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def paint(data):
+    # number covered with card-coloured fill and typed again
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    w, h = img.size
+    box = (int(w * 0.3), int(h * 0.6), int(w * 0.7), int(h * 0.7))
+    fill = np.median(np.asarray(img)[box[1]:box[3], box[0]:box[2]].reshape(-1, 3), axis=0)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(box, fill=tuple(int(c) for c in fill))
+    draw.text(box[:2], "9999 9999 9999", fill=(20, 20, 28), font_size=int(h * 0.06))
+    return jpeg(img, 90)
+
+
+def synthetic(noise, rotation, fmt, count=3):
+    return [(f"{p['id']}-{kind}", doc["data"])
+            for p in generate(count, seed=noise * 10 + rotation, noise=noise, rotation=rotation, fmt=fmt)
+            for kind, doc in p["documents"].items()]
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_sample_cards_are_clean(name):
+    with open(os.path.join(UPLOADS, name), "rb") as fh:
+        data = fh.read()
+    for source in (data, jpeg(Image.open(io.BytesIO(data)).convert("RGB"))):
+        r = analyze_image(source, NO_BUDGET)
+        assert r["score"] == 0, r
+        assert r["complete"] and r["ela"] is None
+
+
+@pytest.mark.parametrize("noise,rotation,fmt", [(0, 0, "png"), (0, 0, "jpeg"), (6, 2, "png"), (3, 1, "jpeg")])
+def test_synthetic_cards_are_clean(noise, rotation, fmt):
+    for name, data in synthetic(noise, rotation, fmt):
+        assert analyze_image(data, NO_BUDGET)["score"] == 0, name
+
+
+def test_painted_number_on_noisy_card_is_flagged():
+    flagged = [name for name, data in synthetic(6, 2, "png") if analyze_image(paint(data), NO_BUDGET)["score"]]
+    assert flagged
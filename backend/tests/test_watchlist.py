@@ -0,0 +1,46 @@
+from watchlist import WatchlistStore
+
+
+def stores(db, n=2):
+    # one store per simulated process, on the same collections
+    return [WatchlistStore(db.watchlist, db.watchlist_removed) for _ in range(n)]
+
+
+def names(store, name):
+    return [h["name"] for h in store.index.screen(name)]
+
+
+def test_first_sync_loads_the_whole_list(db):
+    db.watchlist.insert_many([{"name": "Rahul Kumar Sharma", "listType": "PEP"}, {"name": "Mohammed Iqbal"}])
+    a, = stores(db, 1)
+    assert a.sync() == {"loaded": 2}
+    assert names(a, "Mohd Iqbal") == ["Mohammed Iqbal"]
+
+
+def test_changes_reach_other_processes(db):
+    a, b = stores(db)
+    a.sync(), b.sync()
+    ids = a.add([{"name": "Rahul Kumar Sharma", "listType": "PEP"}, {"name": "Sunita Devi"}])
+    # the adding process screens against the new names at once
+    assert names(a, "Rahul Sharma Kumar") == ["Rahul Kumar Sharma"]
+    assert names(b, "Sunita Devi") == []
+    assert b.sync() == {"added": 2, "removed": 0}
+    assert names(b, "Sunita Devi") == ["Sunita Devi"]
+    # a name read back by the overlap is not indexed twice
+    assert b.sync() == {"added": 0, "removed": 0}
+    assert len(b.index) == 2
+
+    assert a.remove(ids[1]) == 1
+    assert names(a, "Sunita Devi") == []
+    assert b.sync() == {"added": 0, "removed": 1}
+    assert names(b, "Sunita Devi") == []
+    assert len(b.index) == 1
+    assert a.remove(ids[1]) == 0
+
+
+def test_stale_process_reloads(db):
+    a, b = stores(db)
+    a.sync(), b.sync()
+    a.add([{"name": "Sunita Devi"}])
+    b._synced_at -= b.tombstone_ttl
+    assert b.sync() == {"loaded": 1}
@@ -0,0 +1,77 @@
+import os
+
+from bson import decode_all, encode
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from write_behind import WriteBehind
+
+
+class Flaky:
+    # a collection that rejects documents marked "bad" and, `down` times,
+    # cannot be reached at all
+    def __init__(self, coll, down=0):
+        self.coll = coll
+        self.down = down
+
+    def insert_many(self, docs, ordered=True):
+        if self.down:
+            self.down -= 1
+            raise AutoReconnect("connection refused")
+        if any(d.get("bad") for d in docs):
+            raise OperationFailure("Document failed validation", code=121)
+        return self.coll.insert_many(docs, ordered=ordered)
+
+
+def writer(db, tmp_path, **kw):
+    return WriteBehind({"records": Flaky(db.records, kw.pop("down", 0))}, str(tmp_path / "journal"),
+                       flush_interval=0.001, retry_interval=0.001, max_retries=2, **kw)
+
+
+def test_rejected_document_goes_to_dead_letter(db, tmp_path):
+    wb = writer(db, tmp_path)
+    wb.submit([("records", {"n": 1}), ("records", {"n": 2, "bad": True}), ("records", {"n": 3})])
+    assert wb.sync(5)
+    wb.submit([("records", {"n": 4})])
+    assert wb.sync(5)
+    assert sorted(d["n"] for d in db.records.find()) == [1, 3, 4]
+    stats = wb.stats()
+    assert stats["deadLettered"] == 1 and stats["pending"] == 0
+    with open(os.path.join(wb.journal_dir, "dead_letter.bson"), "rb") as fh:
+        dead = decode_all(fh.read())
+    assert [(e["c"], e["d"]["n"]) for e in dead] == [("records", 2)]
+    assert "validation" in dead[0]["error"]
+    wb.close()
+
+
+def test_connection_errors_are_retried_past_max_retries(db, tmp_path):
+    wb = writer(db, tmp_path, down=10)
+    wb.submit([("records", {"n": 1})])
+    assert wb.sync(5)
+    assert db.records.count_documents({}) == 1
+    assert wb.stats()["deadLettered"] == 0
+    wb.close()
+
+
+def test_processes_sharing_a_journal_take_their_own_directory(db, tmp_path):
+    a, b = writer(db, tmp_path), writer(db, tmp_path)
+    a.submit([("records", {"n": 1})])
+    b.submit([("records", {"n": 2})])
+    assert a.sync(5) and b.sync(5)
+    assert a.journal_dir == str(tmp_path / "journal")
+    assert b.journal_dir == str(tmp_path / "journal.1")
+    assert db.records.count_documents({}) == 2
+    a.close(), b.close()
+
+
+def test_segments_left_in_an_unheld_directory_are_replayed(db, tmp_path):
+    # a fourth worker died with a batch journaled; three come back
+    orphan = tmp_path / "journal.3"
+    orphan.mkdir()
+    (orphan / "00000000000000000001-000001.seg").write_bytes(
+        encode({"c": "records", "d": {"n": 1}}) + encode({"c": "records", "d": {"n": 2}}))
+    wb = writer(db, tmp_path)
+    wb.start()
+    assert wb.replayed == 2
+    assert db.records.count_documents({}) == 2
+    assert not list(orphan.glob("*.seg"))
+    wb.close()
@@ -0,0 +1,288 @@
+import csv
+import re
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from bson import ObjectId
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+except ImportError:  # optional, pure-Python fallback below
+    _rf_levenshtein = None
+
+# --- phonetic normalization for Indian names ---
+# folds the usual romanization variants (Mohammed / Mohamad, Lakshmi / Laxmi,
+# Shree / Sri, Bhupinder / Bupinder ...) onto one spelling before indexing
+
+HONORIFICS = {"mr", "mrs", "ms", "miss", "dr", "shri", "shree", "sri", "smt", "kumari", "km",
+              "late", "s/o", "d/o", "w/o", "c/o"}
+
+# abbreviations and spellings that phonetic rules alone do not fold
+ALIASES = {"md": "mohammad", "mohd": "mohammad", "mohammed": "mohammad", "muhammad": "mohammad",
+           "mohamed": "mohammad", "mohamad": "mohammad", "kr": "kumar", "pd": "prasad"}
+
+PHONETIC_RULES = [
+    (re.compile(r"ksh"), "x"),
+    (re.compile(r"ks"), "x"),
+    (re.compile(r"([bcdgkpt])h"), r"\1"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"sh"), "s"),
+    (re.compile(r"ee|ie|ii"), "i"),
+    (re.compile(r"oo|ou|uu"), "u"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"ck"), "k"),
+    (re.compile(r"y\b"), "i"),
+    (re.compile(r"(?<=[a-z])h\b"), ""),
+    (re.compile(r"(?<=[a-z])e\b"), ""),
+    (re.compile(r"([a-z])\1+"), r"\1"),
+]
+
+
+def normalize_name(name):
+    if not name:
+        return ""
+    s = re.sub(r"[^a-z/\s]", " ", str(name).lower())
+    tokens = [t for t in s.replace("/", " / ").split() if t not in HONORIFICS and t != "/"]
+    out = []
+    for t in tokens:
+        t = ALIASES.get(t, t)
+        for pat, rep in PHONETIC_RULES:
+            t = pat.sub(rep, t)
+        if t:
+            out.append(t)
+    # token order varies between documents (surname first on some cards)
+    return " ".join(sorted(out))
+
+
+def trigrams(s):
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def pattern_masks(a):
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+
+def bit_levenshtein(peq, m, b):
+    # Myers / Hyyro bit-parallel edit distance: one pass over b, the column of
+    # the DP matrix for pattern a (length m, masks peq) lives in two ints
+    if m == 0:
+        return len(b)
+    full = (1 << m) - 1
+    top = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & top:
+            score += 1
+        elif mh & top:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def levenshtein(a, b):
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(a, b)
+    return bit_levenshtein(pattern_masks(a), len(a), b)
+
+
+def name_score(a, b):
+    if not a or not b:
+        return 0.0
+    return 1.0 - levenshtein(a, b) / float(max(len(a), len(b)))
+
+
+# --- watchlist screening engine ---
+# trigram inverted index over normalized names: postings are int32 arrays,
+# candidate counting is one np.bincount over the query's postings, and only the
+# best-overlapping candidates get an edit-distance score
+class WatchlistIndex:
+    def __init__(self, threshold=0.85, max_candidates=64, min_overlap=0.3):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._norm = []
+        self._entries = []
+        self._active = bytearray()
+        self._by_ref = {}
+
+    def __len__(self):
+        return len(self._by_ref)
+
+    def __contains__(self, ref):
+        return ref in self._by_ref
+
+    def add(self, name, list_type="Sanctions", ref=None, source=None):
+        norm = normalize_name(name)
+        if not norm:
+            return None
+        with self._lock:
+            if ref is not None and ref in self._by_ref:
+                self._active[self._by_ref[ref]] = 0
+            idx = len(self._norm)
+            self._norm.append(norm)
+            self._entries.append({"name": name, "listType": list_type, "ref": ref, "source": source})
+            self._active.append(1)
+            self._by_ref[ref if ref is not None else idx] = idx
+            for g in trigrams(norm):
+                p = self._postings.get(g)
+                if p is None:
+                    p = self._postings[g] = array("i")
+                p.append(idx)
+        return idx
+
+    def remove(self, ref):
+        with self._lock:
+            idx = self._by_ref.pop(ref, None)
+            if idx is None:
+                return False
+            self._active[idx] = 0
+            return True
+
+    def bulk_load(self, rows):
+        # rows: iterable of dicts with name / listType / ref / source
+        n = 0
+        for r in rows:
+            if self.add(r.get("name"), r.get("listType") or "Sanctions", r.get("ref"), r.get("source")) is not None:
+                n += 1
+        return n
+
+    def load_csv(self, path, list_type="Sanctions", source=None):
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            return self.bulk_load({"name": r.get("name"), "listType": r.get("listType") or list_type,
+                                   "ref": r.get("ref") or r.get("id"), "source": source or path}
+                                  for r in csv.DictReader(fh))
+
+    def screen(self, name, threshold=None, limit=5):
+        threshold = self.threshold if threshold is None else threshold
+        norm = normalize_name(name)
+        if not norm or not self._norm:
+            return []
+        grams = trigrams(norm)
+        with self._lock:
+            # snapshot under the lock: arrays cannot grow while a buffer view exists
+            lists = [self._postings[g] for g in grams if g in self._postings]
+            if not lists:
+                return []
+            n = len(self._norm)
+            flat = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in lists])
+            active = np.frombuffer(bytes(self._active), dtype=np.uint8)
+        counts = np.bincount(flat, minlength=n)
+        counts[active == 0] = 0
+        # q-gram lemma: within edit distance d a name keeps all but 3*d of the
+        # query's trigrams; d is bounded by the score threshold
+        max_d = int((1.0 - threshold) * (len(norm) / max(threshold, 0.01)))
+        min_shared = max(1, int(len(grams) * self.min_overlap), len(grams) - 3 * max_d)
+        cand = np.nonzero(counts >= min_shared)[0]
+        if cand.size > self.max_candidates:
+            cand = cand[np.argpartition(counts[cand], -self.max_candidates)[-self.max_candidates:]]
+        peq, m = pattern_masks(norm), len(norm)
+        hits = []
+        for idx in cand.tolist():
+            other = self._norm[idx]
+            longest = max(m, len(other))
+            if abs(m - len(other)) > (1.0 - threshold) * longest:
+                continue
+            if _rf_levenshtein is not None:
+                dist = _rf_levenshtein.distance(norm, other)
+            else:
+                dist = bit_levenshtein(peq, m, other)
+            score = 1.0 - dist / float(longest)
+            if score >= threshold:
+                e = self._entries[idx]
+                hits.append({"name": e["name"], "listType": e["listType"], "ref": e["ref"],
+                             "source": e["source"], "score": round(score, 3)})
+        hits.sort(key=lambda h: h["score"], reverse=True)
+        return hits[:limit]
+
+    def stats(self):
+        return {"entries": len(self), "trigrams": len(self._postings), "threshold": self.threshold,
+                "editDistance": "rapidfuzz" if _rf_levenshtein is not None else "python"}
+
+
+def load_from_collection(index, coll, query=None):
+    # the names matching `query` (all by default) that the index does not hold yet
+    return index.bulk_load({"name": d.get("name"), "listType": d.get("listType"),
+                            "ref": str(d["_id"]), "source": d.get("source")}
+                           for d in coll.find(query or {}, {"name": 1, "listType": 1, "source": 1})
+                           if str(d["_id"]) not in index)
+
+
+# --- keeping every process's index in step with MongoDB ---
+# The process that adds or removes a name updates its own index at once.
+# Other processes sync(): the first call loads the whole list, later ones
+# only read names whose ObjectId is newer than their last sync, and the
+# tombstones {ref, removed_at} that removals leave in `removed`. ObjectIds
+# from different processes are only ordered to the second (and by their
+# clocks), so each sync reads back `overlap` seconds and skips refs it
+# already holds. Tombstones expire after `tombstone_ttl`; a process that has
+# not synced for that long loads the whole list again.
+class WatchlistStore:
+    def __init__(self, coll, removed, threshold=0.85, overlap=60, tombstone_ttl=7 * 86400):
+        self.coll = coll
+        self.removed = removed
+        self.threshold = threshold
+        self.overlap = timedelta(seconds=overlap)
+        self.tombstone_ttl = timedelta(seconds=tombstone_ttl)
+        self.index = WatchlistIndex(threshold=threshold)
+        self._synced_at = None
+        self._indexed = False
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            self.removed.create_index("removed_at", expireAfterSeconds=int(self.tombstone_ttl.total_seconds()))
+            self._indexed = True
+
+    def add(self, entries):
+        # entries: [{name, listType, source}] -> ids of the inserted names
+        docs = [{"name": e["name"], "listType": e.get("listType") or "Sanctions", "source": e.get("source"),
+                 "added_at": datetime.utcnow().isoformat()} for e in entries]
+        if not docs:
+            return []
+        self.coll.insert_many(docs)
+        for d in docs:
+            self.index.add(d["name"], d["listType"], str(d["_id"]), d["source"])
+        return [str(d["_id"]) for d in docs]
+
+    def remove(self, ref):
+        self.ensure_indexes()
+        deleted = self.coll.delete_one({"_id": ObjectId(ref)}).deleted_count
+        if deleted:
+            self.removed.insert_one({"ref": ref, "removed_at": datetime.utcnow()})
+        self.index.remove(ref)
+        return deleted
+
+    def sync(self):
+        # -> {"loaded": n} after loading the whole list, else {"added": n, "removed": n}
+        started = datetime.now(timezone.utc)
+        if self._synced_at is None or started - self._synced_at > self.tombstone_ttl - self.overlap:
+            index = WatchlistIndex(threshold=self.threshold)
+            n = load_from_collection(index, self.coll)
+            self.index, self._synced_at = index, started
+            return {"loaded": n}
+        since = {"_id": {"$gt": ObjectId.from_datetime(self._synced_at - self.overlap)}}
+        added = load_from_collection(self.index, self.coll, since)
+        removed = sum(self.index.remove(d["ref"]) for d in self.removed.find(since, {"ref": 1}))
+        self._synced_at = started
+        return {"added": added, "removed": removed}
+
+    def stats(self):
+        return dict(self.index.stats(), syncedAt=self._synced_at.isoformat() if self._synced_at else None)
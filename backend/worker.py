@@ -0,0 +1,109 @@
+# Job workers for queued uploads (/upload?async=1).
+#
+#   python worker.py [--processes N]
+#
+# Each process claims jobs from the same queue the app writes to (JOB_QUEUE_BACKEND)
+# and runs process_upload(); OCR inside a job still goes through that process's
+# OCR pool (OCR_WORKERS).
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+import request_log
+from app import process_upload, uploads_from_payload, job_queue, find_job_record, index_record
+
+POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))
+
+
+def keep_lease(job_id, worker_id, stop):
+    interval = max(1.0, job_queue.visibility_timeout / 3.0)
+    while not stop.wait(interval):
+        try:
+            job_queue.heartbeat(job_id, worker_id)
+        except Exception as e:
+            request_log.log_exception("heartbeat", e, jobId=job_id, workerId=worker_id)
+
+
+def handle(job, worker_id):
+    job_id = job["_id"]
+    payload = job["payload"]
+
+    # a previous attempt may have saved the record (and an admin reviewed it
+    # since) and died before completing; its indexes are built once
+    coll, existing = find_job_record(job_id) if job.get("attempts", 1) > 1 else (None, None)
+    if existing:
+        existing["_id"] = str(existing["_id"])
+        if not existing.get("indexedAt"):
+            index_record(existing, coll=coll)
+        job_queue.complete(job_id, worker_id, existing)
+        return
+
+    stop = threading.Event()
+    t = threading.Thread(target=keep_lease, args=(job_id, worker_id, stop), daemon=True)
+    t.start()
+    try:
+        record = process_upload(
+            payload.get("userName", ""),
+            payload.get("userDob", ""),
+            payload.get("userGender", ""),
+            uploads_from_payload(payload.get("uploads", [])),
+            job_id=job_id,
+            on_stage=lambda name: job_queue.mark_stage(job_id, name),
+        )
+        job_queue.complete(job_id, worker_id, record)
+        request_log.log("job_done", jobId=job_id, workerId=worker_id, recordId=record["_id"])
+    except Exception as e:
+        status = job_queue.fail(job_id, worker_id, str(e))
+        request_log.log_exception("job", e, jobId=job_id, workerId=worker_id, status=status)
+    finally:
+        stop.set()
+
+
+def run_worker(index=0):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    request_log.log("worker_started", workerId=worker_id)
+    while True:
+        try:
+            job = job_queue.claim(worker_id)
+        except Exception as e:
+            request_log.log_exception("claim", e, workerId=worker_id)
+            job = None
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        handle(job, worker_id)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--processes", type=int, default=1)
+    args = ap.parse_args()
+
+    if args.processes <= 1:
+        run_worker()
+        return
+    # not daemonic: each worker starts its own OCR process pool
+    procs = [multiprocessing.Process(target=run_worker, args=(i,)) for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
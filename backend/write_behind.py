@@ -0,0 +1,386 @@
+# Write-behind persistence for upload records and AML alerts.
+#
+# Instead of one acknowledged insert per document on the request path,
+# submit() appends the documents to a local journal and queues them; a
+# background thread group-commits the queue with one insert_many per
+# collection every `flush_interval` seconds, or as soon as `batch_size`
+# documents are waiting.
+#
+# Durability: submit() returns once the documents are written to the journal
+# (and fsynced when fsync=True, one fsync shared by every writer waiting on
+# it). Without fsync an upload survives the process dying, not the machine.
+# The journal is a directory of segments, one per group commit, each a run of
+# BSON documents {c: collection name, d: document}; a segment is deleted once
+# its batch is in Mongo, and segments left by a previous run are replayed on
+# start. _ids are assigned before journaling, so a batch that
+# reached Mongo just before a crash replays as duplicate-key errors, which are
+# skipped. If Mongo is down the batch is retried and the queue grows up to
+# `max_pending` documents; past that submit() raises WriteBehindFull (after
+# waiting up to its timeout, none by default: a request should be shed, not
+# held). A batch Mongo rejects for any other reason (validation, a document
+# over 16 MB, a bad field name) is retried `max_retries` times, then written
+# one document at a time; the documents still rejected are appended to
+# dead_letter.bson in the journal directory (entries {c, d, error, at}) and
+# the queue moves on.
+#
+# Read-your-writes: sync() waits until everything submitted so far is in
+# Mongo. Readers call it before querying, which costs nothing while the queue
+# is empty and at most one flush interval otherwise. on_commit(names) runs on
+# the flusher thread after each batch is in Mongo and before sync() returns,
+# with the names of the collections written (e.g. to invalidate caches).
+#
+# A journal directory belongs to one process (it is locked while in use).
+# Processes sharing the setting (ASGI_WORKERS > 1) each take the first free
+# one of journal_dir, journal_dir.1, journal_dir.2 ... up to `max_processes`;
+# on start a process also replays the segments left in any of them that no
+# process holds, so nothing waits for a worker count that never comes back.
+import os
+import threading
+import time
+
+from datetime import datetime
+
+from bson import ObjectId, decode, encode
+from bson.errors import InvalidBSON
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+import request_log
+
+try:
+    import fcntl
+except ImportError:    # Windows
+    fcntl = None
+    import msvcrt
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindFull(Exception):
+    pass
+
+
+def _read_segment(path):
+    # the entries of a segment; a last entry cut short was never acknowledged
+    with open(path, "rb") as fh:
+        data = fh.read()
+    entries, i = [], 0
+    while i + 4 <= len(data):
+        size = int.from_bytes(data[i:i + 4], "little")
+        if size < 5 or i + size > len(data):
+            break
+        try:
+            decode(data[i:i + size])
+        except InvalidBSON:
+            break
+        entries.append(data[i:i + size])
+        i += size
+    return entries
+
+
+def _transient(e):
+    # retried for as long as it takes: MongoDB unreachable or stepping down,
+    # or writes not yet acknowledged by enough members
+    if isinstance(e, ConnectionFailure):
+        return True
+    return (isinstance(e, BulkWriteError) and bool(e.details.get("writeConcernErrors"))
+            and all(w.get("code") == DUPLICATE_KEY for w in e.details.get("writeErrors", [])))
+
+
+def _lock_file(fh):
+    # raises OSError when another process holds the lock
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+class WriteBehind:
+    def __init__(self, collections, journal_dir, flush_interval=0.02, batch_size=500, max_pending=20000,
+                 fsync=False, retry_interval=1.0, max_retries=5, max_processes=64, on_commit=None):
+        self.collections = collections    # name -> collection
+        self.on_commit = on_commit
+        self.base_dir = journal_dir
+        self.journal_dir = journal_dir    # the directory this process holds, once started
+        self.max_processes = max_processes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._fsync_lock = threading.Lock()    # taken before _cond
+        self._start_lock = threading.Lock()
+        self._pending = []          # journal entries not yet in Mongo, in submit order
+        self._segment = None        # open file of the segment being appended to
+        self._segment_path = None
+        self._segments = 0
+        self._submitted = 0         # documents submitted / committed / fsynced so far
+        self._committed = 0
+        self._durable = 0
+        self._thread = None
+        self._lock_fh = None
+        self._closing = False
+        self.started = False
+        self.replayed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        self.dead_lettered = 0
+        self.last_batch = 0
+        self.last_flush_ms = 0.0
+
+    # --- start / replay ---
+    def start(self):
+        if self.started:
+            return
+        with self._start_lock:
+            if self.started:
+                return
+            if self._lock_fh is None:
+                self.journal_dir, self._lock_fh = self._claim()
+            self.replayed = self.replay()
+            for path in self._slots():
+                if path != self.journal_dir:
+                    self.replayed += self._replay_unheld(path)
+            if self.replayed:
+                request_log.log("write_behind_replayed", documents=self.replayed, journal=self.base_dir)
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            self.started = True
+
+    def _slot(self, n):
+        return self.base_dir if n == 0 else f"{self.base_dir}.{n}"
+
+    def _slots(self):
+        return [p for p in map(self._slot, range(self.max_processes)) if os.path.isdir(p)]
+
+    def _try_lock(self, path):
+        # the open, locked LOCK file of `path`, or None when another process holds it
+        os.makedirs(path, exist_ok=True)
+        fh = open(os.path.join(path, "LOCK"), "a+")
+        try:
+            _lock_file(fh)
+        except OSError:
+            fh.close()
+            return None
+        return fh
+
+    def _claim(self):
+        for n in range(self.max_processes):
+            path = self._slot(n)
+            fh = self._try_lock(path)
+            if fh is not None:
+                return path, fh
+        raise RuntimeError(f"write-behind: all {self.max_processes} journal directories {self.base_dir}[.N]"
+                           f" are in use; raise max_processes or give each server its own WRITE_BEHIND_JOURNAL")
+
+    def _replay_unheld(self, path):
+        fh = self._try_lock(path)
+        if fh is None:
+            return 0
+        try:
+            return self.replay(path)
+        finally:
+            fh.close()
+
+    def _segment_files(self, journal_dir):
+        return sorted(f for f in os.listdir(journal_dir) if f.endswith(".seg"))
+
+    def replay(self, journal_dir=None):
+        # commits the segments a previous run left behind, oldest first
+        journal_dir = journal_dir or self.journal_dir
+        total = 0
+        for name in self._segment_files(journal_dir):
+            path = os.path.join(journal_dir, name)
+            entries = _read_segment(path)
+            if entries:
+                self._committed_hook(self._commit_batch(entries, wait=False))
+                total += len(entries)
+            os.remove(path)
+        return total
+
+    # --- writers ---
+    def submit(self, docs, timeout=0.0):
+        # docs: [(collection name, document)]. Gives each document an _id
+        # unless it has one; returns once they are in the journal. Raises
+        # WriteBehindFull if the queue has no room within `timeout` seconds.
+        data = []
+        for name, doc in docs:
+            doc.setdefault("_id", ObjectId())
+            data.append(encode({"c": name, "d": doc}))
+        if not data:
+            return
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # queued or being committed; one submit always fits into an empty queue
+            while (self._committed < self._submitted
+                   and self._submitted - self._committed + len(data) > self.max_pending):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WriteBehindFull(f"{self._submitted - self._committed} documents waiting for MongoDB")
+                self._cond.wait(remaining)
+            if self._segment is None:
+                self._segments += 1
+                self._segment_path = os.path.join(self.journal_dir, f"{time.time_ns():020d}-{self._segments:06d}.seg")
+                self._segment = open(self._segment_path, "ab")
+            self._segment.write(b"".join(data))
+            self._segment.flush()
+            self._pending += data
+            self._submitted += len(data)
+            seq = self._submitted
+            # wake the flusher: a new batch starts, or this one is full
+            if len(self._pending) == len(data) or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        if self.fsync:
+            self._make_durable(seq)
+
+    def _make_durable(self, seq):
+        # group fsync: whoever gets the lock first covers everyone behind it
+        with self._fsync_lock:
+            if self._durable >= seq:
+                return
+            with self._cond:
+                fh, upto = self._segment, self._submitted
+            os.fsync(fh.fileno())
+            self._durable = upto
+
+    # --- readers ---
+    def pending(self):
+        with self._cond:
+            return self._submitted - self._committed
+
+    def idle(self):
+        # started, and nothing waiting for Mongo
+        return self.started and self._committed == self._submitted
+
+    def sync(self, timeout=None):
+        # waits until every document submitted before the call is in Mongo;
+        # False on timeout
+        self.start()
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    # --- flusher ---
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if len(self._pending) < self.batch_size and not self._closing:
+                    self._cond.wait(self.flush_interval)    # let the batch fill up
+            with self._fsync_lock:
+                with self._cond:
+                    batch, self._pending = self._pending, []
+                    end = self._submitted
+                    fh, path = self._segment, self._segment_path
+                    self._segment = self._segment_path = None
+                if self.fsync:
+                    os.fsync(fh.fileno())
+                    self._durable = end
+                fh.close()
+            started = time.perf_counter()
+            names = self._commit_batch(batch)
+            os.remove(path)
+            self._committed_hook(names)
+            with self._cond:
+                self._committed = end
+                self.batches += 1
+                self.last_batch = len(batch)
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+                self._cond.notify_all()
+
+    def _commit(self, entries):
+        by_coll = {}
+        for raw in entries:
+            entry = decode(raw)
+            by_coll.setdefault(entry["c"], []).append(entry["d"])
+        for name, docs in by_coll.items():
+            try:
+                self.collections[name].insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # documents a replayed batch already wrote are fine
+                if e.details.get("writeConcernErrors") or any(
+                        w.get("code") != DUPLICATE_KEY for w in e.details.get("writeErrors", [])):
+                    raise
+        return list(by_coll)
+
+    def _commit_batch(self, entries, wait=True):
+        # _commit with retries; a batch still rejected after max_retries is
+        # committed entry by entry. Connection errors are retried without a
+        # limit, or raised when not `wait`ing (replay on start).
+        rejected = 0
+        while True:
+            try:
+                return self._commit(entries)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                if _transient(e):
+                    if not wait:
+                        raise
+                else:
+                    rejected += 1
+                    if rejected > self.max_retries:
+                        return self._commit_each(entries)
+                request_log.log("write_behind_retry", level="warning", documents=len(entries), error=str(e))
+                time.sleep(self.retry_interval)
+
+    def _commit_each(self, entries):
+        names = set()
+        for raw in entries:
+            while True:
+                try:
+                    names.update(self._commit([raw]))
+                    break
+                except Exception as e:
+                    if not _transient(e):
+                        self._dead_letter(raw, e)
+                        break
+                    time.sleep(self.retry_interval)
+        return list(names)
+
+    def _dead_letter(self, raw, error):
+        entry = decode(raw)
+        entry.update(error=str(error), at=datetime.utcnow())
+        with open(os.path.join(self.journal_dir, "dead_letter.bson"), "ab") as fh:
+            fh.write(encode(entry))
+            fh.flush()
+            os.fsync(fh.fileno())
+        self.dead_lettered += 1
+        request_log.log("write_behind_dead_letter", level="error", collection=entry["c"],
+                        documentId=entry["d"].get("_id"), error=str(error))
+
+    def _committed_hook(self, names):
+        if self.on_commit is None:
+            return
+        try:
+            self.on_commit(names)
+        except Exception as e:
+            request_log.log_exception("write-behind on_commit", e)
+
+    def close(self, timeout=10.0):
+        # flushes what is queued; anything that cannot be written stays in the journal
+        if not self.started:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            request_log.log("write_behind_left", level="warning", pending=self.pending(), journal=self.journal_dir)
+            return
+        self._lock_fh.close()
+        self._lock_fh = None
+        self.started = False
+
+    def stats(self):
+        with self._cond:
+            return {"journal": self.journal_dir, "pending": self._submitted - self._committed,
+                    "submitted": self._submitted, "committed": self._committed, "batches": self.batches, "lastBatch": self.last_batch,
+                    "lastFlushMs": round(self.last_flush_ms, 2), "replayed": self.replayed,
+                    "errors": self.errors, "lastError": self.last_error, "deadLettered": self.dead_lettered}
@@ -16,22 +16,26 @@ ChartJS.register(ArcElement, BarElement, CategoryScale, LinearScale, Tooltip, Le
 
 const Dashboard = () => {
   const [records, setRecords] = useState([]);
+  const [stats, setStats] = useState(null);
 
   const fetchData = () => {
-    axios.get("http://127.0.0.1:5000/all-records")
+    axios.get("http://127.0.0.1:5000/stats")
+      .then((res) => setStats(res.data))
+      .catch((err) => console.log(err));
+    axios.get("http://127.0.0.1:5000/all-records?limit=5")
       .then((res) => setRecords(res.data))
       .catch((err) => console.log(err));
   };
 
   useEffect(() => { fetchData(); }, []);
 
-  // risk stats
-  const low = records.filter((r) => r.overallRiskLevel === "Low").length;
-  const medium = records.filter((r) => r.overallRiskLevel === "Medium").length;
-  const high = records.filter((r) => r.overallRiskLevel === "High").length;
+  // risk stats (maintained server-side, see /stats)
+  const low = stats?.risk?.Low || 0;
+  const medium = stats?.risk?.Medium || 0;
+  const high = stats?.risk?.High || 0;
 
-  const verified = low;
-  const fraud = medium + high;
+  const verified = stats?.verified || 0;
+  const fraud = stats?.flagged || 0;
 
   const handleLogout = () => {
     localStorage.removeItem("isAdmin");
@@ -111,7 +115,7 @@ const Dashboard = () => {
         </thead>
 
         <tbody>
-          {records.slice(-5).reverse().map((r, i) => (
+          {records.map((r, i) => (
             <tr key={i}>
               <td>{r.userName}</td>
               <td>{r.documents?.map(d => d.type).join(", ")}</td>